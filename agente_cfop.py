@@ -11,30 +11,106 @@ import re
 from typing import Optional
 from pinecone import Pinecone
 from openai import OpenAI
+from config import settings
+from services.cache_snapshot import CacheSnapshot, calcular_hash_arquivos
+from services.carregador_csv import (
+    VERSAO_SCHEMA, PREFIXO_DERIVADA, COLUNA_CFOP, COLUNA_NOTA,
+    carregar_dados, detectar_coluna_valor_nota, normalizar_chave, normalizar_cfop
+)
+from services.catalogo_cfop import CatalogoCFOP
+from services.classificador_natureza import CATEGORIA_VENDA_COMPRA, carregar_regras, regras_ativas
+from services.estatisticas_service import EstatisticasService
+from services.indices import IndiceChave, IndiceNotas
+from services.jobs import GerenciadorJobs
+from services.motor_validacao import (
+    TIPO_PRIMEIRO_DIGITO, TIPO_ULTIMOS_DIGITOS,
+    MotorValidacao, inferir_cfop_esperado, interpretar_numero_item, resumir_contagens
+)
+from services.repositorio_validacao import RepositorioValidacao
+from services.roteador_intencoes import identificar_intencao, resposta_de_falha
+from services.serie_temporal import SerieTemporal
+from services.sketches import SketchesMensais
 
 load_dotenv()
 
+# Âmbito da operação pelo primeiro dígito do CFOP esperado
+AMBITO_POR_DIGITO = {
+    '1': "INTERNA", '5': "INTERNA",
+    '2': "INTERESTADUAL", '6': "INTERESTADUAL",
+    '3': "EXTERIOR", '7': "EXTERIOR",
+}
+
 class AgenteValidadorCFOP:
     """Agente inteligente para validação de CFOP em Notas Fiscais"""
     
-    def __init__(self, cabecalho_path: str, itens_path: str, cfop_path: str):
-        """Inicializa o agente com os dados dos CSVs"""
+    def __init__(self, cabecalho_path: str, itens_path: str, cfop_path: str,
+                 gerenciador_jobs: Optional[GerenciadorJobs] = None):
+        """Inicializa o agente com os dados dos CSVs. gerenciador_jobs: fila
+        onde rodam as validações completas (padrão: uma própria)"""
         print("\n" + "="*70)
         print("🔧 INICIALIZANDO AGENTE VALIDADOR CFOP")
         print("="*70)
         
-        # Carregar CSVs
-        print(f"📂 Carregando: {cabecalho_path}")
-        self.df_cabecalho = pd.read_csv(cabecalho_path)
-        print(f"   ✅ {len(self.df_cabecalho)} registros de cabeçalho")
+        # Versão do conjunto de dados = hash do conteúdo dos arquivos
+        self.versao_dataset = calcular_hash_arquivos(
+            [cabecalho_path, itens_path, cfop_path], versao=VERSAO_SCHEMA
+        )
+        print(f"🔖 Versão dos dados: {self.versao_dataset[:12]}")
+        
+        # Carregar CSVs (schema explícito + categóricas) ou snapshot existente
+        cache = CacheSnapshot(
+            settings.snapshot_dir,
+            max_idade_horas=settings.snapshot_max_idade_horas,
+            max_mb=settings.snapshot_max_mb
+        )
+        dados = carregar_dados(
+            cabecalho_path, itens_path, cfop_path,
+            versao=self.versao_dataset, cache=cache
+        )
+        self.df_cabecalho = dados['cabecalho']
+        self.df_itens = dados['itens']
+        self.df_cfop = dados['cfop']
+        self.coluna_valor_nota = detectar_coluna_valor_nota(self.df_cabecalho)
+        
+        # Índices para buscas O(1)
+        print("🗂️ Construindo índices...")
+        self.indice_chave = IndiceChave(self.df_cabecalho)
+        print(f"   ✅ {len(self.indice_chave)} chaves de acesso indexadas (coluna: {self.indice_chave.coluna})")
+        self.indice_notas = IndiceNotas(self.df_cabecalho, self.df_itens)
+        print(f"   ✅ {len(self.indice_notas)} notas com itens indexadas")
+        self.catalogo_cfop = CatalogoCFOP(self.df_cfop)
+        print(f"   ✅ {len(self.catalogo_cfop)} CFOPs no catálogo")
+        
+        # Agregados por dia/mês de emissão (tendência do dashboard)
+        self.serie_temporal = SerieTemporal(self.df_cabecalho, self.df_itens, self.indice_notas)
         
-        print(f"📂 Carregando: {itens_path}")
-        self.df_itens = pd.read_csv(itens_path)
-        print(f"   ✅ {len(self.df_itens)} itens")
+        # Sketches mensais (quantis, distintos, CFOPs frequentes) para o modo aproximado
+        self.sketches = SketchesMensais(self.df_cabecalho, self.df_itens, self.indice_notas)
         
-        print(f"📂 Carregando: {cfop_path}")
-        self.df_cfop = pd.read_csv(cfop_path)
-        print(f"   ✅ {len(self.df_cfop)} códigos CFOP")
+        # Regras natureza -> CFOP (tabela compartilhada pelo motor, ferramentas e estatísticas)
+        carregar_regras(settings.regras_natureza_csv)
+        
+        # Validação em lote (calculada sob demanda e reaproveitada). Os
+        # resultados vão para o repositório SQLite, lido por estatísticas,
+        # ferramentas e rotas; itens já validados antes não são refeitos
+        self.repositorio = RepositorioValidacao(settings.resultados_db)
+        self.motor_validacao = MotorValidacao(
+            self.df_cabecalho, self.df_itens, self.indice_notas, self.indice_chave,
+            workers=settings.validacao_workers,
+            particionamento=settings.validacao_particionamento,
+            min_itens_paralelo=settings.validacao_min_itens_paralelo,
+            repositorio=self.repositorio,
+            versao=self.versao_dataset,
+            incremental=settings.validacao_incremental
+        )
+        
+        # Validação completa e gravação rodam em jobs, nunca numa consulta
+        self.gerenciador_jobs = gerenciador_jobs or GerenciadorJobs(
+            max_workers=settings.jobs_workers, max_retidos=settings.jobs_max_retidos
+        )
+        
+        # Estatísticas do dashboard (agregado único, compartilhado pelas rotas)
+        self.estatisticas = EstatisticasService(self)
         
         # Mostrar exemplos de CFOPs para debug
         print(f"   📋 Exemplos de CFOPs no arquivo:")
@@ -154,6 +230,15 @@ class AgenteValidadorCFOP:
         }
         return explicacoes.get(digito, 'Indefinido')
     
+    def _colunas_visiveis(self, df) -> list:
+        """Colunas originais do arquivo (sem as derivadas do carregamento)"""
+        return [col for col in df.columns if not col.startswith(PREFIXO_DERIVADA)]
+    
+    def _campos_visiveis(self, registro) -> list:
+        """Pares (coluna, valor) de um registro sem as colunas derivadas"""
+        return [(col, valor) for col, valor in registro.items()
+                if not col.startswith(PREFIXO_DERIVADA)]
+    
     def _buscar_cfop_semantico(self, query: str, top_k: int = 5) -> str:
         """
         Busca semântica de CFOPs no Pinecone
@@ -312,14 +397,14 @@ Seja objetivo, claro e mostre os dados de forma organizada."""
 🛒 Itens de Notas: {total_itens} registros
 📖 Tabela CFOP: {total_cfop} códigos
 
-Colunas do Cabeçalho ({len(self.df_cabecalho.columns)}):
-{', '.join(self.df_cabecalho.columns.tolist())}
+Colunas do Cabeçalho ({len(self._colunas_visiveis(self.df_cabecalho))}):
+{', '.join(self._colunas_visiveis(self.df_cabecalho))}
 
-Colunas dos Itens ({len(self.df_itens.columns)}):
-{', '.join(self.df_itens.columns.tolist())}
+Colunas dos Itens ({len(self._colunas_visiveis(self.df_itens))}):
+{', '.join(self._colunas_visiveis(self.df_itens))}
 
-Colunas do CFOP ({len(self.df_cfop.columns)}):
-{', '.join(self.df_cfop.columns.tolist())}
+Colunas do CFOP ({len(self._colunas_visiveis(self.df_cfop))}):
+{', '.join(self._colunas_visiveis(self.df_cfop))}
 """
             
             print(f"   ✅ Total: {total_cabecalho} notas, {total_itens} itens")
@@ -343,7 +428,7 @@ Colunas do CFOP ({len(self.df_cfop.columns)}):
                     resultado += f"Natureza: {row.get('NATUREZA DA OPERAÇÃO', 'N/A')}\n"
                     resultado += f"Emitente: {row.get('NOME EMITENTE', 'N/A')} ({row.get('UF EMITENTE', 'N/A')})\n"
                     resultado += f"Destinatário: {row.get('NOME DESTINATÁRIO', 'N/A')} ({row.get('UF DESTINATÁRIO', 'N/A')})\n"
-                    resultado += f"Valor: R$ {row.get('VALOR TOTAL DA NF', 'N/A')}\n"
+                    resultado += f"Valor: R$ {row.get(self.coluna_valor_nota, 'N/A')}\n"
                     resultado += f"Destino: {row.get('DESTINO DA OPERAÇÃO', 'N/A')}\n"
                 
                 print(f"   ✅ Listadas {len(notas)} notas")
@@ -365,7 +450,7 @@ Colunas do CFOP ({len(self.df_cfop.columns)}):
                 nota = self.df_cabecalho.iloc[idx]
                 
                 resultado = f"📋 NOTA REGISTRO {idx + 1} (ÍNDICE {idx})\n\n"
-                for col, valor in nota.items():
+                for col, valor in self._campos_visiveis(nota):
                     resultado += f"{col}: {valor}\n"
                 
                 print(f"   ✅ Nota no índice {idx} encontrada")
@@ -390,7 +475,7 @@ Colunas do CFOP ({len(self.df_cfop.columns)}):
                 item = self.df_itens.iloc[idx]
                 
                 resultado = f"📦 ITEM REGISTRO {idx + 1} (ÍNDICE {idx})\n\n"
-                for col, valor in item.items():
+                for col, valor in self._campos_visiveis(item):
                     resultado += f"{col}: {valor}\n"
                 
                 # Destacar o CFOP
@@ -419,7 +504,7 @@ Colunas do CFOP ({len(self.df_cfop.columns)}):
                 cfop = self.df_cfop.iloc[idx]
                 
                 resultado = f"📖 CFOP REGISTRO {idx + 1} (ÍNDICE {idx})\n\n"
-                for col, valor in cfop.items():
+                for col, valor in self._campos_visiveis(cfop):
                     resultado += f"{col}: {valor}\n"
                 
                 print(f"   ✅ CFOP no índice {idx} encontrado")
@@ -437,58 +522,19 @@ Colunas do CFOP ({len(self.df_cfop.columns)}):
             print(f"   🔍 Tool: buscar_nota_por_chave(chave_acesso={chave_acesso})")
             try:
                 # Limpar a chave de acesso (remover espaços, hífens, etc)
-                chave_limpa = str(chave_acesso).strip().replace(' ', '').replace('-', '').replace('.', '').replace("'", "")
+                chave_limpa = normalizar_chave(chave_acesso)
                 
                 print(f"      🔧 Chave de acesso limpa: {chave_limpa}")
                 print(f"      📏 Tamanho: {len(chave_limpa)} caracteres")
                 
-                # Tentar várias possíveis colunas onde a chave pode estar
-                possiveis_colunas = [
-                    'CHAVE DE ACESSO', 'CHAVE', 'CHAVE NF-E', 'CHAVE NFE',
-                    'CHAVE_ACESSO', 'NF-E CHAVE DE ACESSO', 'NFE_CHAVE', 'CHAVE_NFE'
-                ]
-                
-                # Verificar quais colunas existem no dataframe
-                colunas_disponiveis = self.df_cabecalho.columns.tolist()
-                print(f"      📋 Colunas disponíveis: {colunas_disponiveis}")
-                
-                nota_encontrada = None
-                coluna_encontrada = None
-                
-                # Tentar cada possível coluna
-                for coluna in possiveis_colunas:
-                    if coluna in colunas_disponiveis:
-                        print(f"      🔍 Tentando buscar na coluna: {coluna}")
-                        
-                        # Buscar com a chave limpa
-                        nota = self.df_cabecalho[
-                            self.df_cabecalho[coluna].astype(str).str.replace(' ', '').str.replace('-', '').str.replace('.', '').str.replace("'", "") == chave_limpa
-                        ]
-                        
-                        if not nota.empty:
-                            nota_encontrada = nota
-                            coluna_encontrada = coluna
-                            print(f"      ✅ Encontrada na coluna: {coluna}")
-                            break
-                
-                # Se não encontrou em colunas específicas, tentar em todas as colunas
+                colunas_disponiveis = self._colunas_visiveis(self.df_cabecalho)
+                coluna_encontrada = self.indice_chave.coluna
+                
+                # Busca O(1) no índice construído na inicialização
+                posicao = self.indice_chave.buscar(chave_limpa)
+                nota_encontrada = self.df_cabecalho.iloc[posicao] if posicao is not None else None
+                
                 if nota_encontrada is None:
-                    print(f"      🔍 Buscando em todas as colunas...")
-                    for coluna in colunas_disponiveis:
-                        try:
-                            nota = self.df_cabecalho[
-                                self.df_cabecalho[coluna].astype(str).str.replace(' ', '').str.replace('-', '').str.replace('.', '').str.replace("'", "").str.contains(chave_limpa, na=False, regex=False)
-                            ]
-                            
-                            if not nota.empty:
-                                nota_encontrada = nota
-                                coluna_encontrada = coluna
-                                print(f"      ✅ Encontrada na coluna: {coluna}")
-                                break
-                        except:
-                            continue
-                
-                if nota_encontrada is None or nota_encontrada.empty:
                     # Mostrar as primeiras chaves disponíveis para debug
                     resultado = f"❌ Nota com chave de acesso não encontrada.\n\n"
                     resultado += f"🔍 Chave procurada (limpa): {chave_limpa}\n"
@@ -498,23 +544,20 @@ Colunas do CFOP ({len(self.df_cfop.columns)}):
                         resultado += f"   - {col}\n"
                     
                     # Tentar mostrar alguns exemplos de chaves que existem
-                    resultado += f"\n💡 Exemplos de valores nas colunas (primeiras 3 notas):\n"
-                    for coluna in possiveis_colunas:
-                        if coluna in colunas_disponiveis:
-                            exemplos = self.df_cabecalho[coluna].dropna().head(3)
-                            if not exemplos.empty:
-                                resultado += f"\n📌 Coluna '{coluna}':\n"
-                                for i, ex in enumerate(exemplos, 1):
-                                    resultado += f"   {i}. {ex}\n"
-                                break
+                    if coluna_encontrada:
+                        exemplos = self.df_cabecalho[coluna_encontrada].dropna().head(3)
+                        if not exemplos.empty:
+                            resultado += f"\n💡 Exemplos de valores nas colunas (primeiras 3 notas):\n"
+                            resultado += f"\n📌 Coluna '{coluna_encontrada}':\n"
+                            for i, ex in enumerate(exemplos, 1):
+                                resultado += f"   {i}. {ex}\n"
                     
                     return resultado
                 
                 resultado = f"✅ NOTA FISCAL ENCONTRADA\n"
                 resultado += f"   (Chave encontrada na coluna: '{coluna_encontrada}')\n\n"
                 
-                for col in nota_encontrada.columns:
-                    valor = nota_encontrada.iloc[0][col]
+                for col, valor in self._campos_visiveis(nota_encontrada):
                     resultado += f"{col}: {valor}\n"
                 
                 print(f"   ✅ Nota encontrada pela chave de acesso")
@@ -529,13 +572,12 @@ Colunas do CFOP ({len(self.df_cfop.columns)}):
             """Busca informações de cabeçalho de uma nota fiscal pelo número"""
             print(f"   🔍 Tool: buscar_nota_cabecalho(numero_nota={numero_nota})")
             try:
-                nota = self.df_cabecalho[self.df_cabecalho['NÚMERO'].astype(str) == str(numero_nota)]
+                nota = self.indice_notas.cabecalhos_numero(numero_nota)
                 if nota.empty:
                     return f"❌ Nota {numero_nota} não encontrada no cabeçalho."
                 
                 resultado = f"📋 NOTA FISCAL Nº {numero_nota}\n\n"
-                for col in nota.columns:
-                    valor = nota.iloc[0][col]
+                for col, valor in self._campos_visiveis(nota.iloc[0]):
                     resultado += f"{col}: {valor}\n"
                 
                 print(f"   ✅ Encontrada nota {numero_nota}")
@@ -548,7 +590,7 @@ Colunas do CFOP ({len(self.df_cfop.columns)}):
             """Busca todos os itens de uma nota fiscal pelo número"""
             print(f"   🔍 Tool: buscar_itens_nota(numero_nota={numero_nota})")
             try:
-                itens = self.df_itens[self.df_itens['NÚMERO'].astype(str) == str(numero_nota)]
+                itens = self.indice_notas.itens_numero(numero_nota)
                 if itens.empty:
                     return f"❌ Nenhum item encontrado para nota {numero_nota}."
                 
@@ -559,7 +601,7 @@ Colunas do CFOP ({len(self.df_cfop.columns)}):
                     resultado += f"\n{'='*60}\n"
                     resultado += f"ITEM {idx + 1}\n"
                     resultado += f"{'='*60}\n"
-                    for col, valor in item.items():
+                    for col, valor in self._campos_visiveis(item):
                         resultado += f"{col}: {valor}\n"
                 
                 print(f"   ✅ Encontrados {len(itens)} itens")
@@ -577,35 +619,29 @@ Colunas do CFOP ({len(self.df_cfop.columns)}):
                 # Formatar o CFOP para o padrão do CSV
                 cfop_formatado = self._formatar_cfop_para_busca(codigo_cfop)
                 
-                # Buscar o CFOP formatado
-                cfop = self.df_cfop[self.df_cfop['CFOP'].astype(str) == cfop_formatado]
+                # Buscar no catálogo pelo CFOP normalizado (somente dígitos)
+                cfop = self.catalogo_cfop.buscar(codigo_cfop)
                 
-                if cfop.empty:
-                    # Tentar busca alternativa sem formatação
-                    cfop_limpo = str(codigo_cfop).strip().replace('.', '').replace(',', '').replace(' ', '')
-                    cfop = self.df_cfop[self.df_cfop['CFOP'].astype(str).str.replace('.', '').str.replace(',', '').str.replace(' ', '') == cfop_limpo]
+                if cfop is None:
+                    # Mostrar CFOPs disponíveis próximos (mesmo prefixo)
+                    prefixo, sugestoes = self.catalogo_cfop.sugestoes(codigo_cfop)
                     
-                    if cfop.empty:
-                        # Mostrar CFOPs disponíveis próximos
-                        primeiro_digito = cfop_limpo[0] if cfop_limpo else ''
-                        sugestoes = self.df_cfop[self.df_cfop['CFOP'].astype(str).str.startswith(primeiro_digito)].head(5)
-                        
-                        resultado = f"❌ CFOP {codigo_cfop} (formatado: {cfop_formatado}) não encontrado na tabela.\n\n"
-                        
-                        if not sugestoes.empty:
-                            resultado += f"💡 CFOPs que começam com '{primeiro_digito}':\n"
-                            for _, row in sugestoes.iterrows():
-                                resultado += f"   - {row['CFOP']}\n"
-                        
-                        return resultado
+                    resultado = f"❌ CFOP {codigo_cfop} (formatado: {cfop_formatado}) não encontrado na tabela.\n\n"
+                    
+                    if sugestoes:
+                        resultado += f"💡 CFOPs que começam com '{prefixo}':\n"
+                        for sugestao in sugestoes:
+                            resultado += f"   - {sugestao['CFOP']}: {sugestao.get('DESCRIÇÃO', '')}\n"
+                    
+                    return resultado
                 
                 resultado = f"📖 CFOP {codigo_cfop}\n"
-                resultado += f"   (Formato no sistema: {cfop.iloc[0]['CFOP']})\n\n"
+                resultado += f"   (Formato no sistema: {cfop['CFOP']})\n\n"
                 
-                for col, valor in cfop.iloc[0].items():
+                for col, valor in cfop.items():
                     resultado += f"{col}: {valor}\n"
                 
-                print(f"   ✅ CFOP encontrado: {cfop.iloc[0]['CFOP']}")
+                print(f"   ✅ CFOP encontrado: {cfop['CFOP']}")
                 return resultado
                 
             except Exception as e:
@@ -617,68 +653,37 @@ Colunas do CFOP ({len(self.df_cfop.columns)}):
             """Valida CFOP de todas as notas e retorna um resumo"""
             print(f"   🔍 Tool: validar_todas_notas()")
             try:
-                divergencias = []
-                total_itens = 0
-                
-                # Limitar a 100 para performance
-                itens_para_validar = self.df_itens.head(100)
-                
-                for _, item in itens_para_validar.iterrows():
-                    total_itens += 1
-                    numero_nota = str(item.get('NÚMERO', ''))
-                    cfop_item = str(item.get('CFOP', ''))
-                    
-                    cabecalho = self.df_cabecalho[
-                        self.df_cabecalho['NÚMERO'].astype(str) == numero_nota
-                    ]
-                    
-                    if not cabecalho.empty:
-                        natureza = str(cabecalho.iloc[0].get('NATUREZA DA OPERAÇÃO', ''))
-                        uf_emit = str(cabecalho.iloc[0].get('UF EMITENTE', ''))
-                        uf_dest = str(cabecalho.iloc[0].get('UF DESTINATÁRIO', ''))
-                        destino_op = str(cabecalho.iloc[0].get('DESTINO DA OPERAÇÃO', ''))
-                        
-                        primeiro_digito_esperado = self._inferir_primeiro_digito(
-                            natureza, uf_emit, uf_dest, destino_op
-                        )
-                        
-                        # Extrair primeiro dígito do CFOP (pode estar no formato X.YYY)
-                        cfop_limpo = cfop_item.replace('.', '').replace(',', '').replace(' ', '')
-                        primeiro_digito_atual = cfop_limpo[0] if cfop_limpo and len(cfop_limpo) > 0 else "?"
-                        
-                        if primeiro_digito_esperado != primeiro_digito_atual:
-                            divergencias.append({
-                                'nota': numero_nota,
-                                'cfop_atual': cfop_item,
-                                'esperado': f"{primeiro_digito_esperado}xxx",
-                                'natureza': natureza,
-                                'uf_emit': uf_emit,
-                                'uf_dest': uf_dest
-                            })
+                # Todos os itens, validados em lote e lidos do repositório SQLite;
+                # ainda não gravados: informa o progresso do job de validação
+                repositorio = self.motor_validacao.persistido()
+                if repositorio is None:
+                    return self._progresso_validacao()
+                resumo = resumir_contagens(repositorio.contagens())
+                total_divergencias = resumo['divergencias_primeiro_digito'] + resumo['divergencias_ultimos_digitos']
+                total_criticas = resumo['divergencias_primeiro_digito']
+                criticas = repositorio.consultar(limite=10, tipo=TIPO_PRIMEIRO_DIGITO)
                 
                 resultado = f"✅ VALIDAÇÃO COMPLETA\n\n"
-                resultado += f"Total de itens analisados: {total_itens}\n"
-                resultado += f"Divergências encontradas: {len(divergencias)}\n"
-                
-                if total_itens > 0:
-                    taxa_conformidade = ((total_itens - len(divergencias)) / total_itens * 100)
-                    resultado += f"Taxa de conformidade: {taxa_conformidade:.1f}%\n\n"
-                
-                if divergencias:
-                    resultado += "❌ DIVERGÊNCIAS ENCONTRADAS:\n\n"
-                    for i, d in enumerate(divergencias[:10], 1):
-                        resultado += f"{i}. Nota {d['nota']}:\n"
-                        resultado += f"   CFOP atual: {d['cfop_atual']}\n"
-                        resultado += f"   CFOP esperado: {d['esperado']}\n"
-                        resultado += f"   Natureza: {d['natureza']}\n"
-                        resultado += f"   Rota: {d['uf_emit']} → {d['uf_dest']}\n\n"
+                resultado += f"Total de itens analisados: {resumo['total_itens']}\n"
+                if resumo['sem_cabecalho']:
+                    resultado += f"Itens sem cabeçalho correspondente: {resumo['sem_cabecalho']}\n"
+                resultado += f"Divergências encontradas: {total_divergencias}\n"
+                resultado += f"   ❌ Primeiro dígito (crítico): {resumo['divergencias_primeiro_digito']}\n"
+                resultado += f"   ⚠️ Últimos dígitos: {resumo['divergencias_ultimos_digitos']}\n"
+                
+                if resumo['itens_validados'] > 0:
+                    resultado += f"Taxa de conformidade: {resumo['taxa_conformidade']:.1f}%\n\n"
+                
+                if not criticas.empty:
+                    resultado += "❌ DIVERGÊNCIAS CRÍTICAS ENCONTRADAS:\n\n"
+                    resultado += self._formatar_divergencias(criticas)
                     
-                    if len(divergencias) > 10:
-                        resultado += f"\n... e mais {len(divergencias) - 10} divergências.\n"
-                else:
+                    if total_criticas > 10:
+                        resultado += f"\n... e mais {total_criticas - 10} divergências críticas.\n"
+                elif total_divergencias == 0:
                     resultado += "✅ Todos os CFOPs verificados estão corretos!\n"
                 
-                print(f"   ✅ Validação concluída: {len(divergencias)} divergências")
+                print(f"   ✅ Validação concluída: {total_divergencias} divergências")
                 return resultado
                 
             except Exception as e:
@@ -686,6 +691,49 @@ Colunas do CFOP ({len(self.df_cfop.columns)}):
                 traceback.print_exc()
                 return f"Erro na validação: {str(e)}"
         
+        def buscar_divergencias(emitente: str = "", uf_emitente: str = "", uf_destinatario: str = "",
+                                cfop: str = "", numero_nota: str = "", limite: int = 10) -> str:
+            """Lista divergências de CFOP filtradas por emitente, UFs, CFOP ou número da nota.
+            
+            Args:
+                emitente: CPF/CNPJ do emitente (opcional)
+                uf_emitente: UF do emitente, ex.: SP (opcional)
+                uf_destinatario: UF do destinatário, ex.: RJ (opcional)
+                cfop: CFOP registrado no item, em qualquer formato (opcional)
+                numero_nota: número da nota (opcional)
+                limite: quantas divergências listar (padrão: 10)
+            """
+            print(f"   🔍 Tool: buscar_divergencias(emitente='{emitente}', uf='{uf_emitente}→{uf_destinatario}', cfop='{cfop}', nota='{numero_nota}')")
+            try:
+                # Consulta indexada no repositório (não revalida nada)
+                filtros = {
+                    'tipo': [TIPO_PRIMEIRO_DIGITO, TIPO_ULTIMOS_DIGITOS],
+                    'emitente': emitente.strip() or None,
+                    'uf_emit': uf_emitente.strip().upper() or None,
+                    'uf_dest': uf_destinatario.strip().upper() or None,
+                    'cfop': normalizar_cfop(cfop) if cfop.strip() else None,
+                    'numero': numero_nota.strip() or None,
+                }
+                repositorio = self.motor_validacao.persistido()
+                if repositorio is None:
+                    return self._progresso_validacao()
+                total = repositorio.contar(**filtros)
+                if total == 0:
+                    return "✅ Nenhuma divergência encontrada com esses filtros."
+                
+                limite = max(1, int(limite))
+                divergencias = repositorio.consultar(limite=limite, **filtros)
+                resultado = f"⚠️ {total} DIVERGÊNCIAS ENCONTRADAS\n\n"
+                resultado += self._formatar_divergencias(divergencias)
+                if total > limite:
+                    resultado += f"\n... e mais {total - limite} divergências.\n"
+                return resultado
+                
+            except Exception as e:
+                print(f"   ❌ Erro: {e}")
+                traceback.print_exc()
+                return f"Erro ao buscar divergências: {str(e)}"
+        
         # FUNÇÃO PRINCIPAL: Validar CFOP de item específico
         # MUDANÇA CHAVE: Usar StructuredTool ao invés de Tool com args_schema
         def validar_cfop_item_especifico(chave_acesso: str, numero_item: str) -> str:
@@ -702,155 +750,67 @@ Colunas do CFOP ({len(self.df_cfop.columns)}):
             
             try:
                 # Limpar chave de acesso
-                chave_limpa = str(chave_acesso).strip().replace(' ', '').replace('-', '').replace('.', '').replace("'", "")
+                chave_limpa = normalizar_chave(chave_acesso)
                 
                 # Converter número do item (pode vir como "1", "primeiro", "item 1", etc)
-                numero_item_str = str(numero_item).lower().strip()
-                
-                # Extrair número
-                numeros = re.findall(r'\d+', numero_item_str)
-                if numeros:
-                    item_numero = int(numeros[0])
-                else:
-                    # Tentar palavras por extenso
-                    palavras_numericas = {
-                        'primeiro': 1, 'primeira': 1,
-                        'segundo': 2, 'segunda': 2,
-                        'terceiro': 3, 'terceira': 3,
-                        'quarto': 4, 'quarta': 4,
-                        'quinto': 5, 'quinta': 5,
-                        'sexto': 6, 'sexta': 6,
-                        'sétimo': 7, 'sétima': 7,
-                        'oitavo': 8, 'oitava': 8,
-                        'nono': 9, 'nona': 9,
-                        'décimo': 10, 'décima': 10
-                    }
-                    item_numero = palavras_numericas.get(numero_item_str, 1)
+                item_numero = interpretar_numero_item(numero_item)
                 
                 print(f"      🔢 Número do item: {item_numero}")
                 
                 # ==================================================================
                 # BUSCAR NOTA PELO CHAVE DE ACESSO
                 # ==================================================================
-                possiveis_colunas_chave = [
-                    'CHAVE DE ACESSO', 'CHAVE', 'CHAVE NF-E', 'CHAVE NFE',
-                    'CHAVE_ACESSO', 'NF-E CHAVE DE ACESSO', 'NFE_CHAVE', 'CHAVE_NFE'
-                ]
-                
-                nota_encontrada = None
-                for coluna in possiveis_colunas_chave:
-                    if coluna in self.df_cabecalho.columns:
-                        nota = self.df_cabecalho[
-                            self.df_cabecalho[coluna].astype(str).str.replace(' ', '').str.replace('-', '').str.replace('.', '').str.replace("'", "") == chave_limpa
-                        ]
-                        if not nota.empty:
-                            nota_encontrada = nota.iloc[0]
-                            break
+                posicao = self.indice_chave.buscar(chave_limpa)
+                nota_encontrada = self.df_cabecalho.iloc[posicao] if posicao is not None else None
                 
                 if nota_encontrada is None:
                     return f"❌ Nota com chave {chave_acesso} não encontrada no arquivo de cabeçalho."
                 
                 numero_nota = str(nota_encontrada.get('NÚMERO', ''))
+                nota_id = nota_encontrada.get(COLUNA_NOTA, '')
                 print(f"      ✅ Nota encontrada: {numero_nota}")
                 
                 # ==================================================================
-                # BUSCAR ITENS DA NOTA
+                # BUSCAR ITENS DA NOTA (fatia do índice, O(1))
                 # ==================================================================
-                itens_nota = self.df_itens[self.df_itens['NÚMERO'].astype(str) == numero_nota]
+                total_itens_nota = self.indice_notas.quantidade_itens(nota_id)
                 
-                if itens_nota.empty:
+                if total_itens_nota == 0:
                     return f"❌ Nenhum item encontrado para a nota {numero_nota}."
                 
-                if item_numero < 1 or item_numero > len(itens_nota):
-                    return f"❌ Item {item_numero} não existe. A nota tem {len(itens_nota)} itens."
+                if item_numero < 1 or item_numero > total_itens_nota:
+                    return f"❌ Item {item_numero} não existe. A nota tem {total_itens_nota} itens."
                 
-                # Pegar o item específico (item_numero - 1 porque índice começa em 0)
-                item = itens_nota.iloc[item_numero - 1]
+                item = self.indice_notas.item(nota_id, item_numero)
                 cfop_registrado = str(item.get('CFOP', '')).strip()
                 
                 print(f"      📦 Item {item_numero} encontrado")
                 print(f"      🏷️ CFOP registrado: {cfop_registrado}")
                 
                 # ==================================================================
-                # PASSO 1: IDENTIFICAR TIPO DE OPERAÇÃO (ENTRADA OU SAÍDA)
+                # PASSOS 1 A 4: PRIMEIRO DÍGITO (ÂMBITO + ENTRADA/SAÍDA) E
+                # ÚLTIMOS DÍGITOS (NATUREZA), PELAS MESMAS REGRAS DO MOTOR
                 # ==================================================================
                 natureza = str(nota_encontrada.get('NATUREZA DA OPERAÇÃO', '')).upper()
-                
-                is_entrada = any(palavra in natureza for palavra in 
-                                ['ENTRADA', 'COMPRA', 'DEVOLUÇÃO', 'DEV', 'AQUISIÇÃO'])
-                is_saida = any(palavra in natureza for palavra in 
-                              ['VENDA', 'REMESSA', 'RETORNO']) and 'DEV' not in natureza and 'DEVOLUÇÃO' not in natureza
-                
-                tipo_operacao = "ENTRADA" if is_entrada else "SAÍDA"
-                
-                # ==================================================================
-                # PASSO 2: DETERMINAR ÂMBITO DA OPERAÇÃO
-                # ==================================================================
                 uf_emitente = str(nota_encontrada.get('UF EMITENTE', '')).strip()
                 uf_destinatario = str(nota_encontrada.get('UF DESTINATÁRIO', '')).strip()
-                destino_operacao = str(nota_encontrada.get('DESTINO DA OPERAÇÃO', '')).strip()
-                
-                # Determinar primeiro dígito
-                if '1 - OPERAÇÃO INTERNA' in destino_operacao or uf_emitente == uf_destinatario:
-                    ambito = "INTERNA"
-                    primeiro_digito = '1' if is_entrada else '5'
-                elif '2 - OPERAÇÃO INTERESTADUAL' in destino_operacao or (uf_emitente != uf_destinatario and uf_destinatario):
-                    ambito = "INTERESTADUAL"
-                    primeiro_digito = '2' if is_entrada else '6'
-                elif '3 - OPERAÇÃO COM EXTERIOR' in destino_operacao:
-                    ambito = "EXTERIOR"
-                    primeiro_digito = '3' if is_entrada else '7'
-                else:
-                    ambito = "INDEFINIDO"
-                    primeiro_digito = '?'
                 
-                # ==================================================================
-                # PASSO 3 e 4: IDENTIFICAR NATUREZA ESPECÍFICA E CAMPOS COMPLEMENTARES
-                # ==================================================================
+                digitos, ultimos = inferir_cfop_esperado(self.df_cabecalho.iloc[[posicao]])
+                primeiro_digito, ultimos_digitos = str(digitos[0]), str(ultimos[0])
+                ambito = AMBITO_POR_DIGITO.get(primeiro_digito, "INDEFINIDO")
+                
+                # Tipo de operação e justificativa pela tabela de regras ativa
+                classificacao = regras_ativas().classificar(natureza)
+                tipo_operacao = classificacao.tipo_operacao
+                justificativa = classificacao.justificativa
+                
                 consumidor_final = str(nota_encontrada.get('CONSUMIDOR FINAL', '')).strip()
                 indicador_ie = str(nota_encontrada.get('INDICADOR IE DESTINATÁRIO', '')).strip()
                 
-                # Determinar os últimos 3 dígitos baseado na natureza
-                ultimos_digitos = None
-                justificativa = ""
-                
-                # DEVOLUÇÕES
-                if any(palavra in natureza for palavra in ['DEV', 'DEVOLUÇÃO']):
-                    if 'REMESSA' in natureza:
-                        ultimos_digitos = '949'
-                        justificativa = "Devolução de remessa"
-                    else:
-                        ultimos_digitos = '202'
-                        justificativa = "Devolução de compra/venda"
-                
-                # VENDAS/COMPRAS
-                elif 'VENDA' in natureza or 'COMPRA' in natureza or 'AQUISIÇÃO' in natureza:
-                    if 'NÃO CONTRIBUINTE' in indicador_ie or 'CONSUMIDOR FINAL' in consumidor_final:
-                        ultimos_digitos = '102'
-                        justificativa = "Venda/Compra para não contribuinte ou consumidor final"
-                    else:
-                        ultimos_digitos = '102'
-                        justificativa = "Venda/Compra de mercadoria"
-                
-                # REMESSAS
-                elif 'REMESSA' in natureza:
-                    if 'DEMONSTRAÇÃO' in natureza:
-                        ultimos_digitos = '912'
-                        justificativa = "Remessa para demonstração"
-                    elif 'CONSERTO' in natureza or 'REPARO' in natureza:
-                        ultimos_digitos = '915'
-                        justificativa = "Remessa para conserto/reparo"
-                    elif 'COMODATO' in natureza:
-                        ultimos_digitos = '908'
-                        justificativa = "Remessa em comodato"
-                    else:
-                        ultimos_digitos = '949'
-                        justificativa = "Outra remessa"
-                
-                # OUTRAS OPERAÇÕES
-                else:
-                    ultimos_digitos = '949'
-                    justificativa = "Outra operação não especificada"
+                if classificacao.categoria == CATEGORIA_VENDA_COMPRA and (
+                    'NÃO CONTRIBUINTE' in indicador_ie or 'CONSUMIDOR FINAL' in consumidor_final
+                ):
+                    justificativa = "Venda/Compra para não contribuinte ou consumidor final"
                 
                 # ==================================================================
                 # PASSO 5: MONTAR CFOP INFERIDO
@@ -866,8 +826,8 @@ Colunas do CFOP ({len(self.df_cfop.columns)}):
                 # PASSO 6: COMPARAR E GERAR RELATÓRIO
                 # ==================================================================
                 # Normalizar CFOPs para comparação
-                cfop_registrado_limpo = cfop_registrado.replace('.', '').replace(',', '').replace(' ', '')
-                cfop_inferido_limpo = cfop_inferido.replace('.', '').replace(',', '').replace(' ', '')
+                cfop_registrado_limpo = item.get(COLUNA_CFOP, '')
+                cfop_inferido_limpo = normalizar_cfop(cfop_inferido)
                 
                 # Comparar primeiro dígito (mais importante)
                 primeiro_digito_registrado = cfop_registrado_limpo[0] if cfop_registrado_limpo else '?'
@@ -980,14 +940,8 @@ Colunas do CFOP ({len(self.df_cfop.columns)}):
                 for idx, (cfop, count) in enumerate(cfop_counts.head(n).items(), 1):
                     percentual = (count / len(self.df_itens)) * 100
                     
-                    # Buscar descrição do CFOP inline
-                    cfop_formatado = self._formatar_cfop_para_busca(str(cfop))
-                    cfop_info = self.df_cfop[self.df_cfop['CFOP'].astype(str) == cfop_formatado]
-                    
-                    if not cfop_info.empty:
-                        descricao = cfop_info.iloc[0].get('DESCRIÇÃO', 'Descrição não encontrada')
-                    else:
-                        descricao = 'Descrição não encontrada na tabela'
+                    # Descrição via catálogo (dicionário por código)
+                    descricao = self.catalogo_cfop.descricao(cfop)
                     
                     resultado += f"{idx}. CFOP {cfop}\n"
                     resultado += f"   📦 Quantidade: {count} itens ({percentual:.1f}%)\n"
@@ -1061,11 +1015,21 @@ Colunas do CFOP ({len(self.df_cfop.columns)}):
                 traceback.print_exc()
                 return f"Erro ao analisar naturezas: {str(e)}"
         
-        def calcular_estatisticas_valores(dummy: str = "") -> str:
-            """Calcula estatísticas sobre os valores das notas fiscais"""
-            print(f"   🔍 Tool: calcular_estatisticas_valores()")
+        def calcular_estatisticas_valores(modo: str = "") -> str:
+            """Calcula estatísticas sobre os valores das notas fiscais (modo
+            aproximado por sketches se pedido ou acima do limite de notas)"""
+            print(f"   🔍 Tool: calcular_estatisticas_valores(modo='{modo}')")
             try:
-                valores = self.df_cabecalho['VALOR NOTA FISCAL'].dropna()
+                aproximado = (
+                    'aprox' in str(modo).lower()
+                    or len(self.df_cabecalho) >= settings.estatisticas_aproximadas_min_notas
+                )
+                if aproximado:
+                    return estatisticas_valores_aproximadas()
+                
+                if self.coluna_valor_nota is None:
+                    return "❌ Coluna de valor da nota não encontrada no cabeçalho"
+                valores = self.df_cabecalho[self.coluna_valor_nota].dropna()
                 
                 resultado = "💰 ESTATÍSTICAS DE VALORES DAS NOTAS\n"
                 resultado += f"{'='*70}\n"
@@ -1086,6 +1050,32 @@ Colunas do CFOP ({len(self.df_cfop.columns)}):
                 traceback.print_exc()
                 return f"Erro ao calcular estatísticas: {str(e)}"
         
+        def estatisticas_valores_aproximadas() -> str:
+            """Mesmas estatísticas a partir dos sketches mensais, com erro declarado"""
+            r = self.sketches.consultar()
+            valores = r['valores']
+            mediana = next(q for q in valores['quantis'] if q['q'] == 0.5)
+            emitentes = r['emitentes_distintos']
+            
+            resultado = "💰 ESTATÍSTICAS DE VALORES DAS NOTAS (modo aproximado)\n"
+            resultado += f"{'='*70}\n"
+            resultado += f"Total de notas: {r['notas_com_valor']}\n\n"
+            resultado += f"Valor Total: R$ {valores['total']:,.2f}\n"
+            resultado += f"Valor Médio: R$ {valores['media']:,.2f}\n"
+            resultado += (f"Valor Mediano: ~R$ {mediana['estimativa']:,.2f} "
+                          f"(entre R$ {mediana['inferior']:,.2f} e R$ {mediana['superior']:,.2f})\n")
+            resultado += f"Valor Mínimo: R$ {valores['minimo']:,.2f}\n"
+            resultado += f"Valor Máximo: R$ {valores['maximo']:,.2f}\n"
+            resultado += f"Desvio Padrão: R$ {valores['desvio_padrao']:,.2f}\n"
+            resultado += (f"Emitentes distintos: ~{emitentes['estimativa']} "
+                          f"(±{emitentes['erro_relativo'] * 100:.1f}%)\n")
+            resultado += f"\nCFOPs mais frequentes (erro máximo: +{r['cfops_erro_maximo']} itens):\n"
+            for linha in r['cfops_frequentes'][:5]:
+                resultado += f"  • {linha['valor']}: ~{linha['estimativa']} itens\n"
+            
+            print(f"   ✅ Estatísticas aproximadas em {r['milissegundos']}ms")
+            return resultado
+        
         # LISTA DE FERRAMENTAS
         # MUDANÇA CHAVE: Usar StructuredTool para a função com 2 parâmetros
         tools = [
@@ -1137,7 +1127,12 @@ Colunas do CFOP ({len(self.df_cfop.columns)}):
             Tool(
                 name="validar_todas_notas",
                 func=validar_todas_notas,
-                description="Valida o CFOP de todas as notas carregadas (até 100 primeiras) e retorna um resumo completo com divergências encontradas. Use para análise geral de conformidade."
+                description="Valida o CFOP de todos os itens de todas as notas carregadas e retorna um resumo completo com as divergências encontradas (enquanto a validação em segundo plano não termina, informa o progresso dela). Use para análise geral de conformidade."
+            ),
+            StructuredTool.from_function(
+                func=buscar_divergencias,
+                name="buscar_divergencias",
+                description="Lista divergências de CFOP já validadas, filtrando por emitente (CPF/CNPJ), uf_emitente, uf_destinatario, cfop e/ou numero_nota. Todos os filtros são opcionais. Use quando perguntarem por divergências de um emitente, estado, CFOP ou nota específicos."
             ),
             # MUDANÇA CHAVE: Usar StructuredTool ao invés de Tool com args_schema
             StructuredTool.from_function(
@@ -1164,7 +1159,7 @@ Colunas do CFOP ({len(self.df_cfop.columns)}):
             Tool(
                 name="calcular_estatisticas_valores",
                 func=calcular_estatisticas_valores,
-                description="Calcula estatísticas completas sobre os valores das notas fiscais (total, média, mediana, mínimo, máximo, desvio padrão). Use quando perguntarem sobre valores, montantes, estatísticas financeiras."
+                description="Calcula estatísticas completas sobre os valores das notas fiscais (total, média, mediana, mínimo, máximo, desvio padrão). Use quando perguntarem sobre valores, montantes, estatísticas financeiras. Passe 'aproximado' para a resposta instantânea por sketches (com margem de erro, inclui emitentes distintos e CFOPs mais frequentes)."
             )
         ]
         
@@ -1185,24 +1180,47 @@ Colunas do CFOP ({len(self.df_cfop.columns)}):
         
         return tools
     
-    def _inferir_primeiro_digito(self, natureza: str, uf_emit: str, 
-                                  uf_dest: str, destino_op: str) -> str:
-        """Infere o primeiro dígito do CFOP baseado nas regras"""
-        natureza = natureza.upper()
-        
-        is_entrada = any(palavra in natureza for palavra in 
-                        ['ENTRADA', 'COMPRA', 'DEVOLUÇÃO', 'DEV'])
-        is_saida = any(palavra in natureza for palavra in 
-                      ['VENDA', 'REMESSA']) and 'DEV' not in natureza
-        
-        if '1 - OPERAÇÃO INTERNA' in destino_op or uf_emit == uf_dest:
-            return '1' if is_entrada else '5'
-        elif '2 - OPERAÇÃO INTERESTADUAL' in destino_op or uf_emit != uf_dest:
-            return '2' if is_entrada else '6'
-        elif '3 - OPERAÇÃO COM EXTERIOR' in destino_op:
-            return '3' if is_entrada else '7'
+    def _formatar_divergencias(self, divergencias: pd.DataFrame) -> str:
+        """Texto numerado com as divergências (linhas do repositório)"""
+        resultado = ""
+        for i, d in enumerate(divergencias.itertuples(index=False), 1):
+            resultado += f"{i}. Nota {d.numero} (item {d.numero_item}):\n"
+            resultado += f"   CFOP atual: {d.cfop_atual}\n"
+            resultado += f"   CFOP esperado: {d.cfop_esperado}\n"
+            resultado += f"   Natureza: {d.natureza}\n"
+            resultado += f"   Rota: {d.uf_emit} → {d.uf_dest}\n\n"
+        return resultado
+    
+    def _progresso_validacao(self) -> str:
+        """Resultados desta versão ainda não gravados: acompanha o job de
+        validação em andamento (ou inicia um) e informa o progresso"""
+        job = self.gerenciador_jobs.validacao_do_agente(self).para_dict()
+        return (f"⏳ Validação completa em andamento (job {job['job_id'][:8]}): "
+                f"{job['itens_processados']} de {job['total_itens']} itens "
+                f"({job['percentual']:.0f}%). Tente novamente em instantes.")
+    
+    def _responder_sem_llm(self, pergunta: str) -> Optional[str]:
+        """Resposta da ferramenta reconhecida pelo roteador de intenções, ou
+        None (nada reconhecido, roteador desligado ou falha na ferramenta)"""
+        if not settings.roteador_intencoes:
+            return None
+        intencao = identificar_intencao(pergunta)
+        if intencao is None:
+            return None
         
-        return '?'
+        ferramenta = next((t for t in self.tools if t.name == intencao.ferramenta), None)
+        if ferramenta is None:
+            return None
+        print(f"⚡ Rota direta ({intencao.regra}): {intencao.ferramenta}({intencao.argumentos}) — sem LLM")
+        try:
+            resposta = ferramenta.func(**intencao.argumentos)
+        except Exception as e:
+            print(f"   ⚠️ Rota direta falhou ({e}); enviando ao agente")
+            return None
+        if resposta_de_falha(resposta):
+            print("   ⚠️ Rota direta sem resposta útil; enviando ao agente")
+            return None
+        return resposta
     
     def processar_pergunta(self, pergunta: str) -> str:
         """Processa uma pergunta usando o agente"""
@@ -1212,6 +1230,11 @@ Colunas do CFOP ({len(self.df_cfop.columns)}):
         print(f"Pergunta: {pergunta}")
         print("="*70 + "\n")
         
+        # Perguntas mecânicas (chave, item, CFOP, contagens) vão direto à ferramenta
+        resposta_direta = self._responder_sem_llm(pergunta)
+        if resposta_direta is not None:
+            return resposta_direta
+        
         try:
             print("🤖 Enviando para o agente executor...")
             resultado = self.agent_executor.invoke({"input": pergunta})
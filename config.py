@@ -49,8 +49,44 @@ class Settings(BaseSettings):
     itens_csv: str = str(DATA_DIR / "202401_NFs_Itens.csv")
     cfop_csv: str = str(DATA_DIR / "CFOP.csv")
     
-    # Estatísticas
-    MAX_SAMPLE_SIZE: int = 200
+    # Snapshots Arrow dos dados já tipados (reutilizados no /api/inicializar)
+    snapshot_dir: str = str(DATA_DIR / "snapshots")
+    snapshot_max_idade_horas: float = 72
+    snapshot_max_mb: float = 2048
+    
+    # Validação em lote (/api/validacao/lote)
+    validacao_lote_max_pares: int = 200_000
+    
+    # Validação completa em processos: 1 = no próprio processo;
+    # particionamento "nota" (faixas de notas) ou "uf" (UF do emitente)
+    validacao_workers: int = 1
+    validacao_particionamento: str = "nota"
+    validacao_min_itens_paralelo: int = 2_000_000
+    
+    # Resultados da validação em SQLite (uma linha por item, sobrevive a reinícios);
+    # incremental: revalida só itens novos/alterados entre carregamentos
+    resultados_db: str = str(DATA_DIR / "resultados" / "validacao.db")
+    validacao_incremental: bool = True
+    
+    # Tabela declarativa de regras natureza -> CFOP (recarregável em /api/admin/regras)
+    regras_natureza_csv: str = str(Path(__file__).parent / "regras" / "regras_natureza.csv")
+    # Rotas /api/admin exigem este token no cabeçalho X-Admin-Token (vazio =
+    # sem token; aí a tabela só pode ser relida do arquivo, nunca substituída)
+    admin_token: str = ""
+    # Substituir a tabela enviando um CSV (o arquivo anterior vira .bak)
+    admin_permitir_envio_regras: bool = False
+    
+    # Estatísticas de valores por sketches (aproximadas, com erro declarado)
+    # a partir deste número de notas; abaixo dele, só se pedido
+    estatisticas_aproximadas_min_notas: int = 5_000_000
+    
+    # Chat: perguntas mecânicas (chave de acesso, item, CFOP, contagens)
+    # respondidas direto pelas ferramentas, sem passar pelo LLM
+    roteador_intencoes: bool = True
+    
+    # Jobs em segundo plano (/api/jobs)
+    jobs_workers: int = 1
+    jobs_max_retidos: int = 50
     
     # Server settings
     host: str = "0.0.0.0"
@@ -3,21 +3,25 @@
 Aplicação principal FastAPI - FiscalAI com Interface Web
 Suporte para Google Colab + ngrok
 """
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi import FastAPI, File, UploadFile, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import HTMLResponse, FileResponse
 import uvicorn
 import sys
 import os
-import shutil
+import hashlib
+import json
 from pathlib import Path
 
 # Importações locais
 from config import settings, DATA_DIR, IS_COLAB
 from models.schemas import HealthCheck
-from routes import chat_router, estatisticas_router, validacao_router
+from routes import chat_router, estatisticas_router, validacao_router, jobs_router, admin_router
+from routes.cache_http import responder_condicional
 from agente_cfop import AgenteValidadorCFOP
+from services.cache_snapshot import registrar_hash_arquivo, SUFIXO_HASH
+from services.jobs import GerenciadorJobs
 
 # ============================================================================
 # INICIALIZAÇÃO DA APLICAÇÃO
@@ -52,6 +56,10 @@ app.mount("/static", StaticFiles(directory=str(STATIC_DIR)), name="static")
 
 # Variável global para o agente
 agente = None
+gerenciador_jobs = GerenciadorJobs(
+    max_workers=settings.jobs_workers,
+    max_retidos=settings.jobs_max_retidos
+)
 arquivos_carregados = {
     "cabecalho": False,
     "itens": False,
@@ -110,13 +118,17 @@ async def health_check():
     )
 
 @app.get("/api/status-arquivos")
-async def status_arquivos():
+async def status_arquivos(request: Request, response: Response):
     """Retorna status dos arquivos carregados"""
-    return {
+    status = {
         "arquivos": arquivos_carregados,
         "todos_carregados": all(arquivos_carregados.values()),
         "agente_inicializado": agente is not None
     }
+    # ETag pelo próprio estado (e pela versão dos dados, se inicializado)
+    versao = agente.versao_dataset if agente is not None else ""
+    responder_condicional(request, response, f"{json.dumps(status, sort_keys=True)}:{versao}")
+    return status
 
 @app.post("/api/upload-csv")
 async def upload_csv(
@@ -149,10 +161,14 @@ async def upload_csv(
         )
     
     try:
-        # Salvar arquivo
+        # Salvar arquivo calculando o SHA-256 durante a cópia
         file_path = DATA_DIR / tipos_validos[tipo]
+        sha256 = hashlib.sha256()
         with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(arquivo.file, buffer)
+            for bloco in iter(lambda: arquivo.file.read(1024 * 1024), b""):
+                sha256.update(bloco)
+                buffer.write(bloco)
+        registrar_hash_arquivo(file_path, sha256.hexdigest())
         
         # Marcar como carregado
         arquivos_carregados[tipo] = True
@@ -171,7 +187,7 @@ async def upload_csv(
         )
 
 @app.post("/api/inicializar")
-async def inicializar_sistema():
+def inicializar_sistema():
     """
     Inicializa o agente CFOP com os arquivos CSV carregados
     """
@@ -188,18 +204,29 @@ async def inicializar_sistema():
     try:
         print("\n🚀 Inicializando sistema...")
         
+        # Resultados em cache do conjunto anterior deixam de valer e os jobs
+        # dele são cancelados (não seguram o agente antigo em memória)
+        if agente is not None:
+            gerenciador_jobs.cancelar_do_agente(agente)
+            agente.estatisticas.invalidar()
+        
         agente = AgenteValidadorCFOP(
             cabecalho_path=settings.cabecalho_csv,
             itens_path=settings.itens_csv,
-            cfop_path=settings.cfop_csv
+            cfop_path=settings.cfop_csv,
+            gerenciador_jobs=gerenciador_jobs
         )
         
+        # Validação completa em segundo plano (resultado fica em cache no agente)
+        job = gerenciador_jobs.iniciar_validacao(agente)
+        
         return {
             "status": "success",
             "mensagem": "Sistema inicializado com sucesso!",
             "total_notas": len(agente.df_cabecalho),
             "total_itens": len(agente.df_itens),
-            "total_cfops": len(agente.df_cfop)
+            "total_cfops": len(agente.df_cfop),
+            "job_validacao": job.id
         }
     except Exception as e:
         print(f"❌ Erro na inicialização: {e}")
@@ -215,6 +242,9 @@ async def resetar_sistema():
     """Reseta o sistema para novo upload de arquivos"""
     global agente, arquivos_carregados
     
+    gerenciador_jobs.cancelar_todos()
+    if agente is not None:
+        agente.estatisticas.invalidar()
     agente = None
     arquivos_carregados = {
         "cabecalho": False,
@@ -222,8 +252,8 @@ async def resetar_sistema():
         "cfop": False
     }
     
-    # Limpar arquivos
-    for arquivo in DATA_DIR.glob("*.csv"):
+    # Limpar arquivos (os snapshots ficam para um novo upload idêntico)
+    for arquivo in [*DATA_DIR.glob("*.csv"), *DATA_DIR.glob(f"*.csv{SUFIXO_HASH}")]:
         try:
             arquivo.unlink()
         except:
@@ -241,6 +271,8 @@ async def resetar_sistema():
 app.include_router(chat_router, prefix="/api")
 app.include_router(estatisticas_router, prefix="/api")
 app.include_router(validacao_router, prefix="/api")
+app.include_router(jobs_router, prefix="/api")
+app.include_router(admin_router, prefix="/api")
 
 # ============================================================================
 # EXECUÇÃO LOCAL (DESENVOLVIMENTO)
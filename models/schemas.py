@@ -3,7 +3,7 @@
 Schemas Pydantic para validação de dados
 """
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Union
 from datetime import datetime
 
 # ============================================================================
@@ -19,6 +19,15 @@ class ValidarCFOPRequest(BaseModel):
     chave_acesso: str = Field(..., min_length=44, max_length=44, description="Chave de acesso da nota")
     numero_item: str = Field(..., description="Número do item (1, 2, 3 ou 'primeiro', 'segundo')")
 
+class ParValidacao(BaseModel):
+    """Par (chave de acesso, item) para validação em lote"""
+    chave_acesso: str = Field(..., description="Chave de acesso da nota")
+    numero_item: Union[int, str] = Field(1, description="Número do item (1, 2, 3 ou 'primeiro', 'segundo')")
+
+class ValidacaoLoteRequest(BaseModel):
+    """Request para validação de vários itens de uma vez"""
+    itens: List[ParValidacao] = Field(..., min_length=1, description="Pares a validar")
+
 # ============================================================================
 # SCHEMAS DE RESPONSE
 # ============================================================================
@@ -40,6 +49,7 @@ class ResumoEstatisticas(BaseModel):
 class CFOPDistribuicao(BaseModel):
     """Distribuição de um CFOP"""
     cfop: str
+    descricao: str = ""
     quantidade: int
     percentual: float
 
@@ -67,15 +77,30 @@ class OperacoesUFResponse(BaseModel):
     operacoes: List[OperacaoUF]
 
 class TendenciaMensal(BaseModel):
-    """Tendência mensal"""
+    """Tendência mensal (pela data de emissão)"""
     mes: str
+    periodo: str
     notas: int
+    itens: int
+    valor: float
     divergencias: int
 
 class TendenciaMensalResponse(BaseModel):
     """Response com tendência mensal"""
     tendencia: List[TendenciaMensal]
 
+class TendenciaDiaria(BaseModel):
+    """Tendência diária (pela data de emissão)"""
+    dia: str
+    notas: int
+    itens: int
+    valor: float
+    divergencias: int
+
+class TendenciaDiariaResponse(BaseModel):
+    """Response com tendência diária"""
+    tendencia: List[TendenciaDiaria]
+
 class TopDivergencia(BaseModel):
     """Top divergência"""
     nota: str
@@ -87,6 +112,139 @@ class TopDivergenciasResponse(BaseModel):
     """Response com top divergências"""
     top_divergencias: List[TopDivergencia]
 
+class DashboardResponse(BaseModel):
+    """Painéis do dashboard numa única resposta (só os pedidos em fields=)"""
+    resumo: Optional[ResumoEstatisticas] = None
+    cfops: Optional[List[CFOPDistribuicao]] = None
+    divergencias: Optional[List[DivergenciaTipo]] = None
+    operacoes: Optional[List[OperacaoUF]] = None
+    tendencia: Optional[List[TendenciaMensal]] = None
+    top_divergencias: Optional[List[TopDivergencia]] = None
+
+class IntervaloEstimativa(BaseModel):
+    """Valor estimado e limites do intervalo de confiança"""
+    estimativa: float
+    inferior: float
+    superior: float
+
+class EstimativaConformidade(BaseModel):
+    """Estimativa por amostra estratificada (exato=True: resultado completo)"""
+    exato: bool
+    amostra: int
+    populacao: int
+    estratos: Optional[int] = None
+    confianca: float
+    taxa_conformidade: IntervaloEstimativa
+    divergencias_criticas: IntervaloEstimativa
+    divergencias_total: IntervaloEstimativa
+    milissegundos: float
+
+class TotaisCubo(BaseModel):
+    """Medidas somadas das células do cubo"""
+    itens: int
+    valor: float
+
+class CuboResponse(BaseModel):
+    """Fatia do cubo OLAP agregada pelas dimensões pedidas (cada linha traz
+    as dimensões de `agrupar` mais itens e valor)"""
+    filtros: Dict[str, List[str]]
+    agrupar: List[str]
+    total: TotaisCubo
+    grupos: int
+    linhas: List[Dict[str, Any]]
+    celulas_lidas: int
+    milissegundos: float
+
+class FaixaAproximada(BaseModel):
+    """Estimativa com limites de erro"""
+    estimativa: float
+    inferior: float
+    superior: float
+
+class QuantilAproximado(FaixaAproximada):
+    """Quantil do t-digest (erro_rank: erro máximo na posição, em fração)"""
+    q: float
+    erro_rank: float
+
+class ValoresAproximados(BaseModel):
+    """Valores das notas: momentos exatos e quantis aproximados"""
+    total: float
+    media: float
+    desvio_padrao: float
+    minimo: float
+    maximo: float
+    quantis: List[QuantilAproximado]
+    centroides: int
+
+class ContagemAproximada(BaseModel):
+    """Contagem estimada com limites de erro"""
+    estimativa: int
+    inferior: int
+    superior: int
+
+class DistintosAproximados(ContagemAproximada):
+    """Contagem de distintos do HyperLogLog"""
+    erro_relativo: float
+
+class CFOPFrequente(ContagemAproximada):
+    """Frequência aproximada de um CFOP (Count-Min)"""
+    valor: str
+
+class EstatisticasAproximadas(BaseModel):
+    """Estatísticas do modo aproximado (sketches mesclados dos meses pedidos)"""
+    meses: List[str]
+    notas_com_valor: int
+    valores: ValoresAproximados
+    emitentes_distintos: DistintosAproximados
+    destinatarios_distintos: DistintosAproximados
+    cfops_frequentes: List[CFOPFrequente]
+    cfops_erro_maximo: int
+    confianca: float
+    milissegundos: float
+
+class CacheEstatisticas(BaseModel):
+    """Contadores do cache de resultados das estatísticas"""
+    versao: Optional[str] = None
+    entradas: int
+    acertos: int
+    falhas: int
+    taxa_acerto: float
+
+# ============================================================================
+# SCHEMAS DE JOBS
+# ============================================================================
+
+class JobStatus(BaseModel):
+    """Estado e progresso de um job em segundo plano"""
+    job_id: str
+    tipo: str
+    status: str
+    criado_em: str
+    total_itens: int
+    itens_processados: int
+    percentual: float
+    divergencias: int
+    segundos_decorridos: Optional[float] = None
+    eta_segundos: Optional[float] = None
+    erro: Optional[str] = None
+
+class JobResultadosResponse(BaseModel):
+    """Página de resultados (divergências) de um job concluído"""
+    job_id: str
+    pagina: int
+    tamanho_pagina: int
+    total: int
+    total_paginas: int
+    resultados: List[Dict[str, Any]]
+
+class DivergenciasResponse(BaseModel):
+    """Página de divergências consultadas no repositório de resultados"""
+    pagina: int
+    tamanho_pagina: int
+    total: int
+    total_paginas: int
+    resultados: List[Dict[str, Any]]
+
 # ============================================================================
 # SCHEMAS DE STATUS
 # ============================================================================
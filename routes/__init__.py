@@ -2,5 +2,7 @@
 from routes.chat import router as chat_router
 from routes.estatisticas import router as estatisticas_router
 from routes.validacao import router as validacao_router
+from routes.jobs import router as jobs_router
+from routes.admin import router as admin_router
 
-__all__ = ['chat_router', 'estatisticas_router', 'validacao_router']
+__all__ = ['chat_router', 'estatisticas_router', 'validacao_router', 'jobs_router', 'admin_router']
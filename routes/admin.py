@@ -0,0 +1,86 @@
+# backend/routes/admin.py
+"""
+Rotas administrativas (tabela de regras natureza -> CFOP)
+"""
+import hmac
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, Query, Header
+from config import settings
+from services.classificador_natureza import TabelaRegras, benchmark, carregar_regras, regras_ativas
+
+def verificar_token(x_admin_token: Optional[str] = Header(None)):
+    """Dependency: com settings.admin_token definido, exige o mesmo valor em X-Admin-Token"""
+    if settings.admin_token and not hmac.compare_digest(x_admin_token or "", settings.admin_token):
+        raise HTTPException(status_code=401, detail="Token de administração inválido")
+
+router = APIRouter(prefix="/admin", tags=["Administração"], dependencies=[Depends(verificar_token)])
+
+def _guardar_copia(caminho: Path) -> Optional[str]:
+    """Cópia do arquivo de regras atual (regras_natureza.AAAAMMDD-HHMMSS.csv.bak)
+    antes de substituí-lo"""
+    if not caminho.exists():
+        return None
+    copia = caminho.with_name(f"{caminho.stem}.{time.strftime('%Y%m%d-%H%M%S')}{caminho.suffix}.bak")
+    shutil.copy2(caminho, copia)
+    print(f"   🗄️ Tabela de regras anterior guardada em {copia.name}")
+    return str(copia)
+
+@router.get("/regras")
+def obter_regras():
+    """
+    Tabela de regras ativa (versão, palavras de entrada e regras de sufixo)
+    """
+    return regras_ativas().para_dict()
+
+@router.post("/regras/recarregar")
+def recarregar_regras(arquivo: Optional[UploadFile] = File(None)):
+    """
+    Recarrega a tabela de regras sem reiniciar o processo: do arquivo
+    configurado ou, se enviado, de um novo CSV (validado antes de substituir;
+    exige admin_permitir_envio_regras e admin_token, e o arquivo anterior é
+    guardado como .bak). Com o sistema inicializado, dispara a revalidação
+    em segundo plano.
+    """
+    from main import agente, gerenciador_jobs
+    
+    if arquivo is not None and not (settings.admin_permitir_envio_regras and settings.admin_token):
+        raise HTTPException(
+            status_code=403,
+            detail="Envio de tabela de regras desabilitado (admin_permitir_envio_regras e admin_token)"
+        )
+    
+    caminho = Path(settings.regras_natureza_csv)
+    copia = None
+    try:
+        if arquivo is not None:
+            with tempfile.NamedTemporaryFile(suffix='.csv', delete=False) as temporario:
+                shutil.copyfileobj(arquivo.file, temporario)
+            try:
+                TabelaRegras.carregar(temporario.name)
+                caminho.parent.mkdir(parents=True, exist_ok=True)
+                copia = _guardar_copia(caminho)
+                shutil.move(temporario.name, caminho)
+            finally:
+                Path(temporario.name).unlink(missing_ok=True)
+        tabela = carregar_regras(caminho)
+    except (ValueError, OSError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"Tabela de regras inválida: {str(e)}")
+    
+    resposta = tabela.para_dict()
+    if copia is not None:
+        resposta["copia_anterior"] = copia
+    if agente is not None:
+        resposta["job_validacao"] = gerenciador_jobs.iniciar_validacao(agente).id
+    return resposta
+
+@router.get("/regras/benchmark")
+def benchmark_regras(linhas: int = Query(1_000_000, ge=1_000, le=20_000_000)):
+    """
+    Vazão do avaliador compilado da tabela ativa, em linhas por segundo
+    """
+    return benchmark(linhas)
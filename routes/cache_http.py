@@ -0,0 +1,52 @@
+# backend/routes/cache_http.py
+"""
+GET condicional: ETag derivado da versão dos dados (hash do conteúdo dos
+arquivos + tabela de regras) e Cache-Control para o navegador revalidar
+"""
+import hashlib
+from typing import Dict, Optional
+
+from fastapi import HTTPException, Request, Response
+
+# Mudou o formato de alguma resposta? Troque a versão para invalidar os
+# ETags já guardados pelos navegadores
+VERSAO_API = "1"
+
+# O navegador guarda a resposta, mas pergunta sempre se ela ainda vale
+# (If-None-Match): os dados só mudam em upload, inicialização ou regras
+CACHE_CONTROL = "private, no-cache"
+
+
+def formatar_etag(versao: str) -> str:
+    """ETag fraco (respostas equivalentes, ex.: mesma data de análise ou não)"""
+    resumo = hashlib.sha256(f"{VERSAO_API}:{versao}".encode()).hexdigest()[:24]
+    return f'W/"{resumo}"'
+
+
+def _corresponde(if_none_match: Optional[str], etag: str) -> bool:
+    """Comparação fraca do If-None-Match (lista separada por vírgulas ou *)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+
+    def sem_prefixo(valor: str) -> str:
+        valor = valor.strip()
+        return valor[2:] if valor.startswith('W/') else valor
+
+    return sem_prefixo(etag) in {sem_prefixo(v) for v in if_none_match.split(',')}
+
+
+def responder_condicional(request: Request, response: Response, versao: Optional[str]) -> Dict[str, str]:
+    """Define ETag e Cache-Control na resposta. Se o cliente já tem esta
+    versão, interrompe com 304 antes de qualquer cálculo.
+
+    Retorna os cabeçalhos, para rotas que devolvem o próprio Response
+    (ex.: streaming). Sem versão, não há ETag."""
+    if versao is None:
+        return {}
+    cabecalhos = {"ETag": formatar_etag(versao), "Cache-Control": CACHE_CONTROL}
+    if _corresponde(request.headers.get("if-none-match"), cabecalhos["ETag"]):
+        raise HTTPException(status_code=304, headers=cabecalhos)
+    response.headers.update(cabecalhos)
+    return cabecalhos
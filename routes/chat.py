@@ -16,7 +16,7 @@ def get_agente():
     return agente
 
 @router.post("/perguntar", response_model=ChatResponse)
-async def processar_pergunta(
+def processar_pergunta(
     request: ChatRequest,
     agente = Depends(get_agente)
 ):
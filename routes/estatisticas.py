@@ -2,39 +2,55 @@
 """
 Rotas relacionadas às estatísticas e dashboard
 """
-from fastapi import APIRouter, HTTPException, Depends
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
 from models.schemas import (
     ResumoEstatisticas,
     CFOPDistribuicaoResponse,
     DivergenciasTipoResponse,
     OperacoesUFResponse,
     TendenciaMensalResponse,
-    TopDivergenciasResponse
+    TendenciaDiariaResponse,
+    TopDivergenciasResponse,
+    DashboardResponse,
+    EstimativaConformidade,
+    CuboResponse,
+    EstatisticasAproximadas,
+    CacheEstatisticas
 )
 from services import EstatisticasService
-from config import settings
+from routes.cache_http import responder_condicional
 
 router = APIRouter(prefix="/estatisticas", tags=["Estatísticas"])
 
 def get_estatisticas_service():
-    """Dependency para obter o serviço de estatísticas"""
+    """Dependency para obter o serviço de estatísticas (o do agente, cujo
+    agregado é compartilhado por todas as rotas abaixo)"""
     from main import agente
     if agente is None:
         raise HTTPException(status_code=503, detail="Sistema não inicializado")
-    return EstatisticasService(agente)
+    return agente.estatisticas
+
+def etag_estatisticas(request: Request, response: Response):
+    """ETag pela versão dos resultados (dados + regras): 304 sem recalcular
+    se o navegador já tem a resposta desta versão"""
+    from main import agente
+    if agente is not None:
+        responder_condicional(request, response, agente.motor_validacao.versao_resultados)
 
-@router.get("/resumo", response_model=ResumoEstatisticas)
-async def obter_resumo(service: EstatisticasService = Depends(get_estatisticas_service)):
+@router.get("/resumo", response_model=ResumoEstatisticas, dependencies=[Depends(etag_estatisticas)])
+def obter_resumo(service: EstatisticasService = Depends(get_estatisticas_service)):
     """
     Retorna estatísticas gerais do sistema
     """
     try:
-        return service.obter_resumo(sample_size=settings.MAX_SAMPLE_SIZE)
+        return service.obter_resumo()
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/cfop-distribuicao", response_model=CFOPDistribuicaoResponse)
-async def obter_distribuicao_cfop(service: EstatisticasService = Depends(get_estatisticas_service)):
+@router.get("/cfop-distribuicao", response_model=CFOPDistribuicaoResponse, dependencies=[Depends(etag_estatisticas)])
+def obter_distribuicao_cfop(service: EstatisticasService = Depends(get_estatisticas_service)):
     """
     Retorna distribuição dos CFOPs mais utilizados
     """
@@ -44,19 +60,19 @@ async def obter_distribuicao_cfop(service: EstatisticasService = Depends(get_est
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/divergencias-tipo", response_model=DivergenciasTipoResponse)
-async def obter_divergencias_por_tipo(service: EstatisticasService = Depends(get_estatisticas_service)):
+@router.get("/divergencias-tipo", response_model=DivergenciasTipoResponse, dependencies=[Depends(etag_estatisticas)])
+def obter_divergencias_por_tipo(service: EstatisticasService = Depends(get_estatisticas_service)):
     """
     Retorna divergências agrupadas por tipo
     """
     try:
-        divergencias = service.obter_divergencias_por_tipo(sample_size=settings.MAX_SAMPLE_SIZE)
+        divergencias = service.obter_divergencias_por_tipo()
         return {"divergencias": divergencias}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/operacoes-uf", response_model=OperacoesUFResponse)
-async def obter_operacoes_por_uf(service: EstatisticasService = Depends(get_estatisticas_service)):
+@router.get("/operacoes-uf", response_model=OperacoesUFResponse, dependencies=[Depends(etag_estatisticas)])
+def obter_operacoes_por_uf(service: EstatisticasService = Depends(get_estatisticas_service)):
     """
     Retorna distribuição de operações por UF
     """
@@ -66,10 +82,10 @@ async def obter_operacoes_por_uf(service: EstatisticasService = Depends(get_esta
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/tendencia-mensal", response_model=TendenciaMensalResponse)
-async def obter_tendencia_mensal(service: EstatisticasService = Depends(get_estatisticas_service)):
+@router.get("/tendencia-mensal", response_model=TendenciaMensalResponse, dependencies=[Depends(etag_estatisticas)])
+def obter_tendencia_mensal(service: EstatisticasService = Depends(get_estatisticas_service)):
     """
-    Retorna tendência de notas ao longo do tempo
+    Retorna notas, itens, valor e divergências por mês de emissão
     """
     try:
         tendencia = service.obter_tendencia_mensal()
@@ -77,16 +93,129 @@ async def obter_tendencia_mensal(service: EstatisticasService = Depends(get_esta
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/top-divergencias", response_model=TopDivergenciasResponse)
-async def obter_top_divergencias(service: EstatisticasService = Depends(get_estatisticas_service)):
+@router.get("/tendencia-diaria", response_model=TendenciaDiariaResponse, dependencies=[Depends(etag_estatisticas)])
+def obter_tendencia_diaria(service: EstatisticasService = Depends(get_estatisticas_service)):
+    """
+    Retorna notas, itens, valor e divergências por dia de emissão
+    """
+    try:
+        tendencia = service.obter_tendencia_diaria()
+        return {"tendencia": tendencia}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/top-divergencias", response_model=TopDivergenciasResponse, dependencies=[Depends(etag_estatisticas)])
+def obter_top_divergencias(service: EstatisticasService = Depends(get_estatisticas_service)):
     """
     Retorna top 10 notas com mais problemas
     """
     try:
-        top = service.obter_top_divergencias(
-            sample_size=settings.MAX_SAMPLE_SIZE,
-            top_n=10
-        )
+        top = service.obter_top_divergencias(top_n=10)
         return {"top_divergencias": top}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/dashboard", response_model=DashboardResponse, response_model_exclude_none=True,
+            dependencies=[Depends(etag_estatisticas)])
+def obter_dashboard(
+    fields: Optional[str] = Query(
+        None, description="Painéis separados por vírgula (ex.: resumo,top_divergencias); todos se omitido"
+    ),
+    service: EstatisticasService = Depends(get_estatisticas_service)
+):
+    """
+    Retorna todos os painéis do dashboard numa única resposta, calculados a
+    partir do mesmo agregado
+    """
+    paineis = [p.strip() for p in fields.split(',') if p.strip()] if fields else None
+    try:
+        return service.obter_dashboard(paineis)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _lista(valor: Optional[str]):
+    """'SP,RJ' -> ['SP', 'RJ'] (sem repetições, na ordem informada)"""
+    if not valor:
+        return []
+    return list(dict.fromkeys(v.strip() for v in valor.split(',') if v.strip()))
+
+@router.get("/cube", response_model=CuboResponse, dependencies=[Depends(etag_estatisticas)])
+def consultar_cubo(
+    uf_emit: Optional[str] = Query(None, description="UFs emitentes separadas por vírgula"),
+    uf_dest: Optional[str] = Query(None, description="UFs destinatárias separadas por vírgula"),
+    cfop: Optional[str] = Query(None, description="CFOPs separados por vírgula (5.102 ou 5102)"),
+    natureza: Optional[str] = Query(None, description="Naturezas da operação separadas por vírgula"),
+    tipo: Optional[str] = Query(None, description="Tipos de divergência (ex.: primeiro_digito,ultimos_digitos)"),
+    agrupar: Optional[str] = Query(
+        None, description="Dimensões do resultado (uf_emit, uf_dest, cfop, natureza, tipo); total se omitido"
+    ),
+    ordenar: str = Query("itens", description="itens, valor ou uma das dimensões agrupadas"),
+    limite: Optional[int] = Query(100, ge=1, le=10000, description="Máximo de linhas"),
+    service: EstatisticasService = Depends(get_estatisticas_service)
+):
+    """
+    Consulta o cubo OLAP pré-agregado (itens e valor por par de UFs, CFOP,
+    natureza e tipo de divergência): filtra pelas dimensões informadas e
+    agrega pelas dimensões de `agrupar`, sem ler os itens
+    """
+    filtros = {
+        'uf_emit': _lista(uf_emit),
+        'uf_dest': _lista(uf_dest),
+        'cfop': _lista(cfop),
+        'natureza': _lista(natureza),
+        'tipo': _lista(tipo),
+    }
+    try:
+        return service.consultar_cubo(filtros, _lista(agrupar), ordenar=ordenar, limite=limite)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/aproximadas", response_model=EstatisticasAproximadas, dependencies=[Depends(etag_estatisticas)])
+def obter_estatisticas_aproximadas(
+    meses: Optional[str] = Query(None, description="Meses separados por vírgula (ex.: 2024-01,2024-02); todos se omitido"),
+    top_n: int = Query(10, ge=1, le=64, description="Quantidade de CFOPs mais frequentes"),
+    confianca: float = Query(0.95, gt=0, lt=1, description="Nível de confiança das contagens de distintos"),
+    service: EstatisticasService = Depends(get_estatisticas_service)
+):
+    """
+    Estatísticas aproximadas em tempo constante a partir dos sketches
+    mensais: quantis dos valores (t-digest), emitentes e destinatários
+    distintos (HyperLogLog) e CFOPs mais frequentes (Count-Min), cada um
+    com seu limite de erro
+    """
+    try:
+        return service.agente.sketches.consultar(
+            meses=_lista(meses) or None, top_n=top_n, confianca=confianca
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/estimativa", response_model=EstimativaConformidade)
+def estimar_conformidade(
+    orcamento_ms: float = Query(300, gt=0, le=60000, description="Orçamento de tempo em milissegundos"),
+    confianca: float = Query(0.95, gt=0, lt=1, description="Nível de confiança do intervalo"),
+    semente: int = Query(0, description="Semente do sorteio da amostra"),
+    service: EstatisticasService = Depends(get_estatisticas_service)
+):
+    """
+    Estimativa rápida da conformidade por amostra estratificada (par de UFs
+    e natureza), com intervalo de confiança. Quando o resultado completo
+    estiver pronto, devolve os números exatos (exato=true).
+    """
+    try:
+        return service.estimar_conformidade(orcamento_ms=orcamento_ms, confianca=confianca, semente=semente)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/cache", response_model=CacheEstatisticas)
+def obter_estatisticas_cache(service: EstatisticasService = Depends(get_estatisticas_service)):
+    """
+    Retorna acertos e falhas do cache de resultados (por versão dos dados)
+    """
+    return service.estatisticas_cache()
@@ -0,0 +1,99 @@
+# backend/routes/jobs.py
+"""
+Rotas dos jobs em segundo plano (validação completa)
+"""
+import json
+import math
+from typing import List, Optional
+
+from fastapi import APIRouter, HTTPException, Depends, Query
+from models.schemas import JobStatus, JobResultadosResponse
+from services.jobs import STATUS_CONCLUIDO
+from services.motor_validacao import TIPO_PRIMEIRO_DIGITO, TIPO_ULTIMOS_DIGITOS
+
+router = APIRouter(prefix="/jobs", tags=["Jobs"])
+
+def get_agente():
+    """Dependency para obter o agente"""
+    from main import agente
+    if agente is None:
+        raise HTTPException(status_code=503, detail="Sistema não inicializado")
+    return agente
+
+def get_gerenciador():
+    """Dependency para obter o gerenciador de jobs"""
+    from main import gerenciador_jobs
+    return gerenciador_jobs
+
+def _obter_job(job_id: str, gerenciador):
+    job = gerenciador.obter(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} não encontrado")
+    return job
+
+@router.post("/validacao", response_model=JobStatus, status_code=202)
+async def criar_job_validacao(
+    agente = Depends(get_agente),
+    gerenciador = Depends(get_gerenciador)
+):
+    """
+    Inicia a validação de todos os itens em segundo plano e retorna o id do job
+    """
+    return gerenciador.iniciar_validacao(agente).para_dict()
+
+@router.get("", response_model=List[JobStatus])
+async def listar_jobs(gerenciador = Depends(get_gerenciador)):
+    """
+    Lista os jobs retidos (mais recentes primeiro)
+    """
+    return [job.para_dict() for job in gerenciador.listar()]
+
+@router.get("/{job_id}", response_model=JobStatus)
+async def obter_job(job_id: str, gerenciador = Depends(get_gerenciador)):
+    """
+    Progresso do job: itens processados, divergências até agora e ETA
+    """
+    return _obter_job(job_id, gerenciador).para_dict()
+
+@router.get("/{job_id}/resultados", response_model=JobResultadosResponse)
+def obter_resultados_job(
+    job_id: str,
+    pagina: int = Query(1, ge=1),
+    tamanho_pagina: int = Query(100, ge=1, le=5000),
+    tipo: Optional[str] = Query(None, description="primeiro_digito ou ultimos_digitos"),
+    gerenciador = Depends(get_gerenciador)
+):
+    """
+    Divergências encontradas pelo job, paginadas
+    """
+    job = _obter_job(job_id, gerenciador)
+    if job.status != STATUS_CONCLUIDO:
+        raise HTTPException(status_code=409, detail=f"Job {job_id} ainda não concluído (status: {job.status})")
+    
+    # Página lida do repositório SQLite (índice por tipo), se ainda guarda a versão do job
+    repositorio = job.repositorio
+    if not repositorio.pronto(job.versao_resultados):
+        raise HTTPException(status_code=410, detail=f"Resultados do job {job_id} substituídos por uma nova carga de dados")
+    
+    filtro_tipo = tipo or [TIPO_PRIMEIRO_DIGITO, TIPO_ULTIMOS_DIGITOS]
+    total = repositorio.contar(tipo=filtro_tipo)
+    pagina_df = repositorio.consultar(
+        limite=tamanho_pagina, deslocamento=(pagina - 1) * tamanho_pagina, tipo=filtro_tipo
+    )
+    
+    return {
+        "job_id": job.id,
+        "pagina": pagina,
+        "tamanho_pagina": tamanho_pagina,
+        "total": total,
+        "total_paginas": math.ceil(total / tamanho_pagina),
+        "resultados": json.loads(pagina_df.to_json(orient='records', force_ascii=False)),
+    }
+
+@router.delete("/{job_id}", response_model=JobStatus)
+async def cancelar_job(job_id: str, gerenciador = Depends(get_gerenciador)):
+    """
+    Cancela o job (interrompe no próximo bloco de itens)
+    """
+    _obter_job(job_id, gerenciador)
+    return gerenciador.cancelar(job_id).para_dict()
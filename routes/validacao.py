@@ -2,11 +2,27 @@
 """
 Rotas relacionadas à validação de CFOP
 """
-from fastapi import APIRouter, HTTPException, Depends
-from models.schemas import ValidarCFOPRequest
+import csv
+import io
+import json
+import math
+from typing import Optional
+
+import pandas as pd
+from fastapi import APIRouter, HTTPException, Depends, File, UploadFile, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from models.schemas import ValidarCFOPRequest, ValidacaoLoteRequest, DivergenciasResponse, JobStatus
+from config import settings
+from routes.cache_http import responder_condicional
+from services.carregador_csv import normalizar_chave, normalizar_cfop
+from services.motor_validacao import TIPO_PRIMEIRO_DIGITO, TIPO_ULTIMOS_DIGITOS
+from services.repositorio_validacao import COLUNAS_ITENS
 
 router = APIRouter(prefix="/validacao", tags=["Validação"])
 
+# Linhas serializadas por bloco na resposta em streaming
+TAMANHO_BLOCO_JSON = 5000
+
 def get_agente():
     """Dependency para obter o agente"""
     from main import agente
@@ -14,28 +30,225 @@ def get_agente():
         raise HTTPException(status_code=503, detail="Sistema não inicializado")
     return agente
 
+def etag_resultados(request: Request, response: Response, agente = Depends(get_agente)):
+    """ETag pela versão dos resultados (consultas ao repositório de resultados)"""
+    return responder_condicional(request, response, agente.motor_validacao.versao_resultados)
+
 @router.post("/cfop-item")
-async def validar_cfop_item(
+def validar_cfop_item(
     request: ValidarCFOPRequest,
     agente = Depends(get_agente)
 ):
     """
-    Valida o CFOP de um item específico usando chave de acesso
+    Valida o CFOP de um item específico usando chave de acesso. Mesmo
+    caminho (e mesmos campos: status, cfop_esperado, resultado...) de um
+    par em /lote
+    """
+    try:
+        resultados = agente.motor_validacao.validar_pares([request.chave_acesso], [request.numero_item])
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao validar CFOP: {str(e)}")
+    
+    return json.loads(resultados.to_json(orient='records', force_ascii=False))[0]
+
+@router.post("/lote")
+def validar_lote(
+    request: ValidacaoLoteRequest,
+    agente = Depends(get_agente)
+):
+    """
+    Valida vários pares (chave de acesso, item) em uma única passada vetorizada.
+    Resposta em JSON, enviada em blocos: {"resumo": {...}, "resultados": [...]}
+    """
+    chaves = [par.chave_acesso for par in request.itens]
+    numeros = [par.numero_item for par in request.itens]
+    return _responder_lote(agente, chaves, numeros)
+
+@router.post("/lote/arquivo")
+def validar_lote_arquivo(
+    arquivo: UploadFile = File(...),
+    agente = Depends(get_agente)
+):
+    """
+    Mesmo que /lote, lendo os pares de um CSV (separador ; ou ,) com as
+    colunas chave_acesso e numero_item (ou, sem esses nomes, as duas primeiras)
+    """
+    pares = _ler_pares_csv(arquivo.file.read())
+    return _responder_lote(agente, pares.iloc[:, 0].tolist(), pares.iloc[:, 1].tolist())
+
+@router.get("/divergencias", response_model=DivergenciasResponse, dependencies=[Depends(etag_resultados)],
+            responses={202: {"model": JobStatus, "description": "Resultados ainda não gravados: job de validação"}})
+def listar_divergencias(
+    emitente: Optional[str] = Query(None, description="CPF/CNPJ do emitente"),
+    uf_emit: Optional[str] = Query(None, description="UF do emitente"),
+    uf_dest: Optional[str] = Query(None, description="UF do destinatário"),
+    cfop: Optional[str] = Query(None, description="CFOP registrado (qualquer formato)"),
+    numero: Optional[str] = Query(None, description="Número da nota"),
+    chave: Optional[str] = Query(None, description="Chave de acesso (44 dígitos)"),
+    natureza: Optional[str] = Query(None, description="Natureza da operação (texto exato)"),
+    tipo: Optional[str] = Query(None, description="primeiro_digito ou ultimos_digitos"),
+    pagina: int = Query(1, ge=1),
+    tamanho_pagina: int = Query(100, ge=1, le=5000),
+    agente = Depends(get_agente)
+):
     """
+    Divergências filtradas, lidas do repositório SQLite (consultas indexadas,
+    sem revalidar). Se os resultados desta versão ainda não foram gravados,
+    responde 202 com o job de validação (em andamento ou iniciado agora).
+    """
+    filtros = _filtros_divergencias(
+        tipo=tipo, emitente=emitente, uf_emit=uf_emit, uf_dest=uf_dest,
+        cfop=cfop, numero=numero, chave=chave, natureza=natureza
+    )
+    repositorio = agente.motor_validacao.persistido()
+    if repositorio is None:
+        return _job_em_andamento(agente)
+    try:
+        total = repositorio.contar(**filtros)
+        pagina_df = repositorio.consultar(
+            limite=tamanho_pagina, deslocamento=(pagina - 1) * tamanho_pagina, **filtros
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao consultar divergências: {str(e)}")
+    
+    return {
+        "pagina": pagina,
+        "tamanho_pagina": tamanho_pagina,
+        "total": total,
+        "total_paginas": math.ceil(total / tamanho_pagina),
+        "resultados": json.loads(pagina_df.to_json(orient='records', force_ascii=False)),
+    }
+
+@router.get("/export", responses={202: {"model": JobStatus, "description": "Resultados ainda não gravados: job de validação"}})
+def exportar_divergencias(
+    formato: str = Query("csv", alias="format", pattern="^(csv|ndjson)$"),
+    uf_emit: Optional[str] = Query(None, description="UF do emitente"),
+    uf_dest: Optional[str] = Query(None, description="UF do destinatário"),
+    cfop: Optional[str] = Query(None, description="CFOP registrado (qualquer formato)"),
+    natureza: Optional[str] = Query(None, description="Natureza da operação (texto exato)"),
+    emitente: Optional[str] = Query(None, description="CPF/CNPJ do emitente"),
+    tipo: Optional[str] = Query(None, description="primeiro_digito ou ultimos_digitos"),
+    agente = Depends(get_agente),
+    cabecalhos_cache: dict = Depends(etag_resultados)
+):
+    """
+    Exporta todas as divergências (CSV ou NDJSON) em streaming: as linhas
+    saem do cursor SQLite em lotes, com memória constante. Como em
+    /divergencias, responde 202 com o job de validação enquanto os
+    resultados não estão gravados
+    """
+    filtros = _filtros_divergencias(
+        tipo=tipo, emitente=emitente, uf_emit=uf_emit, uf_dest=uf_dest,
+        cfop=cfop, natureza=natureza
+    )
+    repositorio = agente.motor_validacao.persistido()
+    if repositorio is None:
+        return _job_em_andamento(agente)
+    
+    lotes = repositorio.iterar(**filtros)
+    if formato == "ndjson":
+        return StreamingResponse(
+            _gerar_ndjson(lotes), media_type="application/x-ndjson",
+            headers={"Content-Disposition": 'attachment; filename="divergencias.ndjson"', **cabecalhos_cache}
+        )
+    return StreamingResponse(
+        _gerar_csv(lotes), media_type="text/csv; charset=utf-8",
+        headers={"Content-Disposition": 'attachment; filename="divergencias.csv"', **cabecalhos_cache}
+    )
+
+# ============================================================================
+# AUXILIARES
+# ============================================================================
+
+def _job_em_andamento(agente) -> JSONResponse:
+    """202 com o job de validação do agente (o já em andamento ou um novo):
+    a consulta não valida nem grava na requisição"""
+    job = agente.gerenciador_jobs.validacao_do_agente(agente)
+    return JSONResponse(status_code=202, content=job.para_dict())
+
+def _filtros_divergencias(tipo=None, emitente=None, uf_emit=None, uf_dest=None,
+                          cfop=None, numero=None, chave=None, natureza=None) -> dict:
+    """Filtros do repositório a partir dos parâmetros da query (normalizados
+    como no carregamento); sem tipo, só itens divergentes"""
+    return {
+        'tipo': tipo or [TIPO_PRIMEIRO_DIGITO, TIPO_ULTIMOS_DIGITOS],
+        'emitente': emitente,
+        'uf_emit': uf_emit.strip().upper() if uf_emit else None,
+        'uf_dest': uf_dest.strip().upper() if uf_dest else None,
+        'cfop': normalizar_cfop(cfop) if cfop else None,
+        'numero': numero,
+        'chave': normalizar_chave(chave) if chave else None,
+        'natureza': natureza.strip() if natureza else None,
+    }
+
+def _gerar_csv(lotes):
+    """CSV com cabeçalho, um bloco de texto por lote do cursor"""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow(COLUNAS_ITENS)
+    yield buffer.getvalue()
+    for linhas in lotes:
+        buffer.seek(0)
+        buffer.truncate(0)
+        escritor.writerows(linhas)
+        yield buffer.getvalue()
+
+def _gerar_ndjson(lotes):
+    """Um objeto JSON por linha"""
+    for linhas in lotes:
+        yield ''.join(
+            json.dumps(dict(zip(COLUNAS_ITENS, linha)), ensure_ascii=False) + '\n'
+            for linha in linhas
+        )
+# ============================================================================
+
+def _responder_lote(agente, chaves: list, numeros: list) -> StreamingResponse:
+    if len(chaves) > settings.validacao_lote_max_pares:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Lote com {len(chaves)} pares excede o limite de {settings.validacao_lote_max_pares}"
+        )
+    
+    try:
+        resultados = agente.motor_validacao.validar_pares(chaves, numeros)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao validar lote: {str(e)}")
+    
+    resumo = {
+        "total": len(resultados),
+        "por_status": {k: int(v) for k, v in resultados['status'].value_counts().items()},
+        "por_resultado": {k: int(v) for k, v in resultados['resultado'].value_counts().items()},
+    }
+    return StreamingResponse(_gerar_json_lote(resumo, resultados), media_type="application/json")
+
+def _gerar_json_lote(resumo: dict, resultados: pd.DataFrame):
+    """Serializa o resultado em blocos (to_json vetorizado por bloco)"""
+    yield '{"resumo": ' + json.dumps(resumo, ensure_ascii=False) + ', "resultados": ['
+    for inicio in range(0, len(resultados), TAMANHO_BLOCO_JSON):
+        bloco = resultados.iloc[inicio:inicio + TAMANHO_BLOCO_JSON]
+        if inicio:
+            yield ','
+        yield bloco.to_json(orient='records', force_ascii=False)[1:-1]
+    yield ']}'
+
+def _ler_pares_csv(conteudo: bytes) -> pd.DataFrame:
+    """Lê o CSV de pares enviado para /lote/arquivo"""
+    try:
+        texto = conteudo.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        texto = conteudo.decode('latin-1')
+    
+    primeira_linha = texto.split('\n', 1)[0]
+    separador = ';' if primeira_linha.count(';') >= primeira_linha.count(',') else ','
+    
     try:
-        # Encontrar a ferramenta de validação
-        tool_validar = None
-        for tool in agente.tools:
-            if tool.name == "validar_cfop_item_especifico":
-                tool_validar = tool
-                break
-        
-        if not tool_validar:
-            raise HTTPException(status_code=500, detail="Ferramenta de validação não encontrada")
-        
-        # Executar validação
-        resultado = tool_validar.func(request.chave_acesso, request.numero_item)
-        
-        return {"resultado": resultado}
+        pares = pd.read_csv(io.StringIO(texto), sep=separador, dtype=str, keep_default_na=False)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro ao validar CFOP: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=400, detail=f"CSV inválido: {str(e)}")
+    
+    pares.columns = [str(c).strip().lower() for c in pares.columns]
+    if {'chave_acesso', 'numero_item'} <= set(pares.columns):
+        return pares[['chave_acesso', 'numero_item']]
+    if pares.shape[1] < 2:
+        raise HTTPException(status_code=400, detail="CSV deve ter as colunas chave_acesso e numero_item")
+    return pares.iloc[:, :2]
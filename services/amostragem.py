@@ -0,0 +1,99 @@
+# backend/services/amostragem.py
+"""
+Amostragem aleatória estratificada dos itens (por par de UFs e natureza da
+operação) para estimativas rápidas com intervalo de confiança
+"""
+from statistics import NormalDist
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+from services.impressoes import hash_coluna
+
+# Campos do cabeçalho que definem o estrato de cada item
+COLUNAS_ESTRATO = ['UF EMITENTE', 'UF DESTINATÁRIO', 'NATUREZA DA OPERAÇÃO']
+
+# Fração de cada estrato na primeira rodada (dobra a cada rodada seguinte)
+FRACAO_INICIAL = 0.001
+
+
+def estratos_cabecalho(df_cabecalho: pd.DataFrame) -> np.ndarray:
+    """Código do estrato de cada linha do cabeçalho (combinação de
+    COLUNAS_ESTRATO, texto sem espaços nas pontas e maiúsculo)"""
+    codigos = np.zeros(len(df_cabecalho), dtype=np.int64)
+    for coluna in COLUNAS_ESTRATO:
+        if coluna not in df_cabecalho.columns:
+            continue
+        valores, distintos = pd.factorize(hash_coluna(df_cabecalho[coluna]))
+        codigos, _ = pd.factorize(codigos * len(distintos) + valores)
+    return codigos.astype(np.int64)
+
+
+class PlanoAmostragem:
+    """Ordem aleatória dos itens dentro de cada estrato.
+
+    Uma amostra de fração f pega os primeiros ceil(f * N_h) itens de cada
+    estrato h (alocação proporcional, ao menos um por estrato). Frações
+    crescentes só acrescentam itens: cada rodada valida apenas os novos."""
+
+    def __init__(self, estrato_item: np.ndarray, semente: int = 0):
+        # estrato_item: estrato de cada item (-1 = fora da população)
+        populacao = np.flatnonzero(estrato_item >= 0)
+        estrato = estrato_item[populacao]
+        aleatorio = np.random.default_rng(semente).random(len(populacao))
+        ordem = np.lexsort((aleatorio, estrato))
+
+        self.posicoes = populacao[ordem]
+        self.estrato = estrato[ordem]
+        self.tamanhos = np.bincount(self.estrato, minlength=int(estrato.max()) + 1 if len(estrato) else 0)
+        inicio = np.concatenate([[0], np.cumsum(self.tamanhos)[:-1]]).astype(np.int64)
+        # Posição de cada item dentro do seu estrato
+        self.ordem_no_estrato = np.arange(len(populacao)) - inicio[self.estrato]
+
+    @property
+    def total(self) -> int:
+        return len(self.posicoes)
+
+    @property
+    def quantidade_estratos(self) -> int:
+        return int((self.tamanhos > 0).sum())
+
+    def ate(self, fracao: float) -> np.ndarray:
+        """Itens por estrato numa amostra da fração informada"""
+        return np.minimum(np.ceil(fracao * self.tamanhos), self.tamanhos).astype(np.int64)
+
+    def entre(self, de: np.ndarray, ate: np.ndarray) -> np.ndarray:
+        """Índices (em posicoes/estrato) dos itens que entram ao passar de
+        `de` para `ate` itens por estrato"""
+        limite_de, limite_ate = de[self.estrato], ate[self.estrato]
+        return np.flatnonzero((self.ordem_no_estrato >= limite_de) & (self.ordem_no_estrato < limite_ate))
+
+
+def estimar_proporcao(sucessos: np.ndarray, amostra: np.ndarray, tamanhos: np.ndarray,
+                      confianca: float = 0.95) -> Dict[str, float]:
+    """Proporção estimada na população estratificada, com intervalo normal.
+
+    p = soma(W_h * p_h), Var = soma(W_h² * (1 - n_h/N_h) * p_h(1 - p_h) / (n_h - 1)).
+    Estratos com um único item sorteado usam a variância máxima (0,25), já
+    que p_h(1 - p_h) não pode ser estimada a partir de um item."""
+    ativos = tamanhos > 0
+    if not ativos.any():
+        return {"estimativa": 0.0, "inferior": 0.0, "superior": 0.0, "erro_padrao": 0.0}
+    sucessos, amostra, tamanhos = sucessos[ativos], amostra[ativos], tamanhos[ativos]
+    pesos = tamanhos / tamanhos.sum()
+    p_h = np.divide(sucessos, amostra, out=np.zeros(len(amostra)), where=amostra > 0)
+
+    variancia_h = np.where(
+        amostra > 1, p_h * (1 - p_h) / np.maximum(amostra - 1, 1), 0.25
+    ) * (1 - amostra / tamanhos)
+    proporcao = float((pesos * p_h).sum())
+    erro = float(np.sqrt((pesos ** 2 * variancia_h).sum()))
+    z = NormalDist().inv_cdf(0.5 + confianca / 2)
+
+    return {
+        "estimativa": proporcao,
+        "inferior": max(0.0, proporcao - z * erro),
+        "superior": min(1.0, proporcao + z * erro),
+        "erro_padrao": erro,
+    }
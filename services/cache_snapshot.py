@@ -0,0 +1,162 @@
+# backend/services/cache_snapshot.py
+"""
+Cache de snapshots Arrow IPC dos DataFrames já tipados, endereçado pelo
+SHA-256 dos arquivos enviados
+"""
+import hashlib
+import json
+import shutil
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    PYARROW_DISPONIVEL = True
+except ImportError:
+    PYARROW_DISPONIVEL = False
+
+SUFIXO_HASH = ".sha256"
+TAMANHO_BLOCO = 1024 * 1024
+
+
+# ============================================================================
+# HASH DOS ARQUIVOS
+# ============================================================================
+
+def registrar_hash_arquivo(caminho, sha256: str):
+    """Grava o hash de um arquivo recém-enviado ao lado dele"""
+    caminho = Path(caminho)
+    stat = caminho.stat()
+    Path(str(caminho) + SUFIXO_HASH).write_text(json.dumps({
+        "sha256": sha256,
+        "tamanho": stat.st_size,
+        "mtime": stat.st_mtime,
+    }))
+
+
+def calcular_hash_arquivo(caminho) -> str:
+    """SHA-256 de um arquivo, reaproveitando o hash gravado no upload"""
+    caminho = Path(caminho)
+    stat = caminho.stat()
+    arquivo_hash = Path(str(caminho) + SUFIXO_HASH)
+
+    try:
+        registro = json.loads(arquivo_hash.read_text())
+        if registro["tamanho"] == stat.st_size and registro["mtime"] == stat.st_mtime:
+            return registro["sha256"]
+    except (OSError, ValueError, KeyError):
+        pass
+
+    h = hashlib.sha256()
+    with open(caminho, "rb") as f:
+        for bloco in iter(lambda: f.read(TAMANHO_BLOCO), b""):
+            h.update(bloco)
+    registrar_hash_arquivo(caminho, h.hexdigest())
+    return h.hexdigest()
+
+
+def calcular_hash_arquivos(caminhos: Iterable, versao: str = "") -> str:
+    """Hash combinado de vários arquivos (identifica o conjunto de dados)"""
+    h = hashlib.sha256(versao.encode())
+    for caminho in caminhos:
+        h.update(calcular_hash_arquivo(caminho).encode())
+    return h.hexdigest()
+
+
+# ============================================================================
+# CACHE DE SNAPSHOTS
+# ============================================================================
+
+class CacheSnapshot:
+    """Snapshots Arrow IPC por hash de conteúdo, com expiração por idade e espaço"""
+
+    def __init__(self, diretorio, max_idade_horas: float = 72, max_mb: float = 2048):
+        self.diretorio = Path(diretorio)
+        self.max_idade_segundos = max_idade_horas * 3600
+        self.max_bytes = max_mb * 1024 ** 2
+        self.habilitado = PYARROW_DISPONIVEL
+
+    def carregar(self, chave: str) -> Optional[Dict[str, pd.DataFrame]]:
+        """Retorna os DataFrames do snapshot ou None se não existir"""
+        self.limpar()
+        pasta = self.diretorio / chave
+        if not self.habilitado or not pasta.is_dir():
+            return None
+
+        try:
+            inicio = time.perf_counter()
+            dados = {
+                arquivo.stem: tabela_para_dataframe(feather.read_table(arquivo))
+                for arquivo in sorted(pasta.glob("*.arrow"))
+            }
+            # Marca como usado recentemente (evicção LRU)
+            pasta.touch()
+            print(f"   ⚡ Snapshot {chave[:12]} carregado em {time.perf_counter() - inicio:.2f}s")
+            return dados
+        except Exception as e:
+            print(f"   ⚠️ Snapshot {chave[:12]} inválido, descartando: {e}")
+            shutil.rmtree(pasta, ignore_errors=True)
+            return None
+
+    def salvar(self, chave: str, dados: Dict[str, pd.DataFrame]):
+        """Grava os DataFrames como snapshot (escrita atômica via rename)"""
+        if not self.habilitado:
+            return
+
+        self.diretorio.mkdir(parents=True, exist_ok=True)
+        pasta = self.diretorio / chave
+        temporaria = self.diretorio / f".{chave}.tmp"
+        shutil.rmtree(temporaria, ignore_errors=True)
+        temporaria.mkdir()
+
+        try:
+            for nome, df in dados.items():
+                tabela = pa.Table.from_pandas(df, preserve_index=False)
+                feather.write_feather(tabela, temporaria / f"{nome}.arrow", compression="lz4")
+            shutil.rmtree(pasta, ignore_errors=True)
+            temporaria.rename(pasta)
+            print(f"   💾 Snapshot {chave[:12]} salvo")
+        except Exception as e:
+            print(f"   ⚠️ Não foi possível salvar o snapshot: {e}")
+            shutil.rmtree(temporaria, ignore_errors=True)
+            return
+
+        self.limpar()
+
+    def limpar(self):
+        """Remove snapshots expirados e os mais antigos acima do limite de disco"""
+        if not self.diretorio.is_dir():
+            return
+
+        agora = time.time()
+        snapshots = []
+        for pasta in self.diretorio.iterdir():
+            if not pasta.is_dir() or pasta.name.startswith("."):
+                continue
+            usado_em = pasta.stat().st_mtime
+            if agora - usado_em > self.max_idade_segundos:
+                print(f"   🧹 Snapshot {pasta.name[:12]} expirado")
+                shutil.rmtree(pasta, ignore_errors=True)
+                continue
+            tamanho = sum(f.stat().st_size for f in pasta.glob("*") if f.is_file())
+            snapshots.append((usado_em, tamanho, pasta))
+
+        total = sum(tamanho for _, tamanho, _ in snapshots)
+        for _, tamanho, pasta in sorted(snapshots, key=lambda s: s[0]):
+            if total <= self.max_bytes:
+                break
+            print(f"   🧹 Snapshot {pasta.name[:12]} removido (limite de disco)")
+            shutil.rmtree(pasta, ignore_errors=True)
+            total -= tamanho
+
+
+def tabela_para_dataframe(tabela) -> pd.DataFrame:
+    """Converte uma tabela Arrow mantendo texto em string[pyarrow]"""
+    tipo_texto = pd.StringDtype('pyarrow')
+    return tabela.to_pandas(
+        types_mapper={pa.string(): tipo_texto, pa.large_string(): tipo_texto}.get
+    )
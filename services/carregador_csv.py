@@ -0,0 +1,393 @@
+# backend/services/carregador_csv.py
+"""
+Carregamento tipado dos CSVs de cabeçalho, itens e CFOP
+"""
+import os
+import re
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from services.cache_snapshot import CacheSnapshot, tabela_para_dataframe
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pa_csv
+    PYARROW_DISPONIVEL = True
+except ImportError:
+    PYARROW_DISPONIVEL = False
+
+# ============================================================================
+# SCHEMA EXPLÍCITO
+# ============================================================================
+
+# Colunas de baixa cardinalidade: viram categóricas (códigos int + dicionário)
+COLUNAS_CATEGORICAS = [
+    'UF EMITENTE',
+    'UF DESTINATÁRIO',
+    'NATUREZA DA OPERAÇÃO',
+    'DESTINO DA OPERAÇÃO',
+    'CFOP',
+]
+
+# Colunas de chave de acesso aceitas nos arquivos
+COLUNAS_CHAVE = [
+    'CHAVE DE ACESSO', 'CHAVE', 'CHAVE NF-E', 'CHAVE NFE',
+    'CHAVE_ACESSO', 'NF-E CHAVE DE ACESSO', 'NFE_CHAVE', 'CHAVE_NFE'
+]
+
+# Identificadores: sempre texto, nunca passam por inferência de tipo
+COLUNAS_TEXTO = COLUNAS_CHAVE + [
+    'NÚMERO',
+    'SÉRIE',
+    'CPF/CNPJ Emitente',
+    'CNPJ EMITENTE',
+    'CNPJ DESTINATÁRIO',
+]
+
+# Componentes da identificação da nota (emitente + série + número)
+COLUNAS_EMITENTE = ['CPF/CNPJ Emitente', 'CNPJ EMITENTE', 'CPF/CNPJ EMITENTE']
+COLUNAS_SERIE = ['SÉRIE', 'SERIE']
+
+TIPO_TEXTO = 'string[pyarrow]' if PYARROW_DISPONIVEL else 'string'
+
+# Prefixo das colunas monetárias (formato pt-BR: 1.234,56)
+PREFIXO_VALOR = 'VALOR'
+
+# Valor total da nota no cabeçalho (nomes aceitos, na ordem de preferência)
+COLUNAS_VALOR_NOTA = ['VALOR NOTA FISCAL', 'VALOR TOTAL DA NF', 'VALOR TOTAL DA NOTA']
+
+# Data de emissão (formato pt-BR: 31/01/2024 10:28:00)
+COLUNAS_DATA_EMISSAO = ['DATA EMISSÃO', 'DATA DE EMISSÃO', 'DATA EMISSAO']
+FORMATO_DATA_BR = '%d/%m/%Y %H:%M:%S'
+
+# Incrementar sempre que o schema ou o preparo dos DataFrames mudar
+# (invalida os snapshots gravados com a versão anterior)
+VERSAO_SCHEMA = "5"
+
+# Colunas derivadas (normalizadas no carregamento) começam com este prefixo
+PREFIXO_DERIVADA = '_'
+COLUNA_CHAVE = '_CHAVE'
+COLUNA_CFOP = '_CFOP'
+COLUNA_CFOP_D1 = '_CFOP_D1'
+COLUNA_NUMERO = '_NUMERO'
+COLUNA_NOTA = '_NOTA'
+COLUNA_DATA = '_DATA'
+
+_REGEX_CHAVE = r"[\s\-.']"
+_REGEX_NAO_DIGITO = r'\D'
+
+
+def montar_schema(colunas) -> Dict[str, str]:
+    """Monta o dicionário de dtypes (pandas) para as colunas presentes no arquivo"""
+    schema = {}
+    for coluna in colunas:
+        if coluna in COLUNAS_CATEGORICAS:
+            schema[coluna] = 'category'
+        elif coluna in COLUNAS_TEXTO or coluna.startswith(PREFIXO_VALOR):
+            # Valores são lidos como texto e convertidos uma única vez
+            schema[coluna] = 'str'
+    return schema
+
+
+def _montar_schema_arrow(colunas) -> Dict[str, Any]:
+    """Equivalente do schema para o leitor pyarrow (dicionário = categórica)"""
+    tipos = {'category': pa.dictionary(pa.int32(), pa.string()), 'str': pa.string()}
+    return {coluna: tipos[dtype] for coluna, dtype in montar_schema(colunas).items()}
+
+
+# ============================================================================
+# CARREGAMENTO
+# ============================================================================
+
+def carregar_csv(caminho: str, descricao: str = "registros") -> pd.DataFrame:
+    """Lê um CSV aplicando o schema explícito e converte os valores pt-BR"""
+    print(f"📂 Carregando: {caminho}")
+
+    separador, encoding, colunas = _ler_cabecalho_csv(caminho)
+
+    inicio = time.perf_counter()
+    if PYARROW_DISPONIVEL:
+        df = _ler_csv_pyarrow(caminho, separador, encoding, colunas)
+    else:
+        df = pd.read_csv(caminho, sep=separador, encoding=encoding,
+                         dtype=montar_schema(colunas), low_memory=False)
+        for coluna in df.columns:
+            if coluna.startswith(PREFIXO_VALOR):
+                df[coluna] = converter_decimal_br(df[coluna])
+    tempo = time.perf_counter() - inicio
+
+    tamanho_disco = os.path.getsize(caminho) / 1024 ** 2
+    memoria = df.memory_usage(deep=True).sum() / 1024 ** 2
+    print(f"   ✅ {len(df)} {descricao}")
+    print(f"   ⏱️ {tempo:.2f}s | 💾 {tamanho_disco:.1f} MB em disco → {memoria:.1f} MB em memória")
+    return df
+
+
+def carregar_dados(cabecalho_path: str, itens_path: str, cfop_path: str,
+                   versao: Optional[str] = None,
+                   cache: Optional[CacheSnapshot] = None) -> Dict[str, pd.DataFrame]:
+    """Carrega os três arquivos (ou o snapshot da mesma versão) e reporta a
+    memória residente antes e depois"""
+    rss_antes = memoria_residente_mb()
+    inicio = time.perf_counter()
+
+    dados = cache.carregar(versao) if cache and versao else None
+    if dados is None:
+        dados = {
+            'cabecalho': carregar_csv(cabecalho_path, "registros de cabeçalho"),
+            'itens': carregar_csv(itens_path, "itens"),
+            'cfop': carregar_csv(cfop_path, "códigos CFOP"),
+        }
+        for nome, df in dados.items():
+            # Data de emissão só no cabeçalho (série mensal e sketches leem de lá)
+            preparar_colunas_normalizadas(df, com_data=nome == 'cabecalho')
+        dados['itens'] = preparar_chave_nota(dados['cabecalho'], dados['itens'])
+        if cache and versao:
+            cache.salvar(versao, dados)
+
+    tempo = time.perf_counter() - inicio
+    rss_depois = memoria_residente_mb()
+    if rss_antes is not None and rss_depois is not None:
+        print(f"   📊 Memória residente: {rss_antes:.1f} MB → {rss_depois:.1f} MB "
+              f"(+{rss_depois - rss_antes:.1f} MB) em {tempo:.2f}s")
+    return dados
+
+
+# ============================================================================
+# COLUNAS NORMALIZADAS
+# ============================================================================
+
+def normalizar_chave(chave) -> str:
+    """Remove espaços, hífens, pontos e apóstrofos de uma chave de acesso"""
+    return re.sub(_REGEX_CHAVE, '', str(chave))
+
+
+def normalizar_chaves(chaves: pd.Series) -> pd.Series:
+    """normalizar_chave para uma coluna inteira (nulos viram '')"""
+    return _como_texto(chaves).str.replace(_REGEX_CHAVE, '', regex=True)
+
+
+def normalizar_cfop(cfop) -> str:
+    """Mantém apenas os dígitos de um CFOP ('5.102' -> '5102')"""
+    return re.sub(_REGEX_NAO_DIGITO, '', str(cfop))
+
+
+def detectar_coluna_valor_nota(df_cabecalho: pd.DataFrame) -> Optional[str]:
+    """Coluna do valor total da nota no cabeçalho (None se não houver)"""
+    return next((c for c in COLUNAS_VALOR_NOTA if c in df_cabecalho.columns), None)
+
+
+def detectar_coluna_chave(df: pd.DataFrame, amostra: int = 100) -> Optional[str]:
+    """Coluna que contém a chave de acesso: pelo nome ou, se nenhum nome
+    conhecido existir, pelo formato dos valores (44 dígitos)"""
+    for coluna in COLUNAS_CHAVE:
+        if coluna in df.columns:
+            return coluna
+
+    for coluna in df.columns:
+        if coluna.startswith(PREFIXO_DERIVADA) or coluna.startswith(PREFIXO_VALOR):
+            continue
+        valores = df[coluna].dropna().head(amostra).astype(str)
+        if valores.empty:
+            continue
+        limpos = valores.str.replace(_REGEX_CHAVE, '', regex=True)
+        if limpos.str.fullmatch(r'\d{44}').mean() >= 0.9:
+            return coluna
+
+    return None
+
+
+def preparar_colunas_normalizadas(df: pd.DataFrame, com_data: bool = False):
+    """Calcula uma única vez as colunas canônicas usadas nas buscas:
+    chave limpa, CFOP só com dígitos, primeiro dígito do CFOP, NÚMERO texto
+    e, se com_data, data de emissão convertida"""
+    coluna_chave = detectar_coluna_chave(df)
+    if coluna_chave:
+        df[COLUNA_CHAVE] = normalizar_chaves(df[coluna_chave])
+
+    if 'CFOP' in df.columns:
+        # Normaliza só o dicionário da categórica, não cada linha
+        df[COLUNA_CFOP] = _mapear_categorias(
+            df['CFOP'], lambda c: c.str.replace(_REGEX_NAO_DIGITO, '', regex=True)
+        )
+        df[COLUNA_CFOP_D1] = _mapear_categorias(
+            df[COLUNA_CFOP], lambda c: c.str[:1].replace('', '?')
+        )
+
+    if 'NÚMERO' in df.columns:
+        df[COLUNA_NUMERO] = _como_texto(df['NÚMERO']).str.strip()
+
+    coluna_data = next((c for c in COLUNAS_DATA_EMISSAO if c in df.columns), None)
+    if com_data and coluna_data:
+        df[COLUNA_DATA] = converter_data_br(df[coluna_data])
+
+
+def preparar_chave_nota(df_cabecalho: pd.DataFrame, df_itens: pd.DataFrame) -> pd.DataFrame:
+    """Calcula _NOTA (CNPJ do emitente | série | número | chave de acesso) nos
+    dois arquivos e agrupa os itens por nota, na ordem da primeira aparição
+    de cada nota.
+
+    CNPJ + série + número se repetem entre notas distintas (ex.: modelos ou
+    anos diferentes); por isso a chave de acesso entra na identificação
+    sempre que os dois arquivos a trazem.
+
+    Retorna df_itens ordenado; em _NOTA dos itens os códigos da categórica são
+    crescentes, o que permite fatiar os itens de cada nota sem cópia."""
+    componentes = []
+    for candidatas in (COLUNAS_EMITENTE, COLUNAS_SERIE):
+        coluna = next(
+            (c for c in candidatas if c in df_cabecalho.columns and c in df_itens.columns),
+            None
+        )
+        if coluna:
+            componentes.append(coluna)
+    com_chave = COLUNA_CHAVE in df_cabecalho.columns and COLUNA_CHAVE in df_itens.columns
+
+    df_cabecalho[COLUNA_NOTA] = _compor_chave_nota(df_cabecalho, componentes, com_chave)
+
+    codigos, notas = pd.factorize(_compor_chave_nota(df_itens, componentes, com_chave))
+    if len(codigos) and (np.diff(codigos) < 0).any():
+        # Ordenação estável: mantém a ordem original dos itens dentro da nota
+        ordem = np.argsort(codigos, kind='stable')
+        df_itens = df_itens.iloc[ordem].reset_index(drop=True)
+        codigos = codigos[ordem]
+    df_itens[COLUNA_NOTA] = pd.Categorical.from_codes(codigos, categories=notas)
+    return df_itens
+
+
+def _compor_chave_nota(df: pd.DataFrame, componentes, com_chave: bool = False) -> pd.Series:
+    """Concatena os componentes normalizados da identificação da nota
+    (e a chave de acesso normalizada, no fim, se com_chave)"""
+    chave = df[COLUNA_NUMERO] if COLUNA_NUMERO in df.columns else _como_texto(
+        pd.Series('', index=df.index)
+    )
+    for coluna in reversed(componentes):
+        parte = _como_texto(df[coluna]).str.strip()
+        if coluna in COLUNAS_EMITENTE:
+            parte = parte.str.replace(_REGEX_NAO_DIGITO, '', regex=True)
+        chave = parte + '|' + chave
+    if com_chave:
+        chave = chave + '|' + _como_texto(df[COLUNA_CHAVE])
+    return chave
+
+
+def _como_texto(serie: pd.Series) -> pd.Series:
+    """Converte para texto sem nulos (nulos viram string vazia)"""
+    return serie.astype(TIPO_TEXTO).fillna('')
+
+
+def _mapear_categorias(serie: pd.Series, funcao) -> pd.Series:
+    """Aplica uma transformação de texto às categorias e remapeia os códigos"""
+    if not isinstance(serie.dtype, pd.CategoricalDtype):
+        serie = serie.astype('category')
+
+    categorias = funcao(pd.Series(serie.cat.categories.astype(str)))
+    codigos_categoria, valores = pd.factorize(categorias)
+    codigos = serie.cat.codes.to_numpy()
+    remapeados = codigos_categoria[codigos]
+
+    nulos = codigos < 0
+    if nulos.any():
+        # Nulos viram a categoria que a transformação dá ao texto vazio
+        codigo_vazio, valores = _incluir_valor(valores, funcao(pd.Series([''])).iloc[0])
+        remapeados[nulos] = codigo_vazio
+
+    return pd.Series(
+        pd.Categorical.from_codes(remapeados, categories=valores), index=serie.index
+    )
+
+
+def _incluir_valor(valores, valor):
+    """Posição de um valor entre as categorias, acrescentando-o se preciso"""
+    valores = pd.Index(valores)
+    if valor not in valores:
+        valores = valores.append(pd.Index([valor]))
+    return valores.get_loc(valor), valores
+
+
+def converter_decimal_br(serie: pd.Series) -> pd.Series:
+    """Converte texto monetário ('1.234,56' ou '1234.56') para float64"""
+    texto = serie.astype(str).str.strip()
+    tem_virgula = texto.str.contains(',', regex=False)
+    # Somente valores com vírgula estão em pt-BR; nos demais o ponto é decimal
+    texto = texto.where(
+        ~tem_virgula,
+        texto.str.replace('.', '', regex=False).str.replace(',', '.', regex=False)
+    )
+    return pd.to_numeric(texto, errors='coerce')
+
+
+def converter_data_br(serie: pd.Series) -> pd.Series:
+    """Converte datas pt-BR ('31/01/2024 10:28:00' ou só '31/01/2024') para
+    datetime64; datas inválidas viram NaT"""
+    texto = _como_texto(serie).str.strip()
+    datas = pd.to_datetime(texto, format=FORMATO_DATA_BR, errors='coerce')
+    # Outros formatos: ISO (2024-01-31) e, por fim, dia primeiro sem hora etc.
+    for opcoes in ({'format': 'ISO8601'}, {'format': 'mixed', 'dayfirst': True}):
+        falhas = datas.isna() & (texto != '')
+        if not falhas.any():
+            break
+        datas[falhas] = pd.to_datetime(texto[falhas], errors='coerce', **opcoes)
+    return datas
+
+
+def _ler_csv_pyarrow(caminho: str, separador: str, encoding: str, colunas) -> pd.DataFrame:
+    """Leitura multithread com pyarrow; decimais pt-BR convertidos ainda no Arrow"""
+    tabela = pa_csv.read_csv(
+        caminho,
+        read_options=pa_csv.ReadOptions(encoding=encoding, use_threads=True),
+        parse_options=pa_csv.ParseOptions(delimiter=separador),
+        convert_options=pa_csv.ConvertOptions(
+            column_types=_montar_schema_arrow(colunas),
+            strings_can_be_null=True,
+        ),
+    )
+
+    for i, nome in enumerate(tabela.column_names):
+        if nome.startswith(PREFIXO_VALOR):
+            coluna = pc.utf8_trim_whitespace(tabela.column(i))
+            formato_br = pc.replace_substring(
+                pc.replace_substring(coluna, '.', ''), ',', '.'
+            )
+            coluna = pc.if_else(pc.match_substring(coluna, ','), formato_br, coluna)
+            try:
+                coluna = pc.cast(coluna, pa.float64())
+            except pa.ArrowInvalid:
+                # Valores inválidos viram NaN, como no pd.to_numeric
+                coluna = pa.array(pd.to_numeric(coluna.to_pandas(), errors='coerce'))
+            tabela = tabela.set_column(i, nome, coluna)
+
+    return tabela_para_dataframe(tabela)
+
+
+def memoria_residente_mb() -> Optional[float]:
+    """Memória residente atual do processo em MB (None se indisponível)"""
+    try:
+        with open('/proc/self/statm') as f:
+            paginas = int(f.read().split()[1])
+        return paginas * os.sysconf('SC_PAGE_SIZE') / 1024 ** 2
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _ler_cabecalho_csv(caminho: str):
+    """Detecta separador, encoding e colunas a partir da primeira linha"""
+    for encoding in ('utf-8', 'latin-1'):
+        try:
+            with open(Path(caminho), encoding=encoding) as f:
+                primeira_linha = f.readline()
+            break
+        except UnicodeDecodeError:
+            continue
+
+    separador = ';' if primeira_linha.count(';') > primeira_linha.count(',') else ','
+    colunas = [
+        coluna.strip().strip('"')
+        for coluna in primeira_linha.rstrip('\r\n').lstrip('\ufeff').split(separador)
+    ]
+    return separador, encoding, colunas
@@ -0,0 +1,85 @@
+# backend/services/catalogo_cfop.py
+"""
+Catálogo de CFOPs em memória: dicionário código -> registro e trie de
+prefixos para sugestões
+"""
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+from services.carregador_csv import COLUNA_CFOP, PREFIXO_DERIVADA, normalizar_cfop
+
+
+class _NoTrie:
+    """Nó da trie: filhos por dígito e códigos que passam por este prefixo"""
+
+    __slots__ = ('filhos', 'codigos')
+
+    def __init__(self):
+        self.filhos: Dict[str, '_NoTrie'] = {}
+        self.codigos: List[str] = []
+
+
+class CatalogoCFOP:
+    """Tabela CFOP indexada pelo código normalizado (4 dígitos).
+
+    Construído uma vez a partir de CFOP.csv; toda busca de descrição por
+    código passa por aqui em vez de filtrar df_cfop."""
+
+    def __init__(self, df_cfop: pd.DataFrame):
+        colunas = [col for col in df_cfop.columns if not col.startswith(PREFIXO_DERIVADA)]
+        codigos = (
+            df_cfop[COLUNA_CFOP].tolist() if COLUNA_CFOP in df_cfop.columns
+            else [normalizar_cfop(c) for c in df_cfop['CFOP'].tolist()]
+        )
+
+        # Em códigos repetidos prevalece a primeira linha do arquivo
+        self.registros: Dict[str, Dict[str, Any]] = {}
+        for codigo, registro in zip(codigos, df_cfop[colunas].to_dict('records')):
+            if codigo and codigo not in self.registros:
+                self.registros[codigo] = registro
+
+        self._raiz = _NoTrie()
+        for codigo in sorted(self.registros):
+            no = self._raiz
+            for digito in codigo:
+                no = no.filhos.setdefault(digito, _NoTrie())
+                no.codigos.append(codigo)
+
+    def __len__(self) -> int:
+        return len(self.registros)
+
+    def __contains__(self, cfop) -> bool:
+        return normalizar_cfop(cfop) in self.registros
+
+    def buscar(self, cfop) -> Optional[Dict[str, Any]]:
+        """Registro do CFOP (colunas originais do arquivo), ou None"""
+        return self.registros.get(normalizar_cfop(cfop))
+
+    def descricao(self, cfop, padrao: str = 'Descrição não encontrada na tabela') -> str:
+        """Descrição do CFOP, ou o valor padrão se não estiver no catálogo"""
+        registro = self.buscar(cfop)
+        if registro is None:
+            return padrao
+        descricao = registro.get('DESCRIÇÃO')
+        return padrao if descricao is None or pd.isna(descricao) else str(descricao)
+
+    def descricoes(self, cfops: Iterable, padrao: str = 'Descrição não encontrada na tabela') -> List[str]:
+        """Descrições de vários CFOPs (ex.: o top N de uma contagem)"""
+        return [self.descricao(cfop, padrao) for cfop in cfops]
+
+    def sugestoes(self, cfop, limite: int = 5, max_prefixo: int = 2) -> Tuple[str, List[Dict[str, Any]]]:
+        """CFOPs com o maior prefixo em comum (até max_prefixo dígitos).
+
+        Retorna o prefixo usado e os registros encontrados."""
+        digitos = normalizar_cfop(cfop)[:max_prefixo]
+        no, prefixo = self._raiz, ''
+        for digito in digitos:
+            if digito not in no.filhos:
+                break
+            no = no.filhos[digito]
+            prefixo += digito
+
+        if not prefixo:
+            return '', []
+        return prefixo, [self.registros[codigo] for codigo in no.codigos[:limite]]
@@ -0,0 +1,272 @@
+# backend/services/classificador_natureza.py
+"""
+Classificador da natureza da operação a partir de uma tabela declarativa de
+regras (regras/regras_natureza.csv), compilada num avaliador vetorizado.
+
+Formato da tabela (CSV, primeira regra de sufixo que casar vence):
+    tipo         entrada | sufixo
+    categoria    nome da categoria (ex.: venda_compra)
+    condicao     termos separados por '&' (todos obrigatórios); cada termo
+                 aceita alternativas separadas por '|'; '*' casa sempre
+    ultimos_digitos, justificativa   (só para sufixo)
+
+As palavras são procuradas no texto normalizado (sem espaços nas pontas,
+maiúsculo). A tabela pode ser recarregada em tempo de execução.
+"""
+import csv
+import hashlib
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+CAMINHO_REGRAS_PADRAO = Path(__file__).resolve().parent.parent / 'regras' / 'regras_natureza.csv'
+
+TIPO_REGRA_ENTRADA = 'entrada'
+TIPO_REGRA_SUFIXO = 'sufixo'
+
+# Categorias usadas no código (as demais existem só na tabela)
+CATEGORIA_VENDA_COMPRA = 'venda_compra'
+CATEGORIA_OUTRA = 'outra'
+
+
+class ClassificacaoNatureza(NamedTuple):
+    """Resultado da classificação de um texto de natureza da operação"""
+    entrada: bool
+    categoria: str
+    ultimos_digitos: str
+    justificativa: str
+
+    @property
+    def tipo_operacao(self) -> str:
+        return "ENTRADA" if self.entrada else "SAÍDA"
+
+
+class RegraSufixo(NamedTuple):
+    categoria: str
+    termos: Tuple[Tuple[str, ...], ...]
+    ultimos_digitos: str
+    justificativa: str
+
+
+# Sem nenhuma regra de sufixo casando (tabela sem '*' no fim)
+REGRA_PADRAO = RegraSufixo(CATEGORIA_OUTRA, (), '949', "Outra operação não especificada")
+
+
+def _termos(condicao: str) -> Tuple[Tuple[str, ...], ...]:
+    """'REMESSA & CONSERTO|REPARO' -> (('REMESSA',), ('CONSERTO', 'REPARO'))"""
+    condicao = condicao.strip()
+    if condicao in ('', '*'):
+        return ()
+    return tuple(
+        tuple(p.strip().upper() for p in termo.split('|') if p.strip())
+        for termo in condicao.split('&')
+    )
+
+
+def normalizar_textos(valores) -> np.ndarray:
+    return np.array([str(v).strip().upper() for v in valores], dtype=str)
+
+
+class TabelaRegras:
+    """Regras compiladas: cada palavra distinta vira uma coluna de uma matriz
+    booleana (texto x palavra) calculada com np.char.find; cada regra é um
+    E de OUs sobre colunas dessa matriz e a primeira regra verdadeira vence."""
+
+    def __init__(self, palavras_entrada: Tuple[str, ...], regras: List[RegraSufixo],
+                 versao: str = '', origem: str = ''):
+        self.palavras_entrada = tuple(palavras_entrada)
+        self.regras = list(regras) + [REGRA_PADRAO]
+        self.versao = versao
+        self.origem = origem
+
+        self.palavras = sorted(
+            set(self.palavras_entrada) | {p for r in self.regras for termo in r.termos for p in termo}
+        )
+        posicao = {p: i for i, p in enumerate(self.palavras)}
+        self._entrada = np.array([posicao[p] for p in self.palavras_entrada], dtype=np.int64)
+        self._termos = [
+            [np.array([posicao[p] for p in termo], dtype=np.int64) for termo in regra.termos]
+            for regra in self.regras
+        ]
+        self._ultimos = np.array([r.ultimos_digitos for r in self.regras], dtype='<U3')
+        self._cache: Dict[str, ClassificacaoNatureza] = {}
+
+    def __len__(self) -> int:
+        return len(self.regras) - 1
+
+    @classmethod
+    def carregar(cls, caminho) -> 'TabelaRegras':
+        """Lê e valida a tabela CSV (ValueError com a linha problemática)"""
+        caminho = Path(caminho)
+        conteudo = caminho.read_bytes()
+        linhas = list(csv.DictReader(conteudo.decode('utf-8-sig').splitlines()))
+
+        obrigatorias = {'tipo', 'categoria', 'condicao', 'ultimos_digitos', 'justificativa'}
+        if not linhas or not obrigatorias <= set(linhas[0]):
+            raise ValueError(f"Tabela de regras deve ter as colunas: {', '.join(sorted(obrigatorias))}")
+
+        palavras_entrada: List[str] = []
+        regras: List[RegraSufixo] = []
+        for numero, linha in enumerate(linhas, start=2):
+            tipo = (linha['tipo'] or '').strip().lower()
+            termos = _termos(linha['condicao'] or '')
+            if tipo == TIPO_REGRA_ENTRADA:
+                if not termos:
+                    raise ValueError(f"Linha {numero}: regra de entrada sem palavras")
+                palavras_entrada.extend(p for termo in termos for p in termo)
+            elif tipo == TIPO_REGRA_SUFIXO:
+                ultimos = (linha['ultimos_digitos'] or '').strip()
+                if len(ultimos) != 3 or not ultimos.isdigit():
+                    raise ValueError(f"Linha {numero}: ultimos_digitos deve ter 3 dígitos (recebido '{ultimos}')")
+                regras.append(RegraSufixo(
+                    (linha['categoria'] or '').strip(), termos, ultimos, (linha['justificativa'] or '').strip()
+                ))
+            else:
+                raise ValueError(f"Linha {numero}: tipo de regra desconhecido '{linha['tipo']}'")
+
+        versao = hashlib.sha256(conteudo).hexdigest()[:12]
+        return cls(tuple(dict.fromkeys(palavras_entrada)), regras, versao=versao, origem=str(caminho))
+
+    def avaliar(self, textos: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Avalia textos já normalizados de uma vez.
+
+        Retorna (entrada: bool, índice da regra de sufixo: int) por texto."""
+        textos = np.asarray(textos, dtype=str)
+        contem = np.empty((len(textos), len(self.palavras)), dtype=bool)
+        for j, palavra in enumerate(self.palavras):
+            contem[:, j] = np.char.find(textos, palavra) >= 0
+
+        entrada = contem[:, self._entrada].any(axis=1)
+        atende = np.ones((len(textos), len(self.regras)), dtype=bool)
+        for r, termos in enumerate(self._termos):
+            for colunas in termos:
+                atende[:, r] &= contem[:, colunas].any(axis=1)
+        return entrada, atende.argmax(axis=1)
+
+    def classificar(self, natureza: str) -> ClassificacaoNatureza:
+        """Direção (entrada/saída), sufixo do CFOP e justificativa de uma natureza"""
+        texto = str(natureza).strip().upper()
+        if texto not in self._cache:
+            entrada, regra = self.avaliar(np.array([texto]))
+            r = self.regras[regra[0]]
+            self._cache[texto] = ClassificacaoNatureza(
+                bool(entrada[0]), r.categoria, r.ultimos_digitos, r.justificativa
+            )
+        return self._cache[texto]
+
+    def classificar_serie(self, serie: pd.Series):
+        """Classificação de cada linha da coluna de natureza (avaliada uma vez
+        por valor distinto e propagada pelos códigos).
+
+        Retorna (entrada, ultimos_digitos) como arrays NumPy alinhados à série."""
+        codigos, valores = _codigos_e_valores(serie)
+        # Nulos (código -1) usam a classificação do texto vazio, no fim da tabela
+        entrada, regra = self.avaliar(normalizar_textos(list(valores) + ['']))
+        return entrada[codigos], self._ultimos[regra][codigos]
+
+    def para_dict(self) -> dict:
+        return {
+            "versao": self.versao,
+            "origem": self.origem,
+            "palavras_entrada": list(self.palavras_entrada),
+            "regras": [
+                {
+                    "categoria": r.categoria,
+                    "condicao": ' & '.join('|'.join(t) for t in r.termos) or '*',
+                    "ultimos_digitos": r.ultimos_digitos,
+                    "justificativa": r.justificativa,
+                }
+                for r in self.regras[:-1]
+            ],
+        }
+
+
+# ============================================================================
+# TABELA ATIVA (RECARREGÁVEL)
+# ============================================================================
+
+_regras: Optional[TabelaRegras] = None
+_trava = threading.Lock()
+
+
+def carregar_regras(caminho=None) -> TabelaRegras:
+    """Compila a tabela e a torna ativa. Se a tabela for inválida, levanta
+    ValueError e a tabela anterior continua valendo."""
+    global _regras
+    tabela = TabelaRegras.carregar(caminho or CAMINHO_REGRAS_PADRAO)
+    with _trava:
+        _regras = tabela
+    print(f"   📐 {len(tabela)} regras de natureza carregadas (versão {tabela.versao})")
+    return tabela
+
+
+def regras_ativas() -> TabelaRegras:
+    """Tabela em uso (a padrão é carregada no primeiro acesso)"""
+    if _regras is None:
+        carregar_regras()
+    return _regras
+
+
+def classificar_natureza(natureza: str) -> ClassificacaoNatureza:
+    """Classificação pela tabela ativa (memoizada por texto)"""
+    return regras_ativas().classificar(natureza)
+
+
+def classificar_serie(serie: pd.Series):
+    """Classificação vetorizada de uma coluna pela tabela ativa"""
+    return regras_ativas().classificar_serie(serie)
+
+
+# ============================================================================
+# AUXILIARES
+# ============================================================================
+
+def _codigos_e_valores(serie: pd.Series):
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return serie.cat.codes.to_numpy(), serie.cat.categories
+    return pd.factorize(serie)
+
+
+def por_valor_distinto(serie: pd.Series, funcao: Callable, dtype=object, padrao=None) -> np.ndarray:
+    """Aplica `funcao` uma vez por valor distinto e propaga o resultado às
+    linhas (códigos da categórica ou, se não for categórica, factorize).
+    Nulos recebem funcao('') ou `padrao`, se informado."""
+    codigos, valores = _codigos_e_valores(serie)
+
+    vazio = funcao('') if padrao is None else padrao
+    tabela = np.array([funcao(v) for v in valores] + [vazio], dtype=dtype)
+    # Código -1 (nulo) aponta para o último elemento da tabela
+    return tabela[codigos]
+
+
+def benchmark(linhas: int = 1_000_000, distintos: int = 5_000) -> Dict[str, float]:
+    """Vazão do avaliador compilado (linhas/s), direto sobre os textos e
+    pela coluna categórica (avaliação por valor distinto)"""
+    tabela = regras_ativas()
+    base = ['VENDA DE MERCADORIA', 'REMESSA PARA CONSERTO', 'DEVOLUÇÃO DE COMPRA', 'COMPRA PARA COMERCIALIZAÇÃO',
+            'REMESSA EM COMODATO', 'OUTRAS SAÍDAS', 'REMESSA PARA DEMONSTRAÇÃO', 'DEV. DE REMESSA']
+    valores = [f"{base[i % len(base)]} {i}" for i in range(distintos)]
+    rng = np.random.default_rng(0)
+    serie = pd.Series(pd.Categorical.from_codes(rng.integers(0, distintos, linhas), categories=valores))
+    textos = normalizar_textos(serie.astype(str))
+
+    inicio = time.perf_counter()
+    tabela.avaliar(textos)
+    direto = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    tabela.classificar_serie(serie)
+    categorica = time.perf_counter() - inicio
+
+    return {
+        "linhas": linhas,
+        "regras": len(tabela),
+        "palavras": len(tabela.palavras),
+        "linhas_por_segundo_direto": round(linhas / direto),
+        "linhas_por_segundo_categorica": round(linhas / categorica),
+    }
+
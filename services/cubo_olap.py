@@ -0,0 +1,176 @@
+# backend/services/cubo_olap.py
+"""
+Cubo OLAP pré-agregado dos itens: quantidade e valor por par de UFs, CFOP,
+natureza da operação e tipo de divergência. As consultas (fatias e
+agregação por qualquer subconjunto das dimensões) leem só as células do
+cubo, nunca as linhas de itens.
+"""
+import time
+from typing import Any, Callable, Dict, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from services.carregador_csv import COLUNA_CFOP, COLUNA_NOTA, normalizar_cfop
+from services.motor_validacao import TIPOS, formatar_cfop
+
+# Dimensão -> coluna do cabeçalho de onde vem o valor de cada item
+DIMENSOES_CABECALHO = {
+    'uf_emit': 'UF EMITENTE',
+    'uf_dest': 'UF DESTINATÁRIO',
+    'natureza': 'NATUREZA DA OPERAÇÃO',
+}
+DIMENSOES = ['uf_emit', 'uf_dest', 'cfop', 'natureza', 'tipo']
+MEDIDAS = ['itens', 'valor']
+
+# Valor de cada item no cubo
+COLUNA_VALOR_ITEM = 'VALOR TOTAL'
+
+
+def _texto(valor) -> str:
+    return str(valor).strip().upper()
+
+
+def _rotulos_normalizados(serie: pd.Series, linha_do_item: np.ndarray,
+                          normalizar: Callable[[Any], str] = _texto):
+    """(código por item, rótulos) com o texto normalizado (por padrão sem
+    espaços nas pontas e maiúsculo); itens sem cabeçalho ou com valor nulo
+    ficam com ''"""
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        codigos, valores = serie.cat.codes.to_numpy(), serie.cat.categories
+    else:
+        codigos, valores = pd.factorize(serie)
+    # Valores distintos que só diferem em espaços/maiúsculas viram um rótulo
+    normalizados, rotulos = pd.factorize(pd.Index([normalizar(v) for v in valores] + ['']))
+    por_linha = np.append(normalizados[codigos], normalizados[-1])
+    return por_linha[linha_do_item], np.asarray(rotulos, dtype=object)
+
+
+class CuboOLAP:
+    """Células com combinação não vazia das DIMENSOES (código de cada
+    dimensão por célula) e as MEDIDAS somadas em cada uma.
+
+    Montado numa passada sobre os itens (bincount pelo código da célula);
+    o número de células é limitado pelas combinações existentes, bem menor
+    que o de itens."""
+
+    def __init__(self, df_cabecalho: pd.DataFrame, df_itens: pd.DataFrame,
+                 cabecalho_da_nota: np.ndarray, tipos: np.ndarray):
+        inicio = time.perf_counter()
+        # Linha do cabeçalho de cada item (len(df_cabecalho) = sem cabeçalho)
+        linha_da_nota = np.append(cabecalho_da_nota, -1)
+        linha_do_item = linha_da_nota[df_itens[COLUNA_NOTA].cat.codes.to_numpy()]
+        linha_do_item = np.where(linha_do_item >= 0, linha_do_item, len(df_cabecalho))
+
+        codigos: Dict[str, np.ndarray] = {}
+        self.rotulos: Dict[str, np.ndarray] = {}
+        for dimensao, coluna in DIMENSOES_CABECALHO.items():
+            serie = df_cabecalho[coluna] if coluna in df_cabecalho.columns else pd.Series([''] * len(df_cabecalho))
+            codigos[dimensao], self.rotulos[dimensao] = _rotulos_normalizados(serie, linha_do_item)
+
+        codigos['cfop'], self.rotulos['cfop'] = _rotulos_normalizados(
+            df_itens[COLUNA_CFOP], np.arange(len(df_itens)), normalizar_cfop
+        )
+        codigos['tipo'] = np.asarray(tipos, dtype=np.int64)
+        self.rotulos['tipo'] = np.asarray(TIPOS, dtype=object)
+
+        # Código da célula: combinação sequencial das dimensões
+        celula = np.zeros(len(df_itens), dtype=np.int64)
+        for dimensao in DIMENSOES:
+            celula, _ = pd.factorize(celula * len(self.rotulos[dimensao]) + codigos[dimensao])
+        quantidade = int(celula.max()) + 1 if len(celula) else 0
+
+        # Um item representante por célula dá o código de cada dimensão
+        representante = np.zeros(quantidade, dtype=np.int64)
+        representante[celula[::-1]] = np.arange(len(celula))[::-1]
+        self.celulas = {d: codigos[d][representante].astype(np.int32) for d in DIMENSOES}
+
+        valor = (
+            np.nan_to_num(df_itens[COLUNA_VALOR_ITEM].to_numpy(dtype=np.float64, na_value=np.nan))
+            if COLUNA_VALOR_ITEM in df_itens.columns else np.zeros(len(df_itens))
+        )
+        self.medidas = {
+            'itens': np.bincount(celula, minlength=quantidade).astype(np.int64),
+            'valor': np.bincount(celula, weights=valor, minlength=quantidade),
+        }
+        self.segundos_montagem = time.perf_counter() - inicio
+        print(f"   🧊 Cubo OLAP: {quantidade} células de {len(df_itens)} itens "
+              f"em {self.segundos_montagem:.2f}s")
+
+    def __len__(self) -> int:
+        return len(self.medidas['itens'])
+
+    def consultar(self, filtros: Optional[Dict[str, Sequence[str]]] = None,
+                  agrupar: Sequence[str] = (), ordenar: str = 'itens',
+                  limite: Optional[int] = None) -> Dict[str, Any]:
+        """Fatia o cubo pelos filtros (dimensão -> valores aceitos) e agrega
+        as células restantes pelas dimensões de `agrupar` (nenhuma = total).
+
+        Ex.: consultar({'uf_emit': ['SP'], 'tipo': ['primeiro_digito']},
+        agrupar=['uf_dest', 'cfop'])"""
+        inicio = time.perf_counter()
+        filtros = {d: v for d, v in (filtros or {}).items() if v}
+        desconhecidas = [d for d in [*filtros, *agrupar] if d not in DIMENSOES]
+        if desconhecidas:
+            raise ValueError(
+                f"Dimensões desconhecidas: {', '.join(desconhecidas)} "
+                f"(disponíveis: {', '.join(DIMENSOES)})"
+            )
+        if ordenar not in MEDIDAS + list(agrupar):
+            raise ValueError(f"Ordenação inválida: {ordenar} (use {', '.join(MEDIDAS + list(agrupar))})")
+
+        selecionadas = np.ones(len(self), dtype=bool)
+        for dimensao, valores in filtros.items():
+            aceitos = np.flatnonzero(np.isin(self.rotulos[dimensao], [self._normalizar(dimensao, v) for v in valores]))
+            selecionadas &= np.isin(self.celulas[dimensao], aceitos)
+        celulas = np.flatnonzero(selecionadas)
+
+        # Grupo de cada célula selecionada pela combinação das dimensões pedidas
+        grupo = np.zeros(len(celulas), dtype=np.int64)
+        for dimensao in agrupar:
+            grupo, _ = pd.factorize(grupo * len(self.rotulos[dimensao]) + self.celulas[dimensao][celulas])
+        grupos = int(grupo.max()) + 1 if len(grupo) else 0
+
+        somas = {m: np.bincount(grupo, weights=self.medidas[m][celulas], minlength=grupos) for m in MEDIDAS}
+        primeira = np.zeros(grupos, dtype=np.int64)
+        primeira[grupo[::-1]] = celulas[::-1]
+
+        # Ordena os grupos antes de montar as linhas (só as do limite)
+        if ordenar in MEDIDAS:
+            ordem = np.argsort(-somas[ordenar], kind='stable')
+        else:
+            ordem = sorted(range(grupos), key=lambda g: self._rotulo(ordenar, self.celulas[ordenar][primeira[g]]))
+        linhas = [
+            {
+                **{d: self._rotulo(d, self.celulas[d][primeira[g]]) for d in agrupar},
+                "itens": int(somas['itens'][g]),
+                "valor": round(float(somas['valor'][g]), 2),
+            }
+            for g in ordem[:limite]
+        ]
+
+        return {
+            "filtros": {d: list(v) for d, v in filtros.items()},
+            "agrupar": list(agrupar),
+            "total": {
+                "itens": int(self.medidas['itens'][celulas].sum()),
+                "valor": round(float(self.medidas['valor'][celulas].sum()), 2),
+            },
+            "grupos": grupos,
+            "linhas": linhas,
+            "celulas_lidas": int(len(celulas)),
+            "milissegundos": round((time.perf_counter() - inicio) * 1000, 2),
+        }
+
+    def _rotulo(self, dimensao: str, codigo: int) -> str:
+        rotulo = str(self.rotulos[dimensao][codigo])
+        return formatar_cfop(rotulo) if dimensao == 'cfop' and rotulo else rotulo
+
+    @staticmethod
+    def _normalizar(dimensao: str, valor: str) -> str:
+        """Valor do filtro no formato dos rótulos ('5.102' -> '5102', 'sp' -> 'SP')"""
+        if dimensao == 'cfop':
+            return normalizar_cfop(valor)
+        if dimensao == 'tipo':
+            return str(valor).strip()
+        return _texto(valor)
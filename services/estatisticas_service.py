@@ -2,56 +2,260 @@
 """
 Serviço de estatísticas e análises
 """
-from collections import Counter, defaultdict
-from typing import List, Dict, Any
-import random
+from typing import List, Dict, Any, Callable, Optional, Tuple
+import copy
+import threading
+import time
 from datetime import datetime
 
+import numpy as np
+import pandas as pd
+
+from services.amostragem import FRACAO_INICIAL, PlanoAmostragem, estimar_proporcao, estratos_cabecalho
+from services.carregador_csv import COLUNA_CFOP, COLUNA_NOTA
+from services.cubo_olap import CuboOLAP
+from services.motor_validacao import (
+    CODIGOS_DIVERGENTES, TIPOS, TIPO_CONFORME, TIPO_PRIMEIRO_DIGITO, TIPO_ULTIMOS_DIGITOS, TIPO_SEM_CABECALHO,
+    validar_bloco
+)
+
+# Painéis de /api/estatisticas/dashboard (mesmas chaves das rotas individuais)
+PAINEIS_DASHBOARD = ['resumo', 'cfops', 'divergencias', 'operacoes', 'tendencia', 'top_divergencias']
+
+class AgregadoEstatisticas:
+    """Resultado de uma passada de agregação sobre todos os itens: contagem por
+    tipo, notas ordenadas por divergências críticas e contagens de CFOP e
+    UF. Todas as rotas de estatísticas leem deste mesmo objeto."""
+    
+    def __init__(self, contagens: Dict[str, int], notas_criticas: np.ndarray,
+                 qtd_criticas: np.ndarray, cfops: pd.Series, ufs: pd.Series,
+                 divergencias_por_dia: np.ndarray):
+        self.contagens = contagens
+        # Códigos de _NOTA e quantidade de divergências críticas, da maior para a menor
+        self.notas_criticas = notas_criticas
+        self.qtd_criticas = qtd_criticas
+        self.cfops = cfops
+        self.ufs = ufs
+        # Itens divergentes por dia de emissão (dias de agente.serie_temporal)
+        self.divergencias_por_dia = divergencias_por_dia
+        self.gerado_em = datetime.now()
+
 class EstatisticasService:
-    """Serviço para cálculo de estatísticas"""
+    """Serviço para cálculo de estatísticas (uma instância por agente, ou
+    seja, por conjunto de dados carregado).
+    
+    Os resultados ficam em cache por versão dos resultados (dados + tabela
+    de regras) e por parâmetros; quando a versão muda o cache é descartado."""
     
     def __init__(self, agente):
         self.agente = agente
+        self._cache: Dict[Tuple, Any] = {}
+        self._versao_cache: Optional[str] = None
+        self._travas: Dict[Tuple, threading.Lock] = {}
+        self._trava = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
     
-    def obter_resumo(self, sample_size: int = 200) -> Dict[str, Any]:
+    def obter_resumo(self) -> Dict[str, Any]:
         """Calcula resumo geral das estatísticas"""
+        return self._memorizado('resumo', (), self._calcular_resumo)
+    
+    def obter_distribuicao_cfop(self, top_n: int = 10) -> List[Dict[str, Any]]:
+        """Retorna distribuição dos CFOPs mais utilizados"""
+        return self._memorizado('cfop', (top_n,), lambda: self._calcular_distribuicao_cfop(top_n))
+    
+    def obter_divergencias_por_tipo(self) -> List[Dict[str, Any]]:
+        """Retorna divergências agrupadas por tipo"""
+        return self._memorizado('tipos', (), self._calcular_divergencias_por_tipo)
+    
+    def obter_operacoes_por_uf(self, top_n: int = 10) -> List[Dict[str, Any]]:
+        """Retorna distribuição de operações por UF"""
+        return self._memorizado('uf', (top_n,), lambda: self._calcular_operacoes_por_uf(top_n))
+    
+    def obter_tendencia_mensal(self) -> List[Dict[str, Any]]:
+        """Retorna notas, itens, valor e divergências por mês de emissão"""
+        return self._memorizado(
+            'tendencia', (), lambda: self.agente.serie_temporal.por_mes(self.agregar().divergencias_por_dia)
+        )
+    
+    def obter_tendencia_diaria(self) -> List[Dict[str, Any]]:
+        """Retorna notas, itens, valor e divergências por dia de emissão"""
+        return self._memorizado(
+            'tendencia_diaria', (), lambda: self.agente.serie_temporal.por_dia(self.agregar().divergencias_por_dia)
+        )
+    
+    def obter_top_divergencias(self, top_n: int = 10) -> List[Dict[str, Any]]:
+        """Retorna top N notas com mais problemas"""
+        return self._memorizado('top', (top_n,), lambda: self._calcular_top_divergencias(top_n))
+    
+    def obter_dashboard(self, paineis: Optional[List[str]] = None, top_n: int = 10) -> Dict[str, Any]:
+        """Todos os painéis do dashboard (ou só os pedidos) numa resposta,
+        a partir do mesmo agregado"""
+        paineis = PAINEIS_DASHBOARD if paineis is None else paineis
+        desconhecidos = [p for p in paineis if p not in PAINEIS_DASHBOARD]
+        if desconhecidos:
+            raise ValueError(
+                f"Painéis desconhecidos: {', '.join(desconhecidos)} "
+                f"(disponíveis: {', '.join(PAINEIS_DASHBOARD)})"
+            )
+        
+        calculos = {
+            'resumo': self.obter_resumo,
+            'cfops': lambda: self.obter_distribuicao_cfop(top_n=top_n),
+            'divergencias': self.obter_divergencias_por_tipo,
+            'operacoes': lambda: self.obter_operacoes_por_uf(top_n=top_n),
+            'tendencia': self.obter_tendencia_mensal,
+            'top_divergencias': lambda: self.obter_top_divergencias(top_n=top_n),
+        }
+        return {painel: calculos[painel]() for painel in paineis}
+    
+    def agregar(self) -> AgregadoEstatisticas:
+        """Agregado de todos os itens (uma única passada, compartilhada por
+        todos os resultados acima enquanto dados e regras não mudam)"""
+        return self._memorizado('agregado', (), self._calcular_agregado, copiar=False)
+    
+    def cubo(self) -> CuboOLAP:
+        """Cubo OLAP (UFs x CFOP x natureza x tipo), montado uma vez por
+        versão dos resultados"""
+        return self._memorizado('cubo', (), self._montar_cubo, copiar=False)
+    
+    def consultar_cubo(self, filtros: Optional[Dict[str, List[str]]] = None,
+                       agrupar: Optional[List[str]] = None, ordenar: str = 'itens',
+                       limite: Optional[int] = None) -> Dict[str, Any]:
+        """Fatia e agrega o cubo (ver CuboOLAP.consultar); ValueError para
+        dimensão ou ordenação desconhecida"""
+        return self.cubo().consultar(filtros, agrupar or [], ordenar=ordenar, limite=limite)
+    
+    def preparar(self):
+        """Monta agregado e cubo de antemão (ex.: ao fim do job de
+        validação), para a primeira consulta não pagar a montagem"""
+        self.agregar()
+        self.cubo()
+    
+    def estimar_conformidade(self, orcamento_ms: float = 300, confianca: float = 0.95,
+                             semente: int = 0) -> Dict[str, Any]:
+        """Estimativa rápida da conformidade por amostra aleatória estratificada
+        (par de UFs + natureza), com intervalo de confiança.
+        
+        A amostra cresce em rodadas, dobrando a fração de cada estrato,
+        enquanto a próxima rodada couber no orçamento de tempo. Se o resultado
+        completo já estiver pronto, devolve os números exatos (exato=True)."""
+        inicio = time.perf_counter()
+        motor = self.agente.motor_validacao
+        if motor.pronto:
+            return self._estimativa_exata(confianca, inicio)
+        
+        contexto = self._memorizado('contexto_validacao', (), lambda: motor.contexto()[0], copiar=False)
+        codigos = motor.codigos_itens()
+        plano = self._memorizado(
+            'plano_amostragem', (semente,),
+            lambda: self._plano_amostragem(contexto, codigos['notas'], semente), copiar=False
+        )
+        
+        estratos = len(plano.tamanhos)
+        # Itens sorteados por tipo (linhas) e estrato (colunas)
+        contagens = np.zeros((len(TIPOS), estratos), dtype=np.int64)
+        amostra = np.zeros(estratos, dtype=np.int64)
+        fracao = FRACAO_INICIAL
+        orcamento = orcamento_ms / 1000
+        while True:
+            inicio_rodada = time.perf_counter()
+            ate = plano.ate(fracao)
+            novos = plano.entre(amostra, ate)
+            posicoes = plano.posicoes[novos]
+            _, _, tipo = validar_bloco(
+                contexto, codigos['notas'][posicoes], codigos['cfops'][posicoes], codigos['digitos'][posicoes]
+            )
+            contagens += np.bincount(
+                tipo.astype(np.int64) * estratos + plano.estrato[novos], minlength=len(TIPOS) * estratos
+            ).reshape(len(TIPOS), estratos)
+            amostra = ate
+            
+            # A próxima rodada tem cerca do dobro de itens
+            agora = time.perf_counter()
+            if fracao >= 1 or (agora - inicio) + 2 * (agora - inicio_rodada) > orcamento:
+                break
+            fracao = min(fracao * 2, 1.0)
+        
+        criticas = contagens[TIPOS.index(TIPO_PRIMEIRO_DIGITO)]
+        divergentes = criticas + contagens[TIPOS.index(TIPO_ULTIMOS_DIGITOS)]
+        conformes = contagens[TIPOS.index(TIPO_CONFORME)]
+        populacao = plano.total
+        
+        return {
+            "exato": bool(amostra.sum() == populacao),
+            "amostra": int(amostra.sum()),
+            "populacao": populacao,
+            "estratos": plano.quantidade_estratos,
+            "confianca": confianca,
+            "taxa_conformidade": _em_percentual(
+                estimar_proporcao(conformes, amostra, plano.tamanhos, confianca)
+            ),
+            "divergencias_criticas": _em_itens(
+                estimar_proporcao(criticas, amostra, plano.tamanhos, confianca), populacao
+            ),
+            "divergencias_total": _em_itens(
+                estimar_proporcao(divergentes, amostra, plano.tamanhos, confianca), populacao
+            ),
+            "milissegundos": round((time.perf_counter() - inicio) * 1000, 1)
+        }
+    
+    def invalidar(self):
+        """Descarta o cache (reinicialização ou reset do sistema)"""
+        with self._trava:
+            self._cache.clear()
+            self._travas.clear()
+            self._versao_cache = None
+    
+    def estatisticas_cache(self) -> Dict[str, Any]:
+        """Contadores de acerto/falha do cache de resultados"""
+        consultas = self.acertos + self.falhas
+        return {
+            "versao": self._versao_cache,
+            "entradas": len(self._cache),
+            "acertos": self.acertos,
+            "falhas": self.falhas,
+            "taxa_acerto": round(self.acertos / consultas * 100, 1) if consultas else 0.0,
+        }
+    
+    # ========================================================================
+    # CÁLCULOS (SEMPRE A PARTIR DO AGREGADO)
+    # ========================================================================
+    
+    def _calcular_resumo(self) -> Dict[str, Any]:
+        agregado = self.agregar()
         total_notas = len(self.agente.df_cabecalho)
         total_itens = len(self.agente.df_itens)
         
-        # Validar amostra
-        divergencias = self._validar_amostra(sample_size)
+        # Contagens de todos os itens (resultado do motor de validação)
+        contagens = agregado.contagens
+        validados = sum(contagens.values()) - contagens.get(TIPO_SEM_CABECALHO, 0)
+        divergencias_criticas = contagens.get(TIPO_PRIMEIRO_DIGITO, 0)
+        divergencias_total = divergencias_criticas + contagens.get(TIPO_ULTIMOS_DIGITOS, 0)
         
         taxa_conformidade = (
-            (sample_size - len(divergencias)) / sample_size * 100
-            if sample_size > 0 else 0
+            contagens.get(TIPO_CONFORME, 0) / validados * 100
+            if validados > 0 else 0
         )
         
-        divergencias_criticas = len([
-            d for d in divergencias if d.get('tipo') == 'critico'
-        ])
-        
         return {
             "total_notas": total_notas,
             "total_itens": total_itens,
             "taxa_conformidade": round(taxa_conformidade, 1),
             "divergencias_criticas": divergencias_criticas,
-            "divergencias_total": len(divergencias),
-            "ultima_analise": datetime.now().strftime("%d/%m/%Y %H:%M")
+            "divergencias_total": divergencias_total,
+            "ultima_analise": agregado.gerado_em.strftime("%d/%m/%Y %H:%M")
         }
     
-    def obter_distribuicao_cfop(self, top_n: int = 10) -> List[Dict[str, Any]]:
-        """Retorna distribuição dos CFOPs mais utilizados"""
-        # Contar CFOPs
-        cfops = self.agente.df_itens['CFOP'].astype(str).str.replace(
-            '.', ''
-        ).str.replace(',', '').str.replace(' ', '')
-        
-        contador = Counter(cfops)
+    def _calcular_distribuicao_cfop(self, top_n: int) -> List[Dict[str, Any]]:
+        # Contagem pelos códigos categóricos, feita na passada de agregação
+        contador = self.agregar().cfops
         total_itens = len(self.agente.df_itens)
         
-        # Top N CFOPs
+        # Top N CFOPs (descrição via catálogo)
+        catalogo = self.agente.catalogo_cfop
         top_cfops = []
-        for cfop, count in contador.most_common(top_n):
+        for cfop, count in contador.head(top_n).items():
             # Formatar CFOP
             if len(cfop) == 4 and cfop.isdigit():
                 cfop_formatado = f"{cfop[0]}.{cfop[1:]}"
@@ -60,176 +264,179 @@ class EstatisticasService:
             
             top_cfops.append({
                 "cfop": cfop_formatado,
-                "quantidade": count,
+                "descricao": catalogo.descricao(cfop, padrao=''),
+                "quantidade": int(count),
                 "percentual": round((count / total_itens * 100), 2)
             })
         
         return top_cfops
     
-    def obter_divergencias_por_tipo(self, sample_size: int = 200) -> List[Dict[str, Any]]:
-        """Retorna divergências agrupadas por tipo"""
-        divergencias = {
-            "primeiro_digito": 0,
-            "ultimos_digitos": 0,
-            "conformes": 0
-        }
-        
-        sample_size = min(sample_size, len(self.agente.df_itens))
-        
-        for _, item in self.agente.df_itens.head(sample_size).iterrows():
-            numero_nota = str(item.get('NÚMERO', ''))
-            cfop_item = str(item.get('CFOP', ''))
-            
-            cabecalho = self.agente.df_cabecalho[
-                self.agente.df_cabecalho['NÚMERO'].astype(str) == numero_nota
-            ]
-            
-            if not cabecalho.empty:
-                primeiro_digito_esperado = self._inferir_primeiro_digito_nota(
-                    cabecalho.iloc[0]
-                )
-                
-                cfop_limpo = cfop_item.replace('.', '').replace(',', '').replace(' ', '')
-                primeiro_digito_atual = cfop_limpo[0] if cfop_limpo else "?"
-                
-                if primeiro_digito_esperado != primeiro_digito_atual:
-                    divergencias["primeiro_digito"] += 1
-                else:
-                    divergencias["conformes"] += 1
+    def _calcular_divergencias_por_tipo(self) -> List[Dict[str, Any]]:
+        contagens = self.agregar().contagens
         
         return [
             {
                 "tipo": "Primeiro Dígito Incorreto",
-                "quantidade": divergencias["primeiro_digito"],
+                "quantidade": contagens.get(TIPO_PRIMEIRO_DIGITO, 0),
                 "cor": "#ef4444"
             },
             {
                 "tipo": "Últimos Dígitos Incorretos",
-                "quantidade": divergencias["ultimos_digitos"],
+                "quantidade": contagens.get(TIPO_ULTIMOS_DIGITOS, 0),
                 "cor": "#f59e0b"
             },
             {
                 "tipo": "Conformes",
-                "quantidade": divergencias["conformes"],
+                "quantidade": contagens.get(TIPO_CONFORME, 0),
                 "cor": "#10b981"
             }
         ]
     
-    def obter_operacoes_por_uf(self, top_n: int = 10) -> List[Dict[str, Any]]:
-        """Retorna distribuição de operações por UF"""
-        uf_destino = self.agente.df_cabecalho['UF DESTINATÁRIO'].value_counts().head(top_n)
+    def _calcular_operacoes_por_uf(self, top_n: int) -> List[Dict[str, Any]]:
+        uf_destino = self.agregar().ufs.head(top_n)
         
         return [
             {"uf": str(uf), "quantidade": int(count)}
             for uf, count in uf_destino.items()
         ]
     
-    def obter_tendencia_mensal(self) -> List[Dict[str, Any]]:
-        """Retorna tendência de notas ao longo do tempo (simulado)"""
-        meses = ["Maio", "Junho", "Julho", "Agosto", "Setembro", "Outubro"]
+    def _calcular_top_divergencias(self, top_n: int) -> List[Dict[str, Any]]:
+        agregado = self.agregar()
+        notas = agregado.notas_criticas[:top_n]
         
-        random.seed(42)  # Resultados consistentes
+        # Cabeçalhos das notas do top lidos de uma vez (posições via índice)
+        linhas = self.agente.indice_notas.cabecalho_da_nota[notas]
+        cabecalhos = self.agente.df_cabecalho.iloc[linhas]
+        numeros = _coluna_ou(cabecalhos, 'NÚMERO', '')
+        naturezas = _coluna_ou(cabecalhos, 'NATUREZA DA OPERAÇÃO', 'N/A')
+        valores = _coluna_ou(cabecalhos, self.agente.coluna_valor_nota, 0)
         
         return [
             {
-                "mes": mes,
-                "notas": random.randint(80, 150),
-                "divergencias": random.randint(5, 25)
+                "nota": str(numero),
+                "divergencias": int(qtd),
+                "natureza": str(natureza)[:50],
+                "valor": float(valor)
             }
-            for mes in meses
+            for numero, qtd, natureza, valor in zip(
+                numeros, agregado.qtd_criticas[:top_n], naturezas, valores
+            )
         ]
     
-    def obter_top_divergencias(self, sample_size: int = 200, top_n: int = 10) -> List[Dict[str, Any]]:
-        """Retorna top N notas com mais problemas"""
-        divergencias_por_nota = defaultdict(list)
+    # ========================================================================
+    # MÉTODOS AUXILIARES PRIVADOS
+    # ========================================================================
+    
+    def _memorizado(self, nome: str, parametros: Tuple, calcular: Callable[[], Any], copiar: bool = True):
+        """Resultado em cache para (versão dos resultados, nome, parâmetros).
+        Chamadas simultâneas para a mesma chave esperam um único cálculo
+        (chaves diferentes não se bloqueiam: a estimativa por amostra não
+        espera o agregado completo); a cópia devolvida pode ser alterada sem
+        afetar o cache."""
+        versao = self.agente.motor_validacao.versao_resultados
+        chave = (nome, parametros)
+        with self._trava:
+            if versao != self._versao_cache:
+                self._cache.clear()
+                self._travas.clear()
+                self._versao_cache = versao
+            trava_chave = self._travas.setdefault(chave, threading.Lock())
         
-        sample_size = min(sample_size, len(self.agente.df_itens))
+        with trava_chave:
+            with self._trava:
+                encontrado = chave in self._cache
+                if encontrado:
+                    self.acertos += 1
+                    valor = self._cache[chave]
+                else:
+                    self.falhas += 1
+            if not encontrado:
+                valor = calcular()
+                with self._trava:
+                    if versao == self._versao_cache:
+                        self._cache[chave] = valor
+        return copy.deepcopy(valor) if copiar else valor
+    
+    def _calcular_agregado(self) -> AgregadoEstatisticas:
+        """Uma passada vetorizada sobre os tipos de todos os itens: contagem por
+        tipo e divergências críticas por nota (bincount pelos códigos)"""
+        tipos = self._codigos_tipo()
+        contagens = {
+            TIPOS[codigo]: int(qtd)
+            for codigo, qtd in enumerate(np.bincount(tipos, minlength=len(TIPOS)))
+            if qtd
+        }
         
-        for _, item in self.agente.df_itens.head(sample_size).iterrows():
-            numero_nota = str(item.get('NÚMERO', ''))
-            cfop_item = str(item.get('CFOP', ''))
-            
-            cabecalho = self.agente.df_cabecalho[
-                self.agente.df_cabecalho['NÚMERO'].astype(str) == numero_nota
-            ]
-            
-            if not cabecalho.empty:
-                primeiro_digito_esperado = self._inferir_primeiro_digito_nota(
-                    cabecalho.iloc[0]
-                )
-                
-                cfop_limpo = cfop_item.replace('.', '').replace(',', '').replace(' ', '')
-                primeiro_digito_atual = cfop_limpo[0] if cfop_limpo else "?"
-                
-                if primeiro_digito_esperado != primeiro_digito_atual:
-                    divergencias_por_nota[numero_nota].append({
-                        'cfop': cfop_item,
-                        'esperado': f"{primeiro_digito_esperado}xxx"
-                    })
-        
-        # Top N notas com mais divergências
-        top_notas = sorted(
-            [(nota, len(divs)) for nota, divs in divergencias_por_nota.items()],
-            key=lambda x: x[1],
-            reverse=True
-        )[:top_n]
-        
-        resultado = []
-        for nota, qtd_divergencias in top_notas:
-            cabecalho = self.agente.df_cabecalho[
-                self.agente.df_cabecalho['NÚMERO'].astype(str) == nota
-            ]
-            
-            if not cabecalho.empty:
-                resultado.append({
-                    "nota": nota,
-                    "divergencias": qtd_divergencias,
-                    "natureza": str(cabecalho.iloc[0].get('NATUREZA DA OPERAÇÃO', 'N/A'))[:50],
-                    "valor": float(cabecalho.iloc[0].get('VALOR TOTAL DA NF', 0))
-                })
+        # Itens agrupados por nota: códigos crescentes = ordem da primeira ocorrência
+        notas = self.agente.df_itens[COLUNA_NOTA].cat.codes.to_numpy()
+        criticas = notas[(tipos == TIPOS.index(TIPO_PRIMEIRO_DIGITO)) & (notas >= 0)]
+        por_nota = np.bincount(criticas, minlength=len(self.agente.indice_notas))
+        com_criticas = np.flatnonzero(por_nota)
+        ordem = com_criticas[np.argsort(-por_nota[com_criticas], kind='stable')]
+        
+        # Notas sem cabeçalho não entram no top
+        ordem = ordem[self.agente.indice_notas.cabecalho_da_nota[ordem] >= 0]
         
-        return resultado
+        return AgregadoEstatisticas(
+            contagens=contagens,
+            notas_criticas=ordem,
+            qtd_criticas=por_nota[ordem],
+            cfops=self.agente.df_itens[COLUNA_CFOP].value_counts(),
+            ufs=self.agente.df_cabecalho['UF DESTINATÁRIO'].value_counts(),
+            divergencias_por_dia=self.agente.serie_temporal.divergencias_por_dia(
+                np.isin(tipos, CODIGOS_DIVERGENTES)
+            ),
+        )
     
-    # ========================================================================
-    # MÉTODOS AUXILIARES PRIVADOS
-    # ========================================================================
+    def _montar_cubo(self) -> CuboOLAP:
+        return CuboOLAP(
+            self.agente.df_cabecalho, self.agente.df_itens,
+            self.agente.indice_notas.cabecalho_da_nota, self._codigos_tipo()
+        )
     
-    def _validar_amostra(self, sample_size: int) -> List[Dict[str, Any]]:
-        """Valida uma amostra de itens"""
-        divergencias = []
-        sample_size = min(sample_size, len(self.agente.df_itens))
+    def _plano_amostragem(self, contexto: Dict[str, np.ndarray], notas: np.ndarray,
+                          semente: int) -> PlanoAmostragem:
+        """Plano com o estrato de cada item (o do seu cabeçalho); itens sem
+        cabeçalho ficam fora, como no denominador da taxa de conformidade"""
+        estrato_da_linha = np.append(estratos_cabecalho(self.agente.df_cabecalho), -1)
+        return PlanoAmostragem(estrato_da_linha[contexto['cabecalho_da_nota'][notas]], semente)
+    
+    def _estimativa_exata(self, confianca: float, inicio: float) -> Dict[str, Any]:
+        """Números do resultado completo no formato da estimativa"""
+        contagens = self.agregar().contagens
+        validados = sum(contagens.values()) - contagens.get(TIPO_SEM_CABECALHO, 0)
+        criticas = contagens.get(TIPO_PRIMEIRO_DIGITO, 0)
+        divergentes = criticas + contagens.get(TIPO_ULTIMOS_DIGITOS, 0)
+        taxa = round(contagens.get(TIPO_CONFORME, 0) / validados * 100, 1) if validados else 0.0
         
-        for _, item in self.agente.df_itens.head(sample_size).iterrows():
-            numero_nota = str(item.get('NÚMERO', ''))
-            cfop_item = str(item.get('CFOP', ''))
-            
-            cabecalho = self.agente.df_cabecalho[
-                self.agente.df_cabecalho['NÚMERO'].astype(str) == numero_nota
-            ]
-            
-            if not cabecalho.empty:
-                primeiro_digito_esperado = self._inferir_primeiro_digito_nota(
-                    cabecalho.iloc[0]
-                )
-                
-                cfop_limpo = cfop_item.replace('.', '').replace(',', '').replace(' ', '')
-                primeiro_digito_atual = cfop_limpo[0] if cfop_limpo else "?"
-                
-                if primeiro_digito_esperado != primeiro_digito_atual:
-                    divergencias.append({
-                        'nota': numero_nota,
-                        'tipo': 'critico'
-                    })
-        
-        return divergencias
-    
-    def _inferir_primeiro_digito_nota(self, nota_row) -> str:
-        """Infere o primeiro dígito do CFOP para uma nota"""
-        natureza = str(nota_row.get('NATUREZA DA OPERAÇÃO', '')).upper()
-        uf_emit = str(nota_row.get('UF EMITENTE', '')).strip()
-        uf_dest = str(nota_row.get('UF DESTINATÁRIO', '')).strip()
-        destino_op = str(nota_row.get('DESTINO DA OPERAÇÃO', '')).strip()
-        
-        return self.agente._inferir_primeiro_digito(
-            natureza, uf_emit, uf_dest, destino_op
-        )
\ No newline at end of file
+        return {
+            "exato": True,
+            "amostra": validados,
+            "populacao": validados,
+            "estratos": None,
+            "confianca": confianca,
+            "taxa_conformidade": {"estimativa": taxa, "inferior": taxa, "superior": taxa},
+            "divergencias_criticas": {"estimativa": criticas, "inferior": criticas, "superior": criticas},
+            "divergencias_total": {"estimativa": divergentes, "inferior": divergentes, "superior": divergentes},
+            "milissegundos": round((time.perf_counter() - inicio) * 1000, 1)
+        }
+    
+    def _codigos_tipo(self) -> np.ndarray:
+        """Código do tipo (posição em TIPOS) de cada item, do resultado em
+        memória do motor. Após um reinício ele é remontado a partir das
+        impressões digitais guardadas (sem revalidar), o que é mais rápido
+        que ler uma coluna por item do SQLite."""
+        return self.agente.motor_validacao.resultado().itens['tipo'].cat.codes.to_numpy()
+
+
+def _em_percentual(estimativa: Dict[str, float]) -> Dict[str, float]:
+    return {chave: round(estimativa[chave] * 100, 1) for chave in ("estimativa", "inferior", "superior")}
+
+def _em_itens(estimativa: Dict[str, float], populacao: int) -> Dict[str, int]:
+    return {chave: int(round(estimativa[chave] * populacao)) for chave in ("estimativa", "inferior", "superior")}
+
+def _coluna_ou(df: pd.DataFrame, coluna: str, padrao) -> List[Any]:
+    """Valores da coluna (ou `padrao` em todas as linhas, se ela não existir)"""
+    if coluna not in df.columns:
+        return [padrao] * len(df)
+    return df[coluna].tolist()
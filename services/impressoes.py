@@ -0,0 +1,88 @@
+# backend/services/impressoes.py
+"""
+Impressões digitais (hash de 64 bits) do conteúdo normalizado das linhas e
+identidade de cada item, usadas para reaproveitar resultados de validação
+entre carregamentos
+"""
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from services.carregador_csv import COLUNA_CFOP, COLUNA_NOTA
+from services.classificador_natureza import regras_ativas
+
+# Campos do cabeçalho dos quais o veredito de um item depende
+COLUNAS_CABECALHO_VALIDACAO = [
+    'NATUREZA DA OPERAÇÃO', 'UF EMITENTE', 'UF DESTINATÁRIO', 'DESTINO DA OPERAÇÃO'
+]
+
+# Campos dos itens gravados no repositório além do CFOP (mudou algum, o
+# item é regravado; revalidá-lo junto custa pouco)
+COLUNAS_ITENS_GRAVADAS = ['CFOP', 'VALOR TOTAL', 'CPF/CNPJ Emitente']
+
+# Mudou a regra de validação no código? Troque a versão para invalidar os
+# resultados guardados (mudanças na tabela de regras já entram pela versão dela)
+VERSAO_REGRAS = "1"
+
+_MULTIPLICADOR = np.uint64(1000003)
+
+
+def _hash_texto(valores) -> np.ndarray:
+    return pd.util.hash_array(np.asarray(valores, dtype=object), categorize=False)
+
+
+def hash_coluna(serie: pd.Series) -> np.ndarray:
+    """Hash do texto normalizado (sem espaços nas pontas, maiúsculo) de cada
+    linha, calculado uma vez por valor distinto (colunas numéricas: hash do
+    próprio valor)"""
+    if pd.api.types.is_numeric_dtype(serie.dtype):
+        valores = serie.to_numpy(dtype=np.float64, na_value=np.nan)
+        return np.where(np.isnan(valores), _hash_texto([''])[0], pd.util.hash_array(valores))
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        codigos = serie.cat.codes.to_numpy()
+        valores = serie.cat.categories
+    else:
+        codigos, valores = pd.factorize(serie)
+
+    normalizados = [str(v).strip().upper() for v in valores] + ['']
+    # Código -1 (nulo) usa o hash do texto vazio, no fim da tabela
+    return _hash_texto(normalizados)[codigos]
+
+
+def combinar(hashes: List[np.ndarray]) -> np.ndarray:
+    """Combina hashes de várias colunas num hash por linha"""
+    semente = _hash_texto([f"{VERSAO_REGRAS}:{regras_ativas().versao}"])[0]
+    resultado = semente * np.ones(len(hashes[0]), dtype=np.uint64)
+    for h in hashes:
+        resultado = (resultado * _MULTIPLICADOR) ^ h
+    return resultado
+
+
+def impressoes_cabecalho(df_cabecalho: pd.DataFrame) -> np.ndarray:
+    """Impressão de cada nota do cabeçalho (campos usados na validação)"""
+    colunas = [c for c in COLUNAS_CABECALHO_VALIDACAO if c in df_cabecalho.columns]
+    if not colunas:
+        return np.zeros(len(df_cabecalho), dtype=np.uint64)
+    return combinar([hash_coluna(df_cabecalho[c]) for c in colunas])
+
+
+def identidades_itens(df_itens: pd.DataFrame, offsets: np.ndarray) -> np.ndarray:
+    """Identidade de cada item: nota (_NOTA, com a chave de acesso) + número
+    do item na nota (offsets do IndiceNotas). Não depende do conteúdo nem da
+    posição no arquivo, então um item alterado mantém a identidade."""
+    categorias = df_itens[COLUNA_NOTA].cat
+    codigos = categorias.codes.to_numpy()
+    da_nota = np.append(_hash_texto(list(categorias.categories)), np.uint64(0))[codigos]
+    numero_item = np.arange(len(df_itens)) - offsets[np.maximum(codigos, 0)] + 1
+    return (da_nota * _MULTIPLICADOR) ^ numero_item.astype(np.uint64)
+
+
+def impressoes_itens(df_itens: pd.DataFrame, impressao_cabecalho: np.ndarray,
+                     linha_cabecalho: np.ndarray) -> np.ndarray:
+    """Impressão do conteúdo de cada item: CFOP normalizado, campos gravados
+    no repositório e impressão do seu cabeçalho (linha -1 = sem cabeçalho,
+    impressão 0)"""
+    do_cabecalho = np.append(impressao_cabecalho, np.uint64(0))[linha_cabecalho]
+    gravadas = [hash_coluna(df_itens[c]) for c in COLUNAS_ITENS_GRAVADAS if c in df_itens.columns]
+    return combinar([hash_coluna(df_itens[COLUNA_CFOP]), *gravadas, do_cabecalho])
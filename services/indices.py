@@ -0,0 +1,130 @@
+# backend/services/indices.py
+"""
+Índices em memória construídos uma única vez na inicialização do agente
+"""
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from services.carregador_csv import (
+    COLUNA_CHAVE, COLUNA_NOTA, COLUNA_NUMERO, detectar_coluna_chave, normalizar_chave
+)
+
+
+class IndiceChave:
+    """Índice hash: chave de acesso normalizada -> posição da linha no cabeçalho"""
+
+    def __init__(self, df: pd.DataFrame):
+        # Coluna de origem detectada no carregamento (nome ou formato)
+        self.coluna: Optional[str] = detectar_coluna_chave(df)
+        self.posicoes: Dict[str, int] = {}
+
+        if COLUNA_CHAVE in df.columns:
+            chaves = df[COLUNA_CHAVE]
+            # Em chaves repetidas prevalece a primeira ocorrência
+            primeiras = (~chaves.duplicated(keep='first') & (chaves != '')).to_numpy()
+            self.posicoes = dict(zip(
+                chaves[primeiras].tolist(),
+                np.flatnonzero(primeiras).tolist()
+            ))
+
+    def __len__(self) -> int:
+        return len(self.posicoes)
+
+    def buscar(self, chave_acesso: str) -> Optional[int]:
+        """Posição (iloc) da nota com esta chave, ou None"""
+        return self.posicoes.get(normalizar_chave(chave_acesso))
+
+
+class IndiceNotas:
+    """Índice nota -> fatia de itens e nota -> linha do cabeçalho.
+
+    Depende de df_itens agrupado por nota no carregamento (códigos de _NOTA
+    crescentes): os itens da nota g ocupam as linhas offsets[g]:offsets[g+1].
+    A nota é identificada por CNPJ do emitente, série, número e chave de
+    acesso (_NOTA). Cabeçalhos repetidos com a mesma identificação são
+    contados em `repetidas` e avisados no log; vale o primeiro."""
+
+    def __init__(self, df_cabecalho: pd.DataFrame, df_itens: pd.DataFrame):
+        self.df_cabecalho = df_cabecalho
+        self.df_itens = df_itens
+
+        categorias = df_itens[COLUNA_NOTA].cat
+        self.notas = pd.Index(categorias.categories)
+        codigos = categorias.codes.to_numpy()
+        self.offsets = np.searchsorted(codigos, np.arange(len(self.notas) + 1))
+
+        # Linha do cabeçalho de cada nota dos itens (-1 = sem cabeçalho)
+        notas_cabecalho = df_cabecalho[COLUNA_NOTA]
+        primeiras = ~notas_cabecalho.duplicated(keep='first').to_numpy()
+        self.repetidas = int((~primeiras).sum())
+        if self.repetidas:
+            exemplos = notas_cabecalho[~primeiras].head(3).tolist()
+            print(f"   ⚠️ {self.repetidas} cabeçalhos repetem a identificação de outra nota "
+                  f"(vale o primeiro): {', '.join(map(str, exemplos))}")
+        indice_cabecalho = pd.Index(notas_cabecalho[primeiras])
+        linhas = np.flatnonzero(primeiras)
+        encontrados = indice_cabecalho.get_indexer(self.notas)
+        self.cabecalho_da_nota = np.where(encontrados >= 0, linhas[encontrados], -1)
+
+        # NÚMERO -> posições (notas de emitentes diferentes podem repetir o número)
+        self.cabecalhos_por_numero = df_cabecalho.groupby(COLUNA_NUMERO, sort=False).indices
+        numero_da_nota = pd.Series(df_itens[COLUNA_NUMERO].to_numpy()[self.offsets[:-1]])
+        self.notas_por_numero = numero_da_nota.groupby(numero_da_nota, sort=False).indices
+
+    def __len__(self) -> int:
+        return len(self.notas)
+
+    def _grupo(self, nota: str) -> Optional[int]:
+        """Posição da nota no índice, ou None"""
+        try:
+            return self.notas.get_loc(nota)
+        except KeyError:
+            return None
+
+    def fatia(self, nota: str) -> slice:
+        """Intervalo de linhas dos itens da nota em df_itens"""
+        grupo = self._grupo(nota)
+        if grupo is None:
+            return slice(0, 0)
+        return slice(int(self.offsets[grupo]), int(self.offsets[grupo + 1]))
+
+    def itens(self, nota: str) -> pd.DataFrame:
+        """Todos os itens da nota (fatia contígua, sem cópia)"""
+        return self.df_itens.iloc[self.fatia(nota)]
+
+    def quantidade_itens(self, nota: str) -> int:
+        fatia = self.fatia(nota)
+        return fatia.stop - fatia.start
+
+    def item(self, nota: str, numero_item: int) -> Optional[pd.Series]:
+        """k-ésimo item da nota (começando em 1) em O(1)"""
+        fatia = self.fatia(nota)
+        if numero_item < 1 or numero_item > fatia.stop - fatia.start:
+            return None
+        return self.df_itens.iloc[fatia.start + numero_item - 1]
+
+    def cabecalho(self, nota: str) -> Optional[pd.Series]:
+        """Linha do cabeçalho da nota, ou None"""
+        grupo = self._grupo(nota)
+        if grupo is None or self.cabecalho_da_nota[grupo] < 0:
+            return None
+        return self.df_cabecalho.iloc[self.cabecalho_da_nota[grupo]]
+
+    def cabecalhos_numero(self, numero: str) -> pd.DataFrame:
+        """Cabeçalhos com este NÚMERO (de qualquer emitente)"""
+        linhas = self.cabecalhos_por_numero.get(str(numero).strip(), [])
+        return self.df_cabecalho.iloc[linhas]
+
+    def itens_numero(self, numero: str) -> pd.DataFrame:
+        """Itens de todas as notas com este NÚMERO, nota a nota"""
+        grupos = self.notas_por_numero.get(str(numero).strip(), [])
+        if len(grupos) == 0:
+            return self.df_itens.iloc[0:0]
+        if len(grupos) == 1:
+            return self.df_itens.iloc[self.offsets[grupos[0]]:self.offsets[grupos[0] + 1]]
+        linhas = np.concatenate([
+            np.arange(self.offsets[g], self.offsets[g + 1]) for g in grupos
+        ])
+        return self.df_itens.iloc[linhas]
@@ -0,0 +1,191 @@
+# backend/services/jobs.py
+"""
+Jobs em segundo plano: a validação completa (e a gravação dos resultados
+no repositório) roda numa thread de trabalho e a API só consulta progresso
+e resultados
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from services.motor_validacao import ValidacaoCancelada
+
+STATUS_PENDENTE = 'pendente'
+STATUS_EXECUTANDO = 'executando'
+STATUS_CONCLUIDO = 'concluido'
+STATUS_CANCELADO = 'cancelado'
+STATUS_ERRO = 'erro'
+STATUS_FINAIS = {STATUS_CONCLUIDO, STATUS_CANCELADO, STATUS_ERRO}
+
+
+class Job:
+    """Estado de um job de validação (atualizado pela thread de trabalho).
+
+    O agente só é referenciado enquanto o job não termina; depois ficam o
+    repositório e a versão dos resultados gravados, o bastante para paginar
+    os resultados (ou saber que foram substituídos)."""
+
+    def __init__(self, agente, tipo: str = 'validacao'):
+        self.id = uuid.uuid4().hex
+        self.tipo = tipo
+        self.agente = agente
+        self.repositorio = agente.repositorio
+        self.status = STATUS_PENDENTE
+        self.criado_em = datetime.now()
+        self.iniciado_em: Optional[float] = None
+        self.concluido_em: Optional[float] = None
+        self.total = len(agente.df_itens)
+        self.processados = 0
+        self.divergencias = 0
+        self.erro: Optional[str] = None
+        self.versao_resultados: Optional[str] = None
+        self.cancelar = threading.Event()
+
+    def atualizar(self, processados: int, total: int, divergencias: int):
+        self.processados, self.total, self.divergencias = processados, total, divergencias
+
+    @property
+    def finalizado(self) -> bool:
+        return self.status in STATUS_FINAIS
+
+    def eta_segundos(self) -> Optional[float]:
+        """Tempo restante estimado pela taxa média até agora"""
+        if self.status != STATUS_EXECUTANDO or not self.processados or self.iniciado_em is None:
+            return None
+        decorrido = time.perf_counter() - self.iniciado_em
+        return round(decorrido / self.processados * (self.total - self.processados), 1)
+
+    def para_dict(self) -> Dict[str, Any]:
+        decorrido = None
+        if self.iniciado_em is not None:
+            decorrido = round((self.concluido_em or time.perf_counter()) - self.iniciado_em, 2)
+        return {
+            "job_id": self.id,
+            "tipo": self.tipo,
+            "status": self.status,
+            "criado_em": self.criado_em.isoformat(),
+            "total_itens": self.total,
+            "itens_processados": self.processados,
+            "percentual": round(self.processados / self.total * 100, 1) if self.total else 100.0,
+            "divergencias": self.divergencias,
+            "segundos_decorridos": decorrido,
+            "eta_segundos": self.eta_segundos(),
+            "erro": self.erro,
+        }
+
+
+class GerenciadorJobs:
+    """Fila de jobs executados por um pool de threads.
+
+    Os jobs concluídos ficam disponíveis para consulta até serem
+    descartados (mantém os max_retidos mais recentes)."""
+
+    def __init__(self, max_workers: int = 1, max_retidos: int = 50):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._trava = threading.Lock()
+        self.max_retidos = max_retidos
+
+    def iniciar_validacao(self, agente) -> Job:
+        """Cria um job de validação completa e o coloca na fila"""
+        with self._trava:
+            return self._enfileirar(agente)
+
+    def validacao_do_agente(self, agente) -> Job:
+        """Job de validação ainda não finalizado do agente ou, se não houver,
+        um novo (consultas que chegam antes dos resultados gravados esperam
+        por ele em vez de validar na requisição)"""
+        with self._trava:
+            for job in reversed(self._jobs.values()):
+                if job.agente is agente and not job.finalizado and not job.cancelar.is_set():
+                    return job
+            return self._enfileirar(agente)
+
+    def _enfileirar(self, agente) -> Job:
+        job = Job(agente)
+        self._jobs[job.id] = job
+        self._descartar_antigos()
+        self._executor.submit(self._executar_validacao, job)
+        print(f"   📋 Job {job.id[:8]} de validação criado ({job.total} itens)")
+        return job
+
+    def obter(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def listar(self) -> list:
+        return list(reversed(self._jobs.values()))
+
+    def cancelar(self, job_id: str) -> Optional[Job]:
+        """Pede o cancelamento (efetivo no próximo bloco de itens)"""
+        job = self.obter(job_id)
+        if job is not None and not job.finalizado:
+            job.cancelar.set()
+            if job.status == STATUS_PENDENTE:
+                job.status = STATUS_CANCELADO
+                job.agente = None
+        return job
+
+    def cancelar_todos(self):
+        for job in list(self._jobs.values()):
+            self.cancelar(job.id)
+
+    def cancelar_do_agente(self, agente):
+        """Cancela os jobs de um agente substituído por uma nova carga (os
+        em execução soltam o agente ao parar)"""
+        for job in list(self._jobs.values()):
+            if job.agente is agente:
+                self.cancelar(job.id)
+
+    def _executar_validacao(self, job: Job):
+        if job.cancelar.is_set():
+            job.status = STATUS_CANCELADO
+            job.agente = None
+            return
+
+        job.status = STATUS_EXECUTANDO
+        job.iniciado_em = time.perf_counter()
+        try:
+            motor = job.agente.motor_validacao
+            resumo = motor.resultado(progresso=job.atualizar, cancelar=job.cancelar).resumo()
+            if job.cancelar.is_set():
+                raise ValidacaoCancelada()
+            # Gravação no repositório aqui, fora das requisições (só itens alterados)
+            motor.persistir()
+            job.versao_resultados = motor.versao_resultados
+            job.atualizar(
+                resumo['total_itens'], resumo['total_itens'],
+                resumo['divergencias_primeiro_digito'] + resumo['divergencias_ultimos_digitos']
+            )
+            job.status = STATUS_CONCLUIDO
+            print(f"   ✅ Job {job.id[:8]} concluído")
+            self._preparar_estatisticas(job)
+        except ValidacaoCancelada:
+            job.status = STATUS_CANCELADO
+            print(f"   ⏹️ Job {job.id[:8]} cancelado em {job.processados}/{job.total} itens")
+        except Exception as e:
+            job.status = STATUS_ERRO
+            job.erro = str(e)
+            print(f"   ❌ Job {job.id[:8]} falhou: {e}")
+        finally:
+            job.concluido_em = time.perf_counter()
+            # Job finalizado não segura o agente (DataFrames, resultado em memória)
+            job.agente = None
+
+    @staticmethod
+    def _preparar_estatisticas(job: Job):
+        """Agregados das estatísticas (incluindo o cubo OLAP) montados logo
+        após a validação; falha aqui não invalida o job"""
+        try:
+            job.agente.estatisticas.preparar()
+        except Exception as e:
+            print(f"   ⚠️ Estatísticas não pré-calculadas: {e}")
+
+    def _descartar_antigos(self):
+        finalizados = [j.id for j in self._jobs.values() if j.finalizado]
+        excesso = len(self._jobs) - self.max_retidos
+        for job_id in finalizados[:max(excesso, 0)]:
+            del self._jobs[job_id]
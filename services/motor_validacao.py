@@ -0,0 +1,607 @@
+# backend/services/motor_validacao.py
+"""
+Motor de validação de CFOP vetorizado: valida todos os itens de uma vez
+"""
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from services.carregador_csv import (
+    COLUNA_CFOP, COLUNA_CFOP_D1, COLUNA_CHAVE, COLUNA_NOTA, TIPO_TEXTO, normalizar_chaves
+)
+from services.classificador_natureza import classificar_serie, por_valor_distinto, regras_ativas
+from services.impressoes import identidades_itens, impressoes_cabecalho, impressoes_itens
+
+# Tipos de resultado por item (a ordem define os códigos da categórica)
+TIPO_CONFORME = 'conforme'
+TIPO_PRIMEIRO_DIGITO = 'primeiro_digito'
+TIPO_ULTIMOS_DIGITOS = 'ultimos_digitos'
+TIPO_SEM_CABECALHO = 'sem_cabecalho'
+TIPOS = [TIPO_CONFORME, TIPO_PRIMEIRO_DIGITO, TIPO_ULTIMOS_DIGITOS, TIPO_SEM_CABECALHO]
+
+SEVERIDADE = {TIPO_PRIMEIRO_DIGITO: 'critico', TIPO_ULTIMOS_DIGITOS: 'alerta'}
+CODIGOS_DIVERGENTES = [TIPOS.index(TIPO_PRIMEIRO_DIGITO), TIPOS.index(TIPO_ULTIMOS_DIGITOS)]
+
+# Itens por bloco na validação completa (granularidade do progresso/cancelamento)
+TAMANHO_BLOCO = 250_000
+
+DIGITOS = list('0123456789?')
+
+# Situação de cada par (chave, item) na validação em lote
+STATUS_VALIDADO = 'validado'
+STATUS_NOTA_NAO_ENCONTRADA = 'nota_nao_encontrada'
+STATUS_SEM_ITENS = 'sem_itens'
+STATUS_ITEM_INEXISTENTE = 'item_inexistente'
+
+PALAVRAS_NUMERICAS = {
+    'primeiro': 1, 'primeira': 1,
+    'segundo': 2, 'segunda': 2,
+    'terceiro': 3, 'terceira': 3,
+    'quarto': 4, 'quarta': 4,
+    'quinto': 5, 'quinta': 5,
+    'sexto': 6, 'sexta': 6,
+    'sétimo': 7, 'sétima': 7,
+    'oitavo': 8, 'oitava': 8,
+    'nono': 9, 'nona': 9,
+    'décimo': 10, 'décima': 10
+}
+
+
+def _coluna(df: pd.DataFrame, coluna: str) -> pd.Series:
+    if coluna not in df.columns:
+        return pd.Series('', index=df.index, dtype=TIPO_TEXTO)
+    return df[coluna]
+
+
+def _contem(serie: pd.Series, trecho: str) -> np.ndarray:
+    """Máscara: o texto contém o trecho (testado uma vez por valor distinto)"""
+    return por_valor_distinto(serie, lambda v: trecho in str(v), dtype=bool)
+
+
+def _codigos_texto(serie: pd.Series, vocabulario: Dict[str, int]) -> np.ndarray:
+    """Código inteiro do texto (sem espaços nas pontas); colunas que usam o
+    mesmo vocabulário podem ser comparadas por igualdade de códigos"""
+    return por_valor_distinto(
+        serie, lambda v: vocabulario.setdefault(str(v).strip(), len(vocabulario)), dtype=np.int64
+    )
+
+
+def inferir_cfop_esperado(df_cabecalho: pd.DataFrame):
+    """Primeiro dígito e últimos três dígitos esperados para cada nota.
+
+    Âmbito + entrada/saída -> primeiro dígito e natureza -> últimos dígitos,
+    pela tabela de regras ativa; a validação de item específico usa esta
+    mesma função com o cabeçalho da nota. Os testes de
+    texto rodam uma vez por valor distinto de cada coluna e são propagados
+    pelos códigos. Retorna dois arrays alinhados ao cabeçalho."""
+    entrada, ultimos = classificar_serie(_coluna(df_cabecalho, 'NATUREZA DA OPERAÇÃO'))
+
+    vocabulario: Dict[str, int] = {}
+    uf_emit = _codigos_texto(_coluna(df_cabecalho, 'UF EMITENTE'), vocabulario)
+    uf_dest = _codigos_texto(_coluna(df_cabecalho, 'UF DESTINATÁRIO'), vocabulario)
+    destino_op = _coluna(df_cabecalho, 'DESTINO DA OPERAÇÃO')
+
+    # Âmbito da operação
+    interna = _contem(destino_op, '1 - OPERAÇÃO INTERNA') | (uf_emit == uf_dest)
+    interestadual = ~interna & (_contem(destino_op, '2 - OPERAÇÃO INTERESTADUAL') | (uf_emit != uf_dest))
+    exterior = ~interna & ~interestadual & _contem(destino_op, '3 - OPERAÇÃO COM EXTERIOR')
+
+    digito = np.select(
+        [interna, interestadual, exterior],
+        [np.where(entrada, '1', '5'), np.where(entrada, '2', '6'), np.where(entrada, '3', '7')],
+        default='?'
+    )
+
+    return digito, ultimos
+
+
+def interpretar_numero_item(numero_item) -> int:
+    """Número do item a partir de "1", "item 1", "primeiro"... (padrão 1)"""
+    texto = str(numero_item).lower().strip()
+    numeros = re.findall(r'\d+', texto)
+    if numeros:
+        return int(numeros[0])
+    return PALAVRAS_NUMERICAS.get(texto, 1)
+
+
+def _espalhar(valores, mascara: np.ndarray) -> np.ndarray:
+    """Array do tamanho da máscara com `valores` nas posições True e None nas demais"""
+    saida = np.full(len(mascara), None, dtype=object)
+    saida[mascara] = np.asarray(valores, dtype=object)
+    return saida
+
+
+def formatar_cfop(cfop: str) -> str:
+    """'5102' -> '5.102'; CFOP sem primeiro dígito -> INDETERMINADO"""
+    if cfop.startswith('?'):
+        return 'INDETERMINADO'
+    return f"{cfop[0]}.{cfop[1:]}" if len(cfop) == 4 else cfop
+
+
+def _codigos_digito(digitos) -> np.ndarray:
+    """Posição de cada dígito em DIGITOS ('?' para vazio ou desconhecido)"""
+    codigos = pd.Index(DIGITOS).get_indexer(pd.Index(digitos, dtype=object))
+    return np.where(codigos >= 0, codigos, DIGITOS.index('?'))
+
+
+class ResultadoValidacao:
+    """Resultado da validação de todos os itens.
+
+    itens: uma linha por item de df_itens (mesma ordem) com a linha do
+    cabeçalho, o CFOP esperado e o tipo do resultado.
+    divergencias: só os itens divergentes, com os dados para relatório."""
+
+    def __init__(self, itens: pd.DataFrame, divergencias: pd.DataFrame, segundos: float):
+        self.itens = itens
+        self.divergencias = divergencias
+        self.segundos = segundos
+        self.contagens: Dict[str, int] = {
+            tipo: int(qtd) for tipo, qtd in itens['tipo'].value_counts().items()
+        }
+
+    @property
+    def total_itens(self) -> int:
+        return len(self.itens)
+
+    @property
+    def itens_validados(self) -> int:
+        """Itens com cabeçalho encontrado"""
+        return self.total_itens - self.contagens.get(TIPO_SEM_CABECALHO, 0)
+
+    def contagens_ate(self, limite: Optional[int] = None) -> Dict[str, int]:
+        """Contagem por tipo dos primeiros `limite` itens (todos se None)"""
+        if limite is None or limite >= self.total_itens:
+            return dict(self.contagens)
+        tipos = self.itens['tipo'].iloc[:limite]
+        return {tipo: int(qtd) for tipo, qtd in tipos.value_counts().items()}
+
+    def resumo(self) -> Dict[str, Any]:
+        return resumir_contagens(self.contagens, self.segundos)
+
+
+def resumir_contagens(contagens: Dict[str, int], segundos: Optional[float] = None) -> Dict[str, Any]:
+    """Resumo da validação a partir da contagem por tipo"""
+    total = sum(contagens.values())
+    validados = total - contagens.get(TIPO_SEM_CABECALHO, 0)
+    conformes = contagens.get(TIPO_CONFORME, 0)
+    resumo = {
+        "total_itens": total,
+        "itens_validados": validados,
+        "conformes": conformes,
+        "divergencias_primeiro_digito": contagens.get(TIPO_PRIMEIRO_DIGITO, 0),
+        "divergencias_ultimos_digitos": contagens.get(TIPO_ULTIMOS_DIGITOS, 0),
+        "sem_cabecalho": contagens.get(TIPO_SEM_CABECALHO, 0),
+        "taxa_conformidade": round(conformes / validados * 100, 1) if validados else 0,
+    }
+    if segundos is not None:
+        resumo["segundos"] = round(segundos, 3)
+    return resumo
+
+
+def validar_bloco(contexto: Dict[str, np.ndarray], notas: np.ndarray,
+                  cfops: np.ndarray, digitos: np.ndarray):
+    """Valida um bloco de itens só com arrays NumPy.
+
+    contexto: tabelas por nota/categoria montadas em MotorValidacao.contexto().
+    notas, cfops, digitos: códigos das categóricas _NOTA, _CFOP e _CFOP_D1
+    dos itens do bloco. Retorna (linha do cabeçalho, código do CFOP
+    esperado, código do tipo) para cada item."""
+    linha = contexto['cabecalho_da_nota'][notas]
+    esperado = contexto['esperado_da_linha'][linha]
+
+    cfop_igual = contexto['cfop_no_esperado'][cfops] == esperado
+    digito_igual = contexto['digito_do_cfop'][digitos] == contexto['digito_da_linha'][linha]
+
+    tipo = np.select(
+        [linha < 0, ~digito_igual, ~cfop_igual],
+        [TIPOS.index(TIPO_SEM_CABECALHO), TIPOS.index(TIPO_PRIMEIRO_DIGITO),
+         TIPOS.index(TIPO_ULTIMOS_DIGITOS)],
+        default=TIPOS.index(TIPO_CONFORME)
+    ).astype(np.int8)
+    return linha, esperado, tipo
+
+
+class ValidacaoCancelada(Exception):
+    """Validação interrompida por pedido de cancelamento"""
+
+
+class MotorValidacao:
+    """Valida todos os itens em lote: junta itens e cabeçalhos uma única vez
+    (via IndiceNotas) e compara o CFOP registrado com o esperado por
+    operações NumPy. O resultado fica em cache até os dados mudarem e, com
+    um repositório, é gravado em SQLite (uma linha por item) para consultas
+    por persistir(), fora do cálculo do resultado."""
+
+    def __init__(self, df_cabecalho: pd.DataFrame, df_itens: pd.DataFrame,
+                 indice_notas, indice_chave=None, tamanho_bloco: int = TAMANHO_BLOCO,
+                 workers: int = 1, particionamento: str = 'nota', min_itens_paralelo: int = 0,
+                 repositorio=None, versao: Optional[str] = None, incremental: bool = True):
+        self.df_cabecalho = df_cabecalho
+        self.df_itens = df_itens
+        self.indice_notas = indice_notas
+        self.indice_chave = indice_chave
+        self.tamanho_bloco = tamanho_bloco
+
+        # Paralelismo em processos (workers > 1 e volume mínimo de itens)
+        self.workers = workers
+        self.particionamento = particionamento
+        self.min_itens_paralelo = min_itens_paralelo
+
+        # Resultados persistidos (RepositorioValidacao, opcional) da versão dos dados
+        self.repositorio = repositorio
+        self.versao = versao
+        # Reaproveita vereditos por impressão digital (só itens novos/alterados são validados)
+        self.incremental = incremental
+        self._resultado: Optional[ResultadoValidacao] = None
+        self._versao_regras: Optional[str] = None
+        self._trava = threading.Lock()
+        self._trava_persistencia = threading.Lock()
+        # (versão das regras, identidades, impressões): calculadas uma vez por versão
+        self._impressoes_cache: Optional[Tuple[str, np.ndarray, np.ndarray]] = None
+
+        # Progresso da validação em andamento (lido por jobs e pelo chat)
+        self.em_andamento = False
+        self.processados = 0
+
+    @property
+    def pronto(self) -> bool:
+        return self._resultado is not None and self._versao_regras == regras_ativas().versao
+
+    @property
+    def versao_resultados(self) -> Optional[str]:
+        """Versão dos dados + versão da tabela de regras (chave no repositório)"""
+        if self.versao is None:
+            return None
+        return f"{self.versao}:{regras_ativas().versao}"
+
+    def resultado(self, progresso: Optional[Callable[[int, int, int], None]] = None,
+                  cancelar: Optional[threading.Event] = None) -> ResultadoValidacao:
+        """Resultado completo (calculado na primeira chamada e de novo se a
+        tabela de regras for recarregada; chamadas simultâneas esperam o
+        cálculo em andamento)"""
+        if not self.pronto:
+            with self._trava:
+                if not self.pronto:
+                    versao_regras = regras_ativas().versao
+                    resultado = self.validar(progresso, cancelar)
+                    self._resultado, self._versao_regras = resultado, versao_regras
+        return self._resultado
+
+    def persistido(self):
+        """Repositório se já tiver os itens desta versão dos dados (após um
+        reinício com os mesmos arquivos, já tem), senão None: quem grava é o
+        job de validação, nunca a consulta"""
+        if self.repositorio is None or not self.repositorio.pronto(self.versao_resultados):
+            return None
+        return self.repositorio
+
+    def persistir(self, progresso: Optional[Callable[[int, int, int], None]] = None,
+                  cancelar: Optional[threading.Event] = None):
+        """Grava no repositório os itens desta versão dos dados: só os novos
+        ou alterados desde a última gravação (identidade nova, outra
+        impressão ou outra posição) e apaga os que deixaram de existir.
+
+        Chamado pelo job de validação em segundo plano; resultado() não
+        espera por ele."""
+        if self.repositorio is None:
+            return
+        with self._trava_persistencia:
+            versao = self.versao_resultados
+            if versao is None or self.repositorio.pronto(versao):
+                return
+            resultado = self.resultado(progresso, cancelar)
+            identidades, impressoes = self._impressoes(resultado.itens['linha_cabecalho'].to_numpy())
+
+            gravar = np.arange(len(identidades))
+            removidas = np.array([], dtype=np.uint64)
+            guardados = self.repositorio.carregar()
+            if guardados is not None:
+                identidades_guardadas, impressoes_guardadas, posicoes_guardadas, _, _ = guardados
+                posicao = pd.Index(identidades_guardadas).get_indexer(identidades)
+                encontrado = posicao >= 0
+                # Posição -1 (identidade nova) não pode indexar os arrays guardados
+                guardado = np.maximum(posicao, 0)
+                igual = (
+                    encontrado & (impressoes_guardadas[guardado] == impressoes)
+                    & (posicoes_guardadas[guardado] == gravar)
+                )
+                gravar = np.flatnonzero(~igual)
+                presentes = np.zeros(len(identidades_guardadas), dtype=bool)
+                presentes[posicao[encontrado]] = True
+                removidas = identidades_guardadas[~presentes]
+
+            itens = self._montar_linhas(resultado.itens, gravar)
+            itens.insert(0, 'identidade', identidades[gravar])
+            itens.insert(1, 'impressao', impressoes[gravar])
+            indice = pd.DataFrame({
+                'identidade': identidades,
+                'impressao': impressoes,
+                'item': np.arange(len(identidades)),
+                'tipo': resultado.itens['tipo'],
+                'cfop_esperado': resultado.itens['cfop_esperado'],
+            })
+            self.repositorio.gravar_itens(versao, itens, indice, removidas)
+
+    def _impressoes(self, linha: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(identidade, impressão do conteúdo) de cada item (a impressão
+        inclui a versão das regras)"""
+        versao_regras = regras_ativas().versao
+        if self._impressoes_cache is None or self._impressoes_cache[0] != versao_regras:
+            self._impressoes_cache = (
+                versao_regras,
+                identidades_itens(self.df_itens, self.indice_notas.offsets),
+                impressoes_itens(self.df_itens, impressoes_cabecalho(self.df_cabecalho), linha),
+            )
+        return self._impressoes_cache[1], self._impressoes_cache[2]
+
+    def contexto(self):
+        """Tabelas por nota e por categoria usadas em validar_bloco.
+
+        Retorna o contexto e os CFOPs esperados formatados (categorias do
+        código esperado)."""
+        # Esperado por nota do cabeçalho, codificado como categórica
+        digito, ultimos = inferir_cfop_esperado(self.df_cabecalho)
+        codigos_esperado, cfops_esperados = pd.factorize(np.char.add(digito, ultimos))
+
+        cfop = self.df_itens[COLUNA_CFOP].cat
+        d1 = self.df_itens[COLUNA_CFOP_D1].cat
+
+        # Sentinela no fim de cada tabela: código -1 (nulo / sem cabeçalho) cai nela
+        contexto = {
+            'cabecalho_da_nota': np.append(self.indice_notas.cabecalho_da_nota, -1),
+            'esperado_da_linha': np.append(codigos_esperado, -1),
+            'digito_da_linha': np.append(_codigos_digito(digito), -1),
+            'cfop_no_esperado': np.append(pd.Index(cfops_esperados).get_indexer(cfop.categories), -2),
+            'digito_do_cfop': np.append(_codigos_digito(list(d1.categories)), DIGITOS.index('?')),
+        }
+        return contexto, [formatar_cfop(c) for c in cfops_esperados]
+
+    def codigos_itens(self) -> Dict[str, np.ndarray]:
+        """Códigos das categóricas dos itens (entrada de validar_bloco)"""
+        return {
+            'notas': self.df_itens[COLUNA_NOTA].cat.codes.to_numpy(),
+            'cfops': self.df_itens[COLUNA_CFOP].cat.codes.to_numpy(),
+            'digitos': self.df_itens[COLUNA_CFOP_D1].cat.codes.to_numpy(),
+        }
+
+    def validar(self, progresso: Optional[Callable[[int, int, int], None]] = None,
+                cancelar: Optional[threading.Event] = None) -> ResultadoValidacao:
+        """Valida todos os itens em blocos de tamanho_bloco.
+
+        Com um repositório, itens já gravados (mesma identidade, nota +
+        número do item, e mesma impressão digital do conteúdo) reaproveitam
+        o resultado guardado e só os novos ou alterados passam pelas regras.
+        progresso(processados, total, divergencias) é chamado após cada
+        bloco; se `cancelar` for sinalizado, levanta ValidacaoCancelada."""
+        inicio = time.perf_counter()
+        total = len(self.df_itens)
+        self.em_andamento, self.processados = True, 0
+
+        try:
+            contexto, esperados_formatados = self.contexto()
+            codigos = self.codigos_itens()
+
+            linha = contexto['cabecalho_da_nota'][codigos['notas']]
+            esperado = np.empty(total, dtype=np.int64)
+            tipo = np.empty(total, dtype=np.int8)
+
+            pendentes = None
+            if self.repositorio is not None and self.incremental:
+                pendentes = self._reaproveitar(*self._impressoes(linha), esperados_formatados, esperado, tipo)
+
+            a_validar = total if pendentes is None else len(pendentes)
+            reutilizados = total - a_validar
+            divergentes = 0
+            if reutilizados:
+                reaproveitados = np.ones(total, dtype=bool)
+                reaproveitados[pendentes] = False
+                divergentes = int(np.isin(tipo[reaproveitados], CODIGOS_DIVERGENTES).sum())
+            self.processados = reutilizados
+
+            if a_validar and self._usar_processos(a_validar):
+                def atualizar(processados, _total, divergentes_particoes):
+                    self.processados = reutilizados + processados
+                    if progresso is not None:
+                        progresso(self.processados, total, divergentes + divergentes_particoes)
+
+                _, esperado_novo, tipo_novo = self._validar_paralelo(
+                    contexto, codigos, pendentes, atualizar, cancelar
+                )
+                linhas = slice(None) if pendentes is None else pendentes
+                esperado[linhas], tipo[linhas] = esperado_novo[linhas], tipo_novo[linhas]
+            else:
+                for ini in range(0, a_validar, self.tamanho_bloco):
+                    if cancelar is not None and cancelar.is_set():
+                        raise ValidacaoCancelada()
+
+                    fim = min(ini + self.tamanho_bloco, a_validar)
+                    bloco = slice(ini, fim) if pendentes is None else pendentes[ini:fim]
+                    _, esperado[bloco], tipo[bloco] = validar_bloco(
+                        contexto, codigos['notas'][bloco], codigos['cfops'][bloco], codigos['digitos'][bloco]
+                    )
+                    divergentes += int(np.isin(tipo[bloco], CODIGOS_DIVERGENTES).sum())
+
+                    self.processados = reutilizados + fim
+                    if progresso is not None:
+                        progresso(self.processados, total, divergentes)
+        finally:
+            self.em_andamento = False
+
+        return self._montar_resultado(linha, esperado, tipo, esperados_formatados, inicio)
+
+    def _reaproveitar(self, identidades: np.ndarray, impressoes: np.ndarray, esperados_formatados,
+                      esperado: np.ndarray, tipo: np.ndarray) -> Optional[np.ndarray]:
+        """Preenche esperado/tipo dos itens já gravados em carregamentos
+        anteriores (mesma identidade com a mesma impressão). Retorna as
+        posições que ainda precisam ser validadas (None = todas)."""
+        guardados = self.repositorio.carregar()
+        if guardados is None:
+            print("   🗂️ Nenhum resultado guardado: validação completa")
+            return None
+
+        identidades_guardadas, impressoes_guardadas, _, tipos_guardados, esperados_guardados = guardados
+        posicao = pd.Index(identidades_guardadas).get_indexer(identidades)
+        encontrado = posicao >= 0
+        # Posição -1 (identidade nova) não pode indexar os arrays guardados
+        guardado = np.maximum(posicao, 0)
+        # O esperado guardado precisa existir nas categorias atuais (sempre
+        # existe se a impressão do cabeçalho bate, mas não custa conferir)
+        esperado_atual = pd.Index(esperados_formatados).get_indexer(esperados_guardados)[guardado]
+        tipo_atual = pd.Index(TIPOS).get_indexer(tipos_guardados)[guardado]
+        achados = (
+            encontrado & (impressoes_guardadas[guardado] == impressoes) & (tipo_atual >= 0)
+            & ((esperado_atual >= 0) | (esperados_guardados[guardado] == ''))
+        )
+
+        esperado[achados] = esperado_atual[achados]
+        tipo[achados] = tipo_atual[achados]
+
+        pendentes = np.flatnonzero(~achados)
+        print(f"   ♻️ {int(achados.sum())} itens reaproveitados, "
+              f"{len(pendentes)} novos ou alterados a validar")
+        return pendentes
+
+    def _usar_processos(self, total: int) -> bool:
+        if self.workers <= 1 or total < max(self.min_itens_paralelo, 1):
+            return False
+        # Importado aqui: validacao_paralela depende deste módulo
+        from services import validacao_paralela
+        return validacao_paralela.PYARROW_DISPONIVEL
+
+    def _validar_paralelo(self, contexto, codigos, pendentes, progresso, cancelar):
+        """Particiona os itens (por faixa de notas ou por UF do emitente) e
+        valida cada partição num processo. Com `pendentes`, só essas posições."""
+        from services import validacao_paralela
+
+        quantidade = self.workers * validacao_paralela.PARTICOES_POR_WORKER
+        if self.particionamento == validacao_paralela.PARTICIONAMENTO_UF:
+            uf_da_linha = np.append(
+                _codigos_texto(_coluna(self.df_cabecalho, 'UF EMITENTE'), {}), -1
+            )
+            grupo = uf_da_linha[contexto['cabecalho_da_nota'][codigos['notas']]]
+            if pendentes is None:
+                particoes = validacao_paralela.particoes_por_grupo(grupo)
+            else:
+                particoes = [pendentes[p] for p in validacao_paralela.particoes_por_grupo(grupo[pendentes])]
+        elif pendentes is None:
+            particoes = validacao_paralela.particoes_por_nota(self.indice_notas.offsets, quantidade)
+        else:
+            particoes = [p for p in np.array_split(pendentes, quantidade) if len(p)]
+
+        print(f"   🧵 Validação em {len(particoes)} partições ({self.particionamento}), "
+              f"{self.workers} processos")
+        return validacao_paralela.validar_em_particoes(
+            contexto, codigos, particoes, self.workers, progresso, cancelar
+        )
+
+    def _montar_resultado(self, linha, esperado, tipo, esperados_formatados, inicio) -> ResultadoValidacao:
+        itens = pd.DataFrame({
+            'linha_cabecalho': linha,
+            'cfop_esperado': pd.Categorical.from_codes(esperado, categories=esperados_formatados),
+            'tipo': pd.Categorical.from_codes(tipo, categories=TIPOS),
+        })
+
+        segundos = time.perf_counter() - inicio
+        divergencias = self._montar_divergencias(itens, tipo)
+        print(f"   ✅ {len(itens)} itens validados em {segundos:.2f}s "
+              f"({len(divergencias)} divergências)")
+        return ResultadoValidacao(itens, divergencias, segundos)
+
+    def validar_pares(self, chaves: Iterable, numeros_item: Iterable) -> pd.DataFrame:
+        """Valida vários pares (chave de acesso, número do item) de uma vez.
+
+        As chaves são resolvidas pelo índice de chaves e os itens pelos
+        offsets do índice de notas; o veredito vem do resultado em cache.
+        Retorna uma linha por par, na ordem recebida."""
+        resultado = self.resultado()
+        chaves = pd.Series(list(chaves), dtype=TIPO_TEXTO)
+        numeros = np.array([interpretar_numero_item(n) for n in numeros_item], dtype=np.int64)
+
+        # Chave -> linha do cabeçalho -> grupo da nota
+        posicoes = self.indice_chave.posicoes if self.indice_chave is not None else {}
+        linha = normalizar_chaves(chaves).map(posicoes).fillna(-1).to_numpy(dtype=np.int64)
+        encontrada = linha >= 0
+
+        grupo = np.full(len(chaves), -1, dtype=np.int64)
+        if encontrada.any():
+            notas = self.df_cabecalho[COLUNA_NOTA].to_numpy()[linha[encontrada]]
+            grupo[encontrada] = self.indice_notas.notas.get_indexer(notas)
+        tem_grupo = grupo >= 0
+
+        # Grupo + número do item -> posição do item em df_itens
+        offsets = self.indice_notas.offsets
+        inicio = np.where(tem_grupo, offsets[np.maximum(grupo, 0)], 0)
+        quantidade = np.where(tem_grupo, offsets[np.maximum(grupo, 0) + 1] - inicio, 0)
+        valido = tem_grupo & (numeros >= 1) & (numeros <= quantidade)
+        item = (inicio + numeros - 1)[valido]
+
+        status = np.select(
+            [~encontrada, quantidade == 0, ~valido],
+            [STATUS_NOTA_NAO_ENCONTRADA, STATUS_SEM_ITENS, STATUS_ITEM_INEXISTENTE],
+            default=STATUS_VALIDADO
+        )
+
+        tipos = resultado.itens['tipo'].to_numpy()[item]
+        numero_nota = (
+            self.df_cabecalho['NÚMERO'].to_numpy()[linha[encontrada]]
+            if 'NÚMERO' in self.df_cabecalho.columns else np.full(encontrada.sum(), None)
+        )
+        return pd.DataFrame({
+            'chave_acesso': chaves.to_numpy(dtype=object),
+            'numero_item': numeros,
+            'status': status,
+            'numero_nota': _espalhar(numero_nota, encontrada),
+            'itens_na_nota': np.where(tem_grupo, quantidade, 0),
+            'cfop_registrado': _espalhar(self.df_itens['CFOP'].to_numpy()[item], valido),
+            'cfop_esperado': _espalhar(resultado.itens['cfop_esperado'].to_numpy()[item], valido),
+            'resultado': _espalhar(tipos, valido),
+            'severidade': _espalhar([SEVERIDADE.get(t) for t in tipos], valido),
+        })
+
+    def _montar_divergencias(self, itens: pd.DataFrame, tipo: np.ndarray) -> pd.DataFrame:
+        """DataFrame só com os itens divergentes (para relatórios e estatísticas)"""
+        return self._montar_linhas(itens, np.flatnonzero(np.isin(tipo, CODIGOS_DIVERGENTES)))
+
+    def _montar_linhas(self, itens: pd.DataFrame, posicoes: np.ndarray) -> pd.DataFrame:
+        linhas = itens['linha_cabecalho'].to_numpy()[posicoes]
+
+        def do_item(coluna):
+            if coluna not in self.df_itens.columns:
+                return pd.Series([''] * len(posicoes), dtype=TIPO_TEXTO)
+            return self.df_itens[coluna].iloc[posicoes].reset_index(drop=True)
+
+        def do_cabecalho(coluna):
+            if coluna not in self.df_cabecalho.columns:
+                return pd.Series([''] * len(posicoes), dtype=TIPO_TEXTO)
+            if not len(self.df_cabecalho):
+                return pd.Series([None] * len(posicoes), dtype=self.df_cabecalho[coluna].dtype)
+            # Linha -1 (item sem cabeçalho) fica nula, não com o último cabeçalho
+            valores = self.df_cabecalho[coluna].iloc[np.maximum(linhas, 0)].reset_index(drop=True)
+            return valores.where(linhas >= 0)
+
+        # Número do item dentro da nota (1, 2, ...) pelos offsets do índice
+        notas = self.df_itens[COLUNA_NOTA].cat.codes.to_numpy()[posicoes]
+        numero_item = np.where(notas >= 0, posicoes - self.indice_notas.offsets[np.maximum(notas, 0)] + 1, 0)
+
+        tipos = itens['tipo'].iloc[posicoes].reset_index(drop=True)
+        return pd.DataFrame({
+            'item': posicoes,
+            'nota': do_item(COLUNA_NOTA),
+            'numero': do_item('NÚMERO'),
+            'chave': do_item(COLUNA_CHAVE),
+            'numero_item': numero_item,
+            'cfop': do_item(COLUNA_CFOP),
+            'cfop_atual': do_item('CFOP'),
+            'cfop_esperado': itens['cfop_esperado'].iloc[posicoes].reset_index(drop=True),
+            'tipo': tipos,
+            'severidade': tipos.map(SEVERIDADE),
+            'natureza': do_cabecalho('NATUREZA DA OPERAÇÃO'),
+            'uf_emit': do_cabecalho('UF EMITENTE'),
+            'uf_dest': do_cabecalho('UF DESTINATÁRIO'),
+            'emitente': do_item('CPF/CNPJ Emitente'),
+            'valor': do_item('VALOR TOTAL'),
+        })
@@ -0,0 +1,326 @@
+# backend/services/repositorio_validacao.py
+"""
+Repositório SQLite dos resultados de validação (sobrevive a reinícios).
+
+- itens: uma linha por item da versão atual dos dados, pela identidade do
+  item (nota + número do item), com a impressão digital do conteúdo e
+  índices por posição, nota, chave, CFOP, par de UFs, tipo de divergência
+  e emitente. Identidade + impressão servem para revalidar e regravar só
+  itens novos ou alterados (ver services/impressoes.py).
+- indice: identidade, impressão, posição e veredito de todos os itens em
+  arrays NumPy (um BLOB por coluna), gravado junto com os itens e lido de
+  uma vez para comparar a versão nova com a gravada
+"""
+import io
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Colunas do índice de todos os itens (ver carregar)
+COLUNAS_INDICE = ['identidade', 'impressao', 'item', 'tipo', 'cfop_esperado']
+# Colunas de texto do índice: gravadas como códigos + valores distintos
+_COLUNAS_INDICE_TEXTO = ['tipo', 'cfop_esperado']
+
+# Colunas gravadas por item (mesma ordem do INSERT)
+COLUNAS_ITENS = [
+    'item', 'nota', 'numero', 'chave', 'numero_item', 'cfop', 'cfop_atual', 'cfop_esperado',
+    'tipo', 'severidade', 'natureza', 'uf_emit', 'uf_dest', 'emitente', 'valor',
+]
+
+# Mudou a estrutura das tabelas? Troque a versão: bancos antigos são
+# recriados vazios na abertura (os resultados são recalculados)
+VERSAO_ESQUEMA = "3"
+
+# Linhas lidas do cursor por vez ao iterar (memória constante)
+TAMANHO_LOTE_LEITURA = 5000
+
+# Filtros aceitos nas consultas (coluna -> comparação)
+FILTROS = ['nota', 'numero', 'chave', 'cfop', 'tipo', 'severidade', 'natureza',
+           'uf_emit', 'uf_dest', 'emitente']
+
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS metadados (
+    chave TEXT PRIMARY KEY,
+    valor TEXT
+);
+CREATE TABLE IF NOT EXISTS itens (
+    identidade INTEGER PRIMARY KEY,
+    impressao INTEGER NOT NULL,
+    item INTEGER NOT NULL,
+    nota TEXT,
+    numero TEXT,
+    chave TEXT,
+    numero_item INTEGER,
+    cfop TEXT,
+    cfop_atual TEXT,
+    cfop_esperado TEXT,
+    tipo TEXT NOT NULL,
+    severidade TEXT,
+    natureza TEXT,
+    uf_emit TEXT,
+    uf_dest TEXT,
+    emitente TEXT,
+    valor REAL
+);
+CREATE TABLE IF NOT EXISTS indice (
+    coluna TEXT PRIMARY KEY,
+    dados BLOB NOT NULL
+);
+"""
+
+_INDICES = [
+    "CREATE INDEX IF NOT EXISTS idx_itens_item ON itens (item)",
+    "CREATE INDEX IF NOT EXISTS idx_itens_nota ON itens (nota)",
+    "CREATE INDEX IF NOT EXISTS idx_itens_chave ON itens (chave)",
+    "CREATE INDEX IF NOT EXISTS idx_itens_cfop ON itens (cfop)",
+    "CREATE INDEX IF NOT EXISTS idx_itens_uf ON itens (uf_emit, uf_dest)",
+    "CREATE INDEX IF NOT EXISTS idx_itens_tipo ON itens (tipo, item)",
+    "CREATE INDEX IF NOT EXISTS idx_itens_emitente ON itens (emitente, tipo)",
+]
+
+
+def _como_objetos(serie: pd.Series) -> np.ndarray:
+    """Valores Python (nulos viram None/NaN, gravados como NULL)"""
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return serie.astype(object).to_numpy()
+    return serie.to_numpy(dtype=object, na_value=None)
+
+
+def _como_inteiros(valores) -> List[int]:
+    """Hashes uint64 como inteiros com sinal do SQLite (mesma sequência de bits)"""
+    return np.asarray(valores, dtype=np.uint64).view(np.int64).tolist()
+
+
+def _para_blob(valores: np.ndarray) -> bytes:
+    buffer = io.BytesIO()
+    np.save(buffer, valores, allow_pickle=False)
+    return buffer.getvalue()
+
+
+def _de_blob(dados: bytes) -> np.ndarray:
+    return np.load(io.BytesIO(dados), allow_pickle=False)
+
+
+class RepositorioValidacao:
+    """Acesso ao banco SQLite de resultados (uma conexão por operação, para
+    uso seguro a partir das threads do servidor e dos jobs)"""
+
+    def __init__(self, caminho):
+        self.caminho = Path(caminho)
+        self.caminho.parent.mkdir(parents=True, exist_ok=True)
+        self._trava_escrita = threading.Lock()
+        with self._conectar() as conexao:
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.executescript(_ESQUEMA)
+            if self._metadado(conexao, 'esquema') != VERSAO_ESQUEMA:
+                conexao.executescript(
+                    "DROP TABLE IF EXISTS itens; DROP TABLE IF EXISTS impressoes; "
+                    "DROP TABLE IF EXISTS indice; DELETE FROM metadados;"
+                )
+                conexao.executescript(_ESQUEMA)
+                conexao.execute(
+                    "INSERT INTO metadados (chave, valor) VALUES ('esquema', ?)", (VERSAO_ESQUEMA,)
+                )
+            for sql in _INDICES:
+                conexao.execute(sql)
+
+    @contextmanager
+    def _conectar(self, qualquer_thread: bool = False):
+        """Conexão de uma operação. qualquer_thread: a conexão pode ser usada
+        por outra thread além da que a abriu (ex.: gerador retomado pelo
+        threadpool do Starlette a cada lote); o uso nunca é simultâneo."""
+        conexao = sqlite3.connect(str(self.caminho), timeout=30, check_same_thread=not qualquer_thread)
+        conexao.execute("PRAGMA synchronous=NORMAL")
+        try:
+            with conexao:
+                yield conexao
+        finally:
+            conexao.close()
+
+    # ========================================================================
+    # METADADOS
+    # ========================================================================
+
+    def _metadado(self, conexao, chave: str) -> Optional[str]:
+        linha = conexao.execute("SELECT valor FROM metadados WHERE chave = ?", (chave,)).fetchone()
+        return linha[0] if linha else None
+
+    def versao(self) -> Optional[str]:
+        """Versão dos dados cujos itens estão gravados"""
+        with self._conectar() as conexao:
+            return self._metadado(conexao, 'versao')
+
+    def pronto(self, versao: str) -> bool:
+        return versao is not None and self.versao() == versao
+
+    # ========================================================================
+    # ITENS
+    # ========================================================================
+
+    def carregar(self) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]]:
+        """(identidades, impressões, posições, tipos, CFOPs esperados
+        formatados) de todos os itens gravados, ou None se não houver nenhum.
+        Vem do índice em BLOBs: não lê as linhas de itens."""
+        with self._conectar() as conexao:
+            blobs = dict(conexao.execute("SELECT coluna, dados FROM indice").fetchall())
+        if not blobs or not len(_de_blob(blobs['identidade'])):
+            return None
+        colunas = {}
+        for coluna in COLUNAS_INDICE:
+            colunas[coluna] = _de_blob(blobs[coluna])
+            if coluna in _COLUNAS_INDICE_TEXTO:
+                valores = np.append(_de_blob(blobs[f'{coluna}:valores']).astype(object), '')
+                colunas[coluna] = valores[colunas[coluna]]
+        return tuple(colunas[coluna] for coluna in COLUNAS_INDICE)
+
+    @staticmethod
+    def _blobs_indice(indice: pd.DataFrame) -> List[Tuple[str, bytes]]:
+        blobs = []
+        for coluna in COLUNAS_INDICE:
+            if coluna in _COLUNAS_INDICE_TEXTO:
+                # Nulos (código -1) voltam como '' em carregar
+                codigos, valores = pd.factorize(indice[coluna])
+                blobs.append((f'{coluna}:valores', _para_blob(np.asarray(valores, dtype=str))))
+                blobs.append((coluna, _para_blob(codigos.astype(np.int32))))
+            else:
+                blobs.append((coluna, _para_blob(indice[coluna].to_numpy())))
+        return blobs
+
+    def gravar_itens(self, versao: str, itens: pd.DataFrame, indice: pd.DataFrame,
+                     removidas: np.ndarray = ()):
+        """Grava os itens novos ou alterados (`identidade`, `impressao` e
+        COLUNAS_ITENS; substituem os da mesma identidade), apaga os que
+        deixaram de existir, troca o índice pelo de todos os itens atuais
+        (COLUNAS_INDICE) e marca a versão, numa única transação (leitores
+        continuam vendo a versão anterior até o commit)"""
+        inicio = time.perf_counter()
+        # Em ordem de identidade: inserções sequenciais na chave primária
+        itens = itens.iloc[np.argsort(itens['identidade'].to_numpy().view(np.int64), kind='stable')]
+        colunas = [_como_inteiros(itens['identidade']), _como_inteiros(itens['impressao'])]
+        colunas += [_como_objetos(itens[coluna]) for coluna in COLUNAS_ITENS]
+        nomes = ['identidade', 'impressao'] + COLUNAS_ITENS
+        sql = f"INSERT OR REPLACE INTO itens ({', '.join(nomes)}) VALUES ({', '.join('?' * len(nomes))})"
+
+        with self._trava_escrita, self._conectar() as conexao:
+            total_anterior = int(conexao.execute("SELECT COUNT(*) FROM itens").fetchone()[0])
+            # Carga grande (ex.: a primeira): índices recriados depois, bem mais rápido
+            recriar_indices = len(itens) > total_anterior // 2
+            if recriar_indices:
+                for nome, in conexao.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'itens' AND sql IS NOT NULL"
+                ).fetchall():
+                    conexao.execute(f"DROP INDEX {nome}")
+            conexao.executemany(
+                "DELETE FROM itens WHERE identidade = ?", [(i,) for i in _como_inteiros(removidas)]
+            )
+            conexao.executemany(sql, zip(*colunas))
+            if recriar_indices:
+                for sql_indice in _INDICES:
+                    conexao.execute(sql_indice)
+            total = int(conexao.execute("SELECT COUNT(*) FROM itens").fetchone()[0])
+            if total != len(indice):
+                raise ValueError(f"Índice com {len(indice)} itens para {total} gravados")
+            conexao.execute("DELETE FROM indice")
+            conexao.executemany("INSERT INTO indice (coluna, dados) VALUES (?, ?)", self._blobs_indice(indice))
+            conexao.executemany(
+                "INSERT OR REPLACE INTO metadados (chave, valor) VALUES (?, ?)",
+                [('versao', versao), ('total_itens', str(total)),
+                 ('gravado_em', time.strftime('%Y-%m-%d %H:%M:%S'))]
+            )
+
+        print(f"   💾 {len(itens)} itens gravados, {len(removidas)} removidos "
+              f"({total - len(itens)} inalterados) em {self.caminho.name} "
+              f"em {time.perf_counter() - inicio:.2f}s")
+
+    @staticmethod
+    def _where(filtros: Dict[str, Any], condicoes: Optional[List[str]] = None):
+        """Cláusula WHERE (igualdade; listas viram IN) e parâmetros"""
+        condicoes = list(condicoes or [])
+        parametros: List[Any] = []
+        for coluna, valor in filtros.items():
+            if valor is None:
+                continue
+            if coluna not in FILTROS:
+                raise ValueError(f"Filtro desconhecido: {coluna}")
+            if isinstance(valor, (list, tuple, set)):
+                valores = list(valor)
+                condicoes.append(f"{coluna} IN ({', '.join('?' * len(valores))})")
+                parametros.extend(valores)
+            else:
+                condicoes.append(f"{coluna} = ?")
+                parametros.append(valor)
+        where = f" WHERE {' AND '.join(condicoes)}" if condicoes else ""
+        return where, parametros
+
+    def contagens(self, limite: Optional[int] = None, **filtros) -> Dict[str, int]:
+        """Contagem por tipo (dos primeiros `limite` itens, se informado)"""
+        where, parametros = self._where(filtros, ["item < ?"] if limite is not None else None)
+        if limite is not None:
+            parametros.insert(0, int(limite))
+        with self._conectar() as conexao:
+            linhas = conexao.execute(
+                f"SELECT tipo, COUNT(*) FROM itens{where} GROUP BY tipo", parametros
+            ).fetchall()
+        return {tipo: int(qtd) for tipo, qtd in linhas}
+
+    def consultar(self, limite: Optional[int] = None, deslocamento: int = 0,
+                  limite_item: Optional[int] = None, **filtros) -> pd.DataFrame:
+        """Itens que atendem aos filtros, na ordem original (ex.:
+        consultar(tipo=['primeiro_digito', 'ultimos_digitos'], emitente=X))"""
+        where, parametros = self._where(filtros, ["item < ?"] if limite_item is not None else None)
+        if limite_item is not None:
+            parametros.insert(0, int(limite_item))
+        sql = f"SELECT {', '.join(COLUNAS_ITENS)} FROM itens{where} ORDER BY item"
+        if limite is not None:
+            sql += " LIMIT ? OFFSET ?"
+            parametros += [int(limite), int(deslocamento)]
+        with self._conectar() as conexao:
+            return pd.read_sql_query(sql, conexao, params=parametros)
+
+    def iterar(self, tamanho_lote: int = TAMANHO_LOTE_LEITURA, **filtros) -> Iterator[List[tuple]]:
+        """Itens que atendem aos filtros, em lotes de tuplas (na ordem de
+        COLUNAS_ITENS) lidos do cursor sob demanda: a memória não cresce com
+        o total de linhas.
+
+        Cada next() pode rodar numa thread diferente (respostas em streaming),
+        por isso a conexão aceita qualquer thread."""
+        where, parametros = self._where(filtros)
+        with self._conectar(qualquer_thread=True) as conexao:
+            cursor = conexao.execute(
+                f"SELECT {', '.join(COLUNAS_ITENS)} FROM itens{where} ORDER BY item", parametros
+            )
+            while True:
+                linhas = cursor.fetchmany(tamanho_lote)
+                if not linhas:
+                    break
+                yield linhas
+
+    def contar(self, **filtros) -> int:
+        where, parametros = self._where(filtros)
+        with self._conectar() as conexao:
+            return int(conexao.execute(f"SELECT COUNT(*) FROM itens{where}", parametros).fetchone()[0])
+
+    def top_notas(self, top_n: int = 10, limite_item: Optional[int] = None, **filtros) -> List[Tuple[str, int]]:
+        """Notas com mais itens nos filtros: [(nota, quantidade), ...]"""
+        where, parametros = self._where(filtros, ["item < ?"] if limite_item is not None else None)
+        if limite_item is not None:
+            parametros.insert(0, int(limite_item))
+        with self._conectar() as conexao:
+            return conexao.execute(
+                f"SELECT nota, COUNT(*) AS qtd FROM itens{where} "
+                f"GROUP BY nota ORDER BY qtd DESC, MIN(item) LIMIT ?",
+                parametros + [int(top_n)]
+            ).fetchall()
+
+    def limpar(self):
+        with self._trava_escrita, self._conectar() as conexao:
+            conexao.execute("DELETE FROM itens")
+            conexao.execute("DELETE FROM indice")
+            conexao.execute("DELETE FROM metadados WHERE chave != 'esquema'")
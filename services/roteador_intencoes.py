@@ -0,0 +1,169 @@
+# backend/services/roteador_intencoes.py
+"""
+Roteador determinístico de perguntas do chat: reconhece por expressões
+regulares as perguntas mecânicas (chave de acesso, item de uma nota, CFOP,
+contagens) e indica a ferramenta a chamar diretamente, sem o LLM.
+Perguntas que não casam com nenhuma regra seguem para o agente.
+"""
+import re
+import unicodedata
+from typing import Callable, Dict, List, Optional, Tuple
+
+from services.carregador_csv import normalizar_chave
+from services.motor_validacao import PALAVRAS_NUMERICAS
+
+# Ordinais por extenso (sem acento, como o texto normalizado da pergunta)
+_ORDINAIS = {
+    unicodedata.normalize('NFKD', palavra).encode('ascii', 'ignore').decode(): numero
+    for palavra, numero in PALAVRAS_NUMERICAS.items()
+}
+_ORDINAL = '|'.join(sorted(_ORDINAIS, key=len, reverse=True))
+
+# 44 dígitos, aceitando espaços, pontos e hífens entre eles (como normalizar_chave)
+_CHAVE = re.compile(r"(?<!\d)\d(?:[\s.\-']?\d){43}(?!\d)")
+
+# "item 3", "item nº 3", "3º item", "terceiro item", "item terceiro"
+_ITEM = re.compile(
+    rf"\bitem\s*(?:n[o°º]?\.?\s*|numero\s*)?(\d{{1,3}})\b"
+    rf"|\b(\d{{1,3}})\s*[°ºo]?\s*item\b"
+    rf"|\b({_ORDINAL})\s+item\b"
+    rf"|\bitem\s+({_ORDINAL})\b"
+)
+
+_CFOP = r"cfops?\s*(?:n[o°º]?\.?\s*)?(\d[.\s]?\d{3})"
+_FIM = r"\s*[?.!]*\s*$"
+
+# Perguntas inteiras sobre um CFOP ("o que é o CFOP 5102?", "CFOP 5.102")
+_PERGUNTA_CFOP = re.compile(
+    rf"^(?:(?:o\s+)?que\s+(?:e|significa)|qual\s+(?:e\s+)?(?:o\s+)?(?:significado|descricao)\s+d[oe]"
+    rf"|(?:significado|descricao)\s+d[oe]|explique|defina|me\s+fale\s+sobre)?"
+    rf"\s*(?:o\s+)?{_CFOP}(?:\s+(?:significa|quer\s+dizer))?{_FIM}"
+)
+
+# Contagens de notas e itens, as que contar_notas responde ("quantas notas?",
+# "quantos itens foram carregados", "total de notas"); outras ("quantos
+# CFOPs", "quantos registros") são ambíguas e vão para o agente
+_CONTAGEM = re.compile(
+    r"^(?:quant[ao]s|qual\s+(?:e\s+)?(?:o\s+)?(?:total|numero)\s+de|total\s+de|numero\s+de)"
+    r"\s+(?:notas?(?:\s+fiscais)?|nfs?|nf-es?|itens)"
+    r"(?:\s+(?:existem|existe|ha|tem|temos|tenho|foram|estao|carregad[ao]s|no\s+sistema"
+    r"|nos?\s+arquivos?|na\s+base|no\s+total))*" + _FIM
+)
+
+# Posição no arquivo ("quinta nota", "mostre o décimo item")
+_POSICAO = re.compile(
+    rf"^(?:(?:me\s+)?mostre|exiba|busque|qual\s+(?:e\s+)?)?\s*(?:a|o)?\s*({_ORDINAL})\s+(nota|item)"
+    rf"(?:\s+do\s+arquivo)?{_FIM}"
+)
+
+# Palavras que indicam um pedido de validação do item
+_VALIDAR = re.compile(r"\b(?:valid|verifi|confer|checa|correto|cfop|diverg)")
+
+# Palavras de um simples pedido da nota pela chave ("busque a nota com a chave X");
+# sobrando outras, a pergunta pede mais que a nota e vai para o agente
+_PEDIDO_NOTA = {
+    'busque', 'buscar', 'mostre', 'mostrar', 'exiba', 'consulte', 'consultar', 'encontre', 'procure',
+    'me', 'qual', 'e', 'a', 'o', 'da', 'de', 'do', 'com', 'sobre', 'nota', 'fiscal', 'nf', 'nfe',
+    'nf-e', 'chave', 'acesso', 'dados', 'informacoes', 'detalhes',
+}
+
+# Respostas das ferramentas que indicam falha ("❌ Nota ... não encontrada",
+# "Erro ao buscar ..."): a pergunta segue para o agente em vez de devolvê-las
+PREFIXOS_FALHA = ('❌', 'Erro')
+
+
+class Intencao:
+    """Ferramenta a chamar e seus argumentos (texto, como o agente passaria)"""
+
+    def __init__(self, ferramenta: str, argumentos: Dict[str, str], regra: str):
+        self.ferramenta = ferramenta
+        self.argumentos = argumentos
+        self.regra = regra
+
+    def __repr__(self) -> str:
+        return f"Intencao({self.ferramenta}, {self.argumentos}, regra={self.regra})"
+
+
+def normalizar_pergunta(pergunta: str) -> str:
+    """Minúsculas, sem acentos e com espaços simples"""
+    texto = unicodedata.normalize('NFKD', str(pergunta)).encode('ascii', 'ignore').decode()
+    return re.sub(r"\s+", ' ', texto.lower()).strip()
+
+
+def _numero_item(texto: str) -> Tuple[Optional[str], str]:
+    """(número do item mencionado ou None, texto sem a menção)"""
+    encontrado = _ITEM.search(texto)
+    if not encontrado:
+        return None, texto
+    restante = texto[:encontrado.start()] + ' ' + texto[encontrado.end():]
+    numero, numero_antes, ordinal, ordinal_depois = encontrado.groups()
+    if numero or numero_antes:
+        return numero or numero_antes, restante
+    return str(_ORDINAIS[ordinal or ordinal_depois]), restante
+
+
+def _por_chave(texto: str) -> Optional[Intencao]:
+    """Chave de acesso com item -> validação do item (que traz os dados
+    dele); só a chave, com palavras de busca -> a nota"""
+    encontrada = _CHAVE.search(texto)
+    if not encontrada:
+        return None
+    chave = normalizar_chave(encontrada.group())
+    restante = texto[:encontrada.start()] + ' ' + texto[encontrada.end():]
+    item, restante = _numero_item(restante)
+    so_pedido = set(re.findall(r"[\w-]+", restante)) <= _PEDIDO_NOTA
+    if item is not None and (so_pedido or _VALIDAR.search(restante)):
+        return Intencao('validar_cfop_item_especifico', {'chave_acesso': chave, 'numero_item': item}, 'chave_item')
+    if item is None and so_pedido:
+        return Intencao('buscar_nota_por_chave', {'chave_acesso': chave}, 'chave')
+    # Outros pedidos sobre a nota/item: o agente decide
+    return None
+
+
+def _por_cfop(texto: str) -> Optional[Intencao]:
+    encontrado = _PERGUNTA_CFOP.match(texto)
+    if not encontrado:
+        return None
+    return Intencao('buscar_cfop', {'codigo_cfop': re.sub(r"\D", '', encontrado.group(1))}, 'cfop')
+
+
+def _por_contagem(texto: str) -> Optional[Intencao]:
+    if not _CONTAGEM.match(texto):
+        return None
+    return Intencao('contar_notas', {'dummy': ''}, 'contagem')
+
+
+def _por_posicao(texto: str) -> Optional[Intencao]:
+    encontrado = _POSICAO.match(texto)
+    if not encontrado:
+        return None
+    ordinal, alvo = encontrado.groups()
+    # Ferramentas de posição usam índice a partir de 0
+    indice = str(_ORDINAIS[ordinal] - 1)
+    if alvo == 'nota':
+        return Intencao('buscar_nota_por_indice', {'indice': indice}, 'posicao_nota')
+    return Intencao('buscar_item_por_indice', {'indice': indice}, 'posicao_item')
+
+
+# Regras em ordem de prioridade (a primeira que reconhecer a pergunta vence)
+REGRAS: List[Tuple[str, Callable[[str], Optional[Intencao]]]] = [
+    ('chave', _por_chave),
+    ('cfop', _por_cfop),
+    ('contagem', _por_contagem),
+    ('posicao', _por_posicao),
+]
+
+
+def identificar_intencao(pergunta: str) -> Optional[Intencao]:
+    """Intenção da pergunta, ou None para encaminhar ao agente"""
+    texto = normalizar_pergunta(pergunta)
+    for _, regra in REGRAS:
+        intencao = regra(texto)
+        if intencao is not None:
+            return intencao
+    return None
+
+
+def resposta_de_falha(resposta) -> bool:
+    """Se a resposta da ferramenta é vazia ou uma mensagem de falha"""
+    return not isinstance(resposta, str) or not resposta.strip() or resposta.lstrip().startswith(PREFIXOS_FALHA)
@@ -0,0 +1,102 @@
+# backend/services/serie_temporal.py
+"""
+Agregados por dia e por mês da data de emissão (notas, itens, valor e
+divergências), montados uma única vez na inicialização do agente
+"""
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from services.carregador_csv import COLUNA_DATA, COLUNA_NOTA, detectar_coluna_valor_nota
+
+MESES = ['Jan', 'Fev', 'Mar', 'Abr', 'Mai', 'Jun', 'Jul', 'Ago', 'Set', 'Out', 'Nov', 'Dez']
+
+
+def _somar(codigos: np.ndarray, tamanho: int, pesos: Optional[np.ndarray] = None) -> np.ndarray:
+    """Soma (ou contagem) por código, ignorando código -1"""
+    validos = codigos >= 0
+    if pesos is not None:
+        pesos = pesos[validos]
+    return np.bincount(codigos[validos], weights=pesos, minlength=tamanho)
+
+
+class SerieTemporal:
+    """Agregados diários em arrays pequenos (um elemento por dia com notas),
+    mais o dia de cada item para agregar divergências quando a validação
+    terminar. O mês é derivado dos dias, sem voltar às linhas."""
+
+    def __init__(self, df_cabecalho: pd.DataFrame, df_itens: pd.DataFrame, indice_notas):
+        if COLUNA_DATA in df_cabecalho.columns:
+            dia_da_linha = df_cabecalho[COLUNA_DATA].to_numpy().astype('datetime64[D]')
+        else:
+            dia_da_linha = np.full(len(df_cabecalho), np.datetime64('NaT'), dtype='datetime64[D]')
+        com_data = ~np.isnat(dia_da_linha)
+
+        # Dias distintos (ordenados) e código do dia de cada linha (-1 = sem data)
+        self.dias = np.unique(dia_da_linha[com_data])
+        codigo_da_linha = np.full(len(df_cabecalho), -1, dtype=np.int64)
+        codigo_da_linha[com_data] = np.searchsorted(self.dias, dia_da_linha[com_data])
+
+        # Dia de cada item = dia do seu cabeçalho
+        linha_da_nota = np.append(indice_notas.cabecalho_da_nota, -1)
+        linha_do_item = linha_da_nota[df_itens[COLUNA_NOTA].cat.codes.to_numpy()]
+        self.dia_do_item = np.append(codigo_da_linha, -1)[linha_do_item].astype(np.int32)
+
+        coluna_valor = detectar_coluna_valor_nota(df_cabecalho)
+        valor = (
+            np.nan_to_num(df_cabecalho[coluna_valor].to_numpy(dtype=np.float64, na_value=np.nan))
+            if coluna_valor else np.zeros(len(df_cabecalho))
+        )
+
+        quantidade = len(self.dias)
+        self.notas_por_dia = _somar(codigo_da_linha, quantidade).astype(np.int64)
+        self.valor_por_dia = _somar(codigo_da_linha, quantidade, valor)
+        self.itens_por_dia = _somar(self.dia_do_item.astype(np.int64), quantidade).astype(np.int64)
+
+        # Meses distintos e mês de cada dia
+        meses_dos_dias = self.dias.astype('datetime64[M]')
+        self.meses = np.unique(meses_dos_dias)
+        self.mes_do_dia = np.searchsorted(self.meses, meses_dos_dias)
+
+        self.sem_data = int((~com_data).sum())
+        print(f"   📅 {quantidade} dias em {len(self.meses)} meses"
+              + (f" ({self.sem_data} notas sem data de emissão)" if self.sem_data else ""))
+
+    def divergencias_por_dia(self, divergente: np.ndarray) -> np.ndarray:
+        """Itens divergentes por dia (máscara alinhada a df_itens)"""
+        return _somar(self.dia_do_item[divergente].astype(np.int64), len(self.dias)).astype(np.int64)
+
+    def por_dia(self, divergencias_por_dia: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+        return self._linhas(
+            [str(d) for d in self.dias], self.notas_por_dia, self.itens_por_dia,
+            self.valor_por_dia, divergencias_por_dia, chave='dia'
+        )
+
+    def por_mes(self, divergencias_por_dia: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+        """Agregados mensais (somas dos dias de cada mês)"""
+        def no_mes(valores):
+            return np.bincount(self.mes_do_dia, weights=valores, minlength=len(self.meses))
+
+        divergencias = None if divergencias_por_dia is None else no_mes(divergencias_por_dia)
+        linhas = self._linhas(
+            [str(m) for m in self.meses], no_mes(self.notas_por_dia), no_mes(self.itens_por_dia),
+            no_mes(self.valor_por_dia), divergencias, chave='periodo'
+        )
+        for linha in linhas:
+            ano, mes = linha['periodo'].split('-')
+            linha['mes'] = f"{MESES[int(mes) - 1]}/{ano}"
+        return linhas
+
+    @staticmethod
+    def _linhas(rotulos, notas, itens, valor, divergencias, chave: str) -> List[Dict[str, Any]]:
+        return [
+            {
+                chave: rotulo,
+                "notas": int(notas[i]),
+                "itens": int(itens[i]),
+                "valor": round(float(valor[i]), 2),
+                "divergencias": None if divergencias is None else int(divergencias[i]),
+            }
+            for i, rotulo in enumerate(rotulos)
+        ]
@@ -0,0 +1,432 @@
+# backend/services/sketches.py
+"""
+Modo aproximado das estatísticas: resumos compactos (sketches) montados uma
+vez na inicialização, um por mês de emissão, e mescláveis entre meses.
+
+- TDigest: quantis dos valores das notas
+- HyperLogLog: quantidade de emitentes e destinatários distintos
+- CountMin: frequência dos CFOPs dos itens
+
+O tamanho de cada resumo não depende do número de linhas: as consultas
+custam o mesmo em 5 mil ou 50 milhões de itens, com erro declarado.
+"""
+import math
+import time
+from statistics import NormalDist
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from services.carregador_csv import (
+    COLUNA_CFOP, COLUNA_DATA, COLUNA_NOTA, detectar_coluna_valor_nota, normalizar_cfop
+)
+from services.impressoes import hash_coluna
+from services.motor_validacao import formatar_cfop
+
+# Identificação de emitentes e destinatários (primeira coluna existente)
+COLUNAS_EMITENTE = ['CPF/CNPJ Emitente', 'CNPJ EMITENTE', 'RAZÃO SOCIAL EMITENTE']
+COLUNAS_DESTINATARIO = ['CPF/CNPJ DESTINATÁRIO', 'CNPJ DESTINATÁRIO', 'NOME DESTINATÁRIO']
+
+# Quantis devolvidos por padrão
+QUANTIS = [0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99]
+
+# Partição das notas sem data de emissão
+SEM_DATA = 'sem_data'
+
+_SEM_VALOR = hash_coluna(pd.Series([''], dtype=object))[0]
+
+
+class Momentos:
+    """Contagem, média, M2 (soma dos quadrados dos desvios), mínimo e máximo:
+    exatos e mescláveis (fórmula de Chan para média e variância)"""
+
+    def __init__(self, valores: Optional[np.ndarray] = None):
+        valores = np.asarray([] if valores is None else valores, dtype=np.float64)
+        self.n = len(valores)
+        self.media = float(valores.mean()) if self.n else 0.0
+        self.m2 = float(((valores - self.media) ** 2).sum()) if self.n else 0.0
+        self.minimo = float(valores.min()) if self.n else math.inf
+        self.maximo = float(valores.max()) if self.n else -math.inf
+
+    def mesclar(self, outro: 'Momentos') -> 'Momentos':
+        mesclado = Momentos()
+        mesclado.n = self.n + outro.n
+        if mesclado.n:
+            delta = outro.media - self.media
+            mesclado.media = self.media + delta * outro.n / mesclado.n
+            mesclado.m2 = self.m2 + outro.m2 + delta ** 2 * self.n * outro.n / mesclado.n
+        mesclado.minimo = min(self.minimo, outro.minimo)
+        mesclado.maximo = max(self.maximo, outro.maximo)
+        return mesclado
+
+    @property
+    def soma(self) -> float:
+        return self.media * self.n
+
+    @property
+    def desvio_padrao(self) -> float:
+        """Desvio padrão amostral (ddof=1, como no pandas)"""
+        return math.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else 0.0
+
+
+class TDigest:
+    """t-digest (variante com fusão, escala k1): centróides (média, peso)
+    pequenos nas caudas e maiores no meio da distribuição.
+
+    Cada centróide cobre no máximo uma unidade da escala
+    k(q) = compressao / 2π * asen(2q - 1), então há no máximo cerca de
+    `compressao` centróides e os quantis extremos ficam quase exatos."""
+
+    def __init__(self, compressao: float = 200, valores: Optional[np.ndarray] = None):
+        self.compressao = compressao
+        valores = np.sort(np.asarray([] if valores is None else valores, dtype=np.float64))
+        n = len(valores)
+        if not n:
+            self.medias, self.pesos = np.zeros(0), np.zeros(0)
+            return
+        # Dados ordenados: o centróide de cada valor é a unidade de k do seu quantil
+        k = self._k((np.arange(n) + 0.5) / n)
+        centroide = np.floor(k - self._k(0.0)).astype(np.int64)
+        centroide = np.unique(centroide, return_inverse=True)[1]
+        self.pesos = np.bincount(centroide).astype(np.float64)
+        self.medias = np.bincount(centroide, weights=valores) / self.pesos
+
+    def _k(self, q):
+        return self.compressao / (2 * np.pi) * np.arcsin(2 * np.clip(q, 0, 1) - 1)
+
+    def _q(self, k: float) -> float:
+        """Inversa de _k"""
+        return float((np.sin(min(k * 2 * np.pi / self.compressao, np.pi / 2)) + 1) / 2)
+
+    @property
+    def total(self) -> float:
+        return float(self.pesos.sum())
+
+    def mesclar(self, outro: 'TDigest') -> 'TDigest':
+        """Funde os centróides dos dois, em ordem de média, enquanto cada
+        grupo couber numa unidade da escala k"""
+        mesclado = TDigest(self.compressao)
+        medias = np.concatenate([self.medias, outro.medias])
+        pesos = np.concatenate([self.pesos, outro.pesos])
+        if not len(medias):
+            return mesclado
+        ordem = np.argsort(medias, kind='stable')
+        medias, pesos = medias[ordem], pesos[ordem]
+        total = pesos.sum()
+
+        novas_medias, novos_pesos = [medias[0]], [pesos[0]]
+        acumulado = 0.0
+        limite = self._q(self._k(0.0) + 1) * total
+        for media, peso in zip(medias[1:], pesos[1:]):
+            if acumulado + novos_pesos[-1] + peso <= limite:
+                novos_pesos[-1] += peso
+                novas_medias[-1] += (media - novas_medias[-1]) * peso / novos_pesos[-1]
+            else:
+                acumulado += novos_pesos[-1]
+                limite = self._q(self._k(acumulado / total) + 1) * total
+                novas_medias.append(media)
+                novos_pesos.append(peso)
+        mesclado.medias, mesclado.pesos = np.array(novas_medias), np.array(novos_pesos)
+        return mesclado
+
+    def quantil(self, q: float, minimo: float, maximo: float) -> Dict[str, float]:
+        """Valor no quantil q (interpolação entre os centros dos centróides),
+        com o erro de posição declarado: metade do peso do centróide que
+        contém q, como fração do total. `inferior`/`superior` são os valores
+        nos quantis q ∓ erro_rank."""
+        total = self.total
+        if not total:
+            return {"estimativa": 0.0, "inferior": 0.0, "superior": 0.0, "erro_rank": 0.0}
+        acumulado = np.cumsum(self.pesos)
+        contem = min(int(np.searchsorted(acumulado, q * total)), len(self.pesos) - 1)
+        erro = float(self.pesos[contem] / 2 / total) if self.pesos[contem] > 1 else 0.0
+        return {
+            "estimativa": self._valor(q, acumulado, minimo, maximo),
+            "inferior": self._valor(max(q - erro, 0.0), acumulado, minimo, maximo),
+            "superior": self._valor(min(q + erro, 1.0), acumulado, minimo, maximo),
+            "erro_rank": erro,
+        }
+
+    def _valor(self, q: float, acumulado: np.ndarray, minimo: float, maximo: float) -> float:
+        # Centros dos centróides, com mínimo e máximo exatos nas pontas
+        total = acumulado[-1]
+        centros = np.concatenate([[0.0], acumulado - self.pesos / 2, [total]])
+        medias = np.concatenate([[minimo], self.medias, [maximo]])
+        return float(np.interp(q * total, centros, medias))
+
+
+class HyperLogLog:
+    """Contagem aproximada de valores distintos em 2^precisao registradores
+    de 1 byte (erro padrão relativo de 1,04 / raiz(2^precisao); 0,8% com a
+    precisão padrão). Mesclar = máximo registrador a registrador."""
+
+    def __init__(self, precisao: int = 14, hashes: Optional[np.ndarray] = None):
+        self.precisao = precisao
+        self.registradores = np.zeros(1 << precisao, dtype=np.uint8)
+        if hashes is not None and len(hashes):
+            self.adicionar(hashes)
+
+    def adicionar(self, hashes: np.ndarray):
+        """Hashes de 64 bits: os primeiros `precisao` bits escolhem o
+        registrador, que guarda a maior posição do primeiro bit 1 do resto"""
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        p = np.uint64(self.precisao)
+        indice = (hashes >> (np.uint64(64) - p)).astype(np.int64)
+        # Bit sentinela garante no máximo 64 - precisao + 1 zeros à esquerda
+        resto = (hashes << p) | (np.uint64(1) << (p - np.uint64(1)))
+        np.maximum.at(self.registradores, indice, (_zeros_a_esquerda(resto) + 1).astype(np.uint8))
+
+    def mesclar(self, outro: 'HyperLogLog') -> 'HyperLogLog':
+        mesclado = HyperLogLog(self.precisao)
+        mesclado.registradores = np.maximum(self.registradores, outro.registradores)
+        return mesclado
+
+    @property
+    def erro_relativo(self) -> float:
+        return 1.04 / math.sqrt(len(self.registradores))
+
+    def estimativa(self, confianca: float = 0.95) -> Dict[str, float]:
+        m = len(self.registradores)
+        alfa = 0.7213 / (1 + 1.079 / m)
+        bruta = alfa * m * m / float(np.power(2.0, -self.registradores.astype(np.float64)).sum())
+        vazios = int((self.registradores == 0).sum())
+        # Poucos valores: contagem linear dos registradores vazios é mais precisa
+        estimativa = m * math.log(m / vazios) if bruta <= 2.5 * m and vazios else bruta
+        margem = NormalDist().inv_cdf(0.5 + confianca / 2) * self.erro_relativo * estimativa
+        return {
+            "estimativa": int(round(estimativa)),
+            "inferior": int(max(0, round(estimativa - margem))),
+            "superior": int(round(estimativa + margem)),
+            "erro_relativo": round(self.erro_relativo, 4),
+        }
+
+
+class CountMin:
+    """Frequências aproximadas em `profundidade` linhas de `largura`
+    contadores. A estimativa nunca é menor que a frequência real e a excede
+    em no máximo epsilon * N com probabilidade 1 - delta.
+
+    Guarda também os `max_candidatos` valores mais frequentes vistos, para
+    listar os mais frequentes depois de mesclar."""
+
+    def __init__(self, epsilon: float = 0.001, delta: float = 0.01, max_candidatos: int = 64):
+        self.epsilon, self.delta = epsilon, delta
+        self.largura = int(math.ceil(math.e / epsilon))
+        self.profundidade = int(math.ceil(math.log(1 / delta)))
+        self.contadores = np.zeros((self.profundidade, self.largura), dtype=np.int64)
+        self.total = 0
+        self.max_candidatos = max_candidatos
+        self.candidatos: Dict[str, int] = {}
+
+    def _colunas(self, hashes: np.ndarray) -> np.ndarray:
+        # Hash duplo (Kirsch-Mitzenmacher): h1 + i * h2 para a linha i
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        h1 = (hashes & np.uint64(0xFFFFFFFF)).astype(np.int64)
+        h2 = (hashes >> np.uint64(32)).astype(np.int64) | 1
+        linhas = np.arange(self.profundidade, dtype=np.int64)[:, None]
+        return (h1[None, :] + linhas * h2[None, :]) % self.largura
+
+    def adicionar(self, valores: Sequence[str], hashes: np.ndarray, quantidades: np.ndarray):
+        """Soma `quantidades` para cada valor (já agregadas por valor distinto)"""
+        quantidades = np.asarray(quantidades, dtype=np.int64)
+        colunas = self._colunas(hashes)
+        for linha in range(self.profundidade):
+            self.contadores[linha] += np.bincount(colunas[linha], weights=quantidades,
+                                                  minlength=self.largura).astype(np.int64)
+        self.total += int(quantidades.sum())
+        self._atualizar_candidatos(dict(zip(valores, hashes)))
+
+    def _atualizar_candidatos(self, novos: Dict[str, int]):
+        candidatos = {**self.candidatos, **novos}
+        if not candidatos:
+            return
+        valores = list(candidatos)
+        estimados = self._estimar(np.array([candidatos[v] for v in valores], dtype=np.uint64))
+        mais = np.argsort(-estimados, kind='stable')[:self.max_candidatos]
+        self.candidatos = {valores[i]: candidatos[valores[i]] for i in mais}
+
+    def _estimar(self, hashes: np.ndarray) -> np.ndarray:
+        colunas = self._colunas(hashes)
+        return self.contadores[np.arange(self.profundidade)[:, None], colunas].min(axis=0)
+
+    def mesclar(self, outro: 'CountMin') -> 'CountMin':
+        mesclado = CountMin(self.epsilon, self.delta, self.max_candidatos)
+        mesclado.contadores = self.contadores + outro.contadores
+        mesclado.total = self.total + outro.total
+        mesclado._atualizar_candidatos({**self.candidatos, **outro.candidatos})
+        return mesclado
+
+    @property
+    def erro_maximo(self) -> int:
+        """Excesso máximo de cada estimativa (epsilon * N)"""
+        return int(math.ceil(self.epsilon * self.total))
+
+    def mais_frequentes(self, top_n: int = 10) -> List[Dict[str, Any]]:
+        if not self.candidatos:
+            return []
+        valores = list(self.candidatos)
+        estimados = self._estimar(np.array(list(self.candidatos.values()), dtype=np.uint64))
+        ordem = np.argsort(-estimados, kind='stable')[:top_n]
+        return [
+            {
+                "valor": valores[i],
+                "estimativa": int(estimados[i]),
+                "inferior": int(max(0, estimados[i] - self.erro_maximo)),
+                "superior": int(estimados[i]),
+            }
+            for i in ordem
+        ]
+
+
+def _zeros_a_esquerda(valores: np.ndarray) -> np.ndarray:
+    """Quantidade de zeros à esquerda de inteiros de 64 bits (busca binária
+    vetorizada, exata para qualquer valor)"""
+    valores = valores.copy()
+    zeros = np.zeros(len(valores), dtype=np.int64)
+    for deslocamento in (32, 16, 8, 4, 2, 1):
+        vazio = (valores >> np.uint64(64 - deslocamento)) == 0
+        zeros[vazio] += deslocamento
+        valores[vazio] <<= np.uint64(deslocamento)
+    return zeros + (valores == 0)
+
+
+def _hashes_validos(df: pd.DataFrame, colunas: List[str]) -> np.ndarray:
+    """Hashes da primeira coluna existente, sem nulos/vazios"""
+    coluna = next((c for c in colunas if c in df.columns), None)
+    if coluna is None:
+        return np.zeros(0, dtype=np.uint64)
+    hashes = hash_coluna(df[coluna])
+    return hashes[hashes != _SEM_VALOR]
+
+
+class ParticaoSketches:
+    """Sketches de um mês (ou da mescla de vários)"""
+
+    def __init__(self, momentos: Momentos, digest: TDigest, emitentes: HyperLogLog,
+                 destinatarios: HyperLogLog, cfops: CountMin):
+        self.momentos = momentos
+        self.digest = digest
+        self.emitentes = emitentes
+        self.destinatarios = destinatarios
+        self.cfops = cfops
+
+    @classmethod
+    def montar(cls, df_cabecalho: pd.DataFrame, valores: np.ndarray, cfops: pd.Series) -> 'ParticaoSketches':
+        """Notas do mês (com o valor de cada uma) e CFOPs dos seus itens"""
+        cms = CountMin()
+        contagem = cfops.value_counts()
+        contagem = contagem[contagem > 0]
+        if len(contagem):
+            rotulos = [normalizar_cfop(c) for c in contagem.index]
+            cms.adicionar(rotulos, hash_coluna(pd.Series(rotulos, dtype=object)), contagem.to_numpy())
+        return cls(
+            Momentos(valores),
+            TDigest(valores=valores),
+            HyperLogLog(hashes=_hashes_validos(df_cabecalho, COLUNAS_EMITENTE)),
+            HyperLogLog(hashes=_hashes_validos(df_cabecalho, COLUNAS_DESTINATARIO)),
+            cms,
+        )
+
+    def mesclar(self, outra: 'ParticaoSketches') -> 'ParticaoSketches':
+        return ParticaoSketches(
+            self.momentos.mesclar(outra.momentos),
+            self.digest.mesclar(outra.digest),
+            self.emitentes.mesclar(outra.emitentes),
+            self.destinatarios.mesclar(outra.destinatarios),
+            self.cfops.mesclar(outra.cfops),
+        )
+
+
+class SketchesMensais:
+    """Uma ParticaoSketches por mês de emissão ('2024-01', ...; notas sem
+    data em SEM_DATA). Consultas mesclam só as partições pedidas."""
+
+    def __init__(self, df_cabecalho: pd.DataFrame, df_itens: pd.DataFrame, indice_notas):
+        inicio = time.perf_counter()
+        if COLUNA_DATA in df_cabecalho.columns:
+            mes_da_linha = df_cabecalho[COLUNA_DATA].to_numpy().astype('datetime64[M]')
+        else:
+            mes_da_linha = np.full(len(df_cabecalho), np.datetime64('NaT'), dtype='datetime64[M]')
+        rotulo_da_linha = np.where(np.isnat(mes_da_linha), SEM_DATA, mes_da_linha.astype(str))
+        codigo_da_linha, rotulos = pd.factorize(rotulo_da_linha, sort=True)
+
+        coluna_valor = detectar_coluna_valor_nota(df_cabecalho)
+        valor = (
+            df_cabecalho[coluna_valor].to_numpy(dtype=np.float64, na_value=np.nan)
+            if coluna_valor else np.full(len(df_cabecalho), np.nan)
+        )
+
+        # Mês de cada item = mês do seu cabeçalho (sem cabeçalho = sem data)
+        linha_da_nota = np.append(indice_notas.cabecalho_da_nota, -1)
+        linha_do_item = linha_da_nota[df_itens[COLUNA_NOTA].cat.codes.to_numpy()]
+        sem_data = list(rotulos).index(SEM_DATA) if SEM_DATA in rotulos else len(rotulos)
+        codigo_do_item = np.append(codigo_da_linha, sem_data)[linha_do_item]
+        if (codigo_do_item == len(rotulos)).any():
+            rotulos = list(rotulos) + [SEM_DATA]
+
+        self.particoes: Dict[str, ParticaoSketches] = {}
+        for codigo, rotulo in enumerate(rotulos):
+            linhas = np.flatnonzero(codigo_da_linha == codigo)
+            valores = valor[linhas]
+            self.particoes[str(rotulo)] = ParticaoSketches.montar(
+                df_cabecalho.iloc[linhas], valores[~np.isnan(valores)],
+                df_itens[COLUNA_CFOP][codigo_do_item == codigo]
+            )
+        print(f"   📐 Sketches de {len(self.particoes)} partições mensais "
+              f"em {time.perf_counter() - inicio:.2f}s")
+
+    @property
+    def meses(self) -> List[str]:
+        return list(self.particoes)
+
+    def mesclar(self, meses: Optional[Sequence[str]] = None) -> ParticaoSketches:
+        """Mescla das partições pedidas (todas se None); ValueError para mês
+        inexistente"""
+        meses = self.meses if meses is None else list(meses)
+        desconhecidos = [m for m in meses if m not in self.particoes]
+        if desconhecidos:
+            raise ValueError(
+                f"Meses sem dados: {', '.join(desconhecidos)} (disponíveis: {', '.join(self.meses)})"
+            )
+        if not meses:
+            raise ValueError("Informe ao menos um mês")
+        mescla = self.particoes[meses[0]]
+        for mes in meses[1:]:
+            mescla = mescla.mesclar(self.particoes[mes])
+        return mescla
+
+    def consultar(self, meses: Optional[Sequence[str]] = None, quantis: Sequence[float] = QUANTIS,
+                  top_n: int = 10, confianca: float = 0.95) -> Dict[str, Any]:
+        """Estatísticas aproximadas dos meses pedidos, com os limites de erro
+        de cada sketch (soma, média, desvio, mínimo e máximo são exatos)"""
+        inicio = time.perf_counter()
+        mescla = self.mesclar(meses)
+        momentos = mescla.momentos
+        vazio = not momentos.n
+
+        return {
+            "meses": self.meses if meses is None else list(meses),
+            "notas_com_valor": momentos.n,
+            "valores": {
+                "total": round(momentos.soma, 2),
+                "media": round(momentos.media, 2),
+                "desvio_padrao": round(momentos.desvio_padrao, 2),
+                "minimo": 0.0 if vazio else momentos.minimo,
+                "maximo": 0.0 if vazio else momentos.maximo,
+                "quantis": [
+                    {"q": q, **mescla.digest.quantil(q, momentos.minimo, momentos.maximo)}
+                    for q in quantis
+                ],
+                "centroides": len(mescla.digest.pesos),
+            },
+            "emitentes_distintos": mescla.emitentes.estimativa(confianca),
+            "destinatarios_distintos": mescla.destinatarios.estimativa(confianca),
+            "cfops_frequentes": [
+                {**linha, "valor": formatar_cfop(linha["valor"]) if linha["valor"] else linha["valor"]}
+                for linha in mescla.cfops.mais_frequentes(top_n)
+            ],
+            "cfops_erro_maximo": mescla.cfops.erro_maximo,
+            "confianca": confianca,
+            "milissegundos": round((time.perf_counter() - inicio) * 1000, 2),
+        }
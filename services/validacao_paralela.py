@@ -0,0 +1,148 @@
+# backend/services/validacao_paralela.py
+"""
+Validação completa particionada em processos (ProcessPoolExecutor).
+
+Os workers não recebem DataFrames: os códigos dos itens e as tabelas do
+contexto são gravados uma vez em arquivos Arrow IPC e abertos pelos
+workers com memory map (somente leitura, compartilhados pelo page cache).
+"""
+import multiprocessing
+import tempfile
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Union
+
+import numpy as np
+
+from services.motor_validacao import CODIGOS_DIVERGENTES, ValidacaoCancelada, validar_bloco
+
+try:
+    import pyarrow as pa
+    PYARROW_DISPONIVEL = True
+except ImportError:
+    PYARROW_DISPONIVEL = False
+
+PARTICIONAMENTO_NOTA = 'nota'
+PARTICIONAMENTO_UF = 'uf'
+
+# Partições por worker no particionamento por nota (granularidade do progresso)
+PARTICOES_POR_WORKER = 4
+
+Particao = Union[tuple, np.ndarray]
+
+
+# ============================================================================
+# ARRAYS COMPARTILHADOS (ARROW IPC + MEMORY MAP)
+# ============================================================================
+
+def _gravar_array(caminho: Path, array: np.ndarray):
+    tabela = pa.Table.from_arrays([pa.array(array)], names=['valores'])
+    with pa.OSFile(str(caminho), 'wb') as arquivo:
+        with pa.ipc.new_file(arquivo, tabela.schema) as escritor:
+            escritor.write_table(tabela)
+
+
+def _ler_array(caminho: Path) -> np.ndarray:
+    """Array somente leitura apontando para o arquivo mapeado (sem cópia)"""
+    tabela = pa.ipc.open_file(pa.memory_map(str(caminho), 'r')).read_all()
+    return tabela.column(0).chunk(0).to_numpy(zero_copy_only=True)
+
+
+# Cache por processo: cada worker abre os arquivos uma única vez
+_abertos: Dict[str, Dict[str, np.ndarray]] = {}
+
+
+def _abrir_diretorio(diretorio: str) -> Dict[str, np.ndarray]:
+    if diretorio not in _abertos:
+        _abertos.clear()
+        _abertos[diretorio] = {
+            caminho.stem: _ler_array(caminho) for caminho in Path(diretorio).glob('*.arrow')
+        }
+    return _abertos[diretorio]
+
+
+def _validar_particao(diretorio: str, particao: Particao):
+    """Executado no worker: valida as linhas da partição"""
+    arrays = _abrir_diretorio(diretorio)
+    linhas = slice(*particao) if isinstance(particao, tuple) else particao
+    contexto = {nome[len('ctx_'):]: valores for nome, valores in arrays.items() if nome.startswith('ctx_')}
+    return validar_bloco(
+        contexto, arrays['notas'][linhas], arrays['cfops'][linhas], arrays['digitos'][linhas]
+    )
+
+
+# ============================================================================
+# PARTICIONAMENTO
+# ============================================================================
+
+def particoes_por_nota(offsets: np.ndarray, quantidade: int) -> List[tuple]:
+    """Intervalos contíguos de linhas com tamanhos parecidos, sem quebrar notas
+    (df_itens está agrupado por nota)"""
+    total = int(offsets[-1]) if len(offsets) else 0
+    alvos = np.linspace(0, total, quantidade + 1)
+    limites = np.unique(offsets[np.searchsorted(offsets, alvos)])
+    return [(int(a), int(b)) for a, b in zip(limites[:-1], limites[1:]) if b > a]
+
+
+def particoes_por_grupo(grupo_do_item: np.ndarray) -> List[np.ndarray]:
+    """Posições dos itens de cada grupo (ex.: UF do emitente), maiores primeiro"""
+    ordem = np.argsort(grupo_do_item, kind='stable')
+    _, inicios = np.unique(grupo_do_item[ordem], return_index=True)
+    grupos = np.split(ordem, inicios[1:]) if len(ordem) else []
+    return sorted(grupos, key=len, reverse=True)
+
+
+# ============================================================================
+# EXECUÇÃO
+# ============================================================================
+
+def validar_em_particoes(contexto: Dict[str, np.ndarray], codigos: Dict[str, np.ndarray],
+                         particoes: List[Particao], workers: int,
+                         progresso: Optional[Callable[[int, int, int], None]] = None,
+                         cancelar: Optional[threading.Event] = None):
+    """Valida as partições num pool de processos e junta os resultados nas
+    posições originais (resultado independe da ordem de término).
+
+    Retorna (linha, esperado, tipo) com o tamanho de todos os itens; só as
+    posições cobertas pelas partições são preenchidas."""
+    total = len(codigos['notas'])
+    linha = np.empty(total, dtype=np.int64)
+    esperado = np.empty(total, dtype=np.int64)
+    tipo = np.empty(total, dtype=np.int8)
+    processados = divergentes = 0
+
+    with tempfile.TemporaryDirectory(prefix='fiscalai_particoes_') as diretorio:
+        for nome, valores in codigos.items():
+            _gravar_array(Path(diretorio) / f'{nome}.arrow', valores)
+        for nome, valores in contexto.items():
+            _gravar_array(Path(diretorio) / f'ctx_{nome}.arrow', valores)
+
+        # spawn: o servidor tem threads, fork não é seguro aqui
+        executor = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context('spawn')
+        )
+        try:
+            pendentes = {
+                executor.submit(_validar_particao, diretorio, particao): particao
+                for particao in particoes
+            }
+            while pendentes:
+                if cancelar is not None and cancelar.is_set():
+                    raise ValidacaoCancelada()
+
+                concluidos, _ = wait(pendentes, timeout=0.5, return_when=FIRST_COMPLETED)
+                for futuro in concluidos:
+                    particao = pendentes.pop(futuro)
+                    linhas = slice(*particao) if isinstance(particao, tuple) else particao
+                    linha[linhas], esperado[linhas], tipo[linhas] = futuro.result()
+
+                    tamanho = particao[1] - particao[0] if isinstance(particao, tuple) else len(particao)
+                    processados += tamanho
+                    divergentes += int(np.isin(tipo[linhas], CODIGOS_DIVERGENTES).sum())
+                    if progresso is not None:
+                        progresso(processados, total, divergentes)
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    return linha, esperado, tipo
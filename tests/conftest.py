@@ -0,0 +1,27 @@
+# backend/tests/conftest.py
+"""
+Configuração comum dos testes: raiz do backend no sys.path e montagem dos
+DataFrames de cabeçalho e itens usados pelos testes do motor
+"""
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.carregador_csv import preparar_chave_nota, preparar_colunas_normalizadas  # noqa: E402
+
+# Campos repetidos em todas as linhas, salvo se o teste informar outro valor
+PADRAO_NOTA = {'SÉRIE': '1', 'CPF/CNPJ Emitente': '11.111.111/0001-11'}
+
+
+def montar_dados(cabecalho, itens):
+    """(cabecalho, itens) preparados como no carregamento (colunas
+    normalizadas e _NOTA, itens agrupados por nota) a partir de uma lista
+    de dicts por arquivo"""
+    cabecalho = pd.DataFrame([{**PADRAO_NOTA, **linha} for linha in cabecalho])
+    itens = pd.DataFrame([{**PADRAO_NOTA, **linha} for linha in itens])
+    for df in (cabecalho, itens):
+        preparar_colunas_normalizadas(df)
+    return cabecalho, preparar_chave_nota(cabecalho, itens)
@@ -0,0 +1,43 @@
+# backend/tests/test_carregador_csv.py
+"""
+Carga dos três arquivos CSV e colunas derivadas
+"""
+import pandas as pd
+
+from services.carregador_csv import COLUNA_DATA, carregar_dados, detectar_coluna_valor_nota
+
+CABECALHO = """CHAVE DE ACESSO,SÉRIE,NÚMERO,CPF/CNPJ Emitente,NATUREZA DA OPERAÇÃO,DATA EMISSÃO,UF EMITENTE,UF DESTINATÁRIO,VALOR NOTA FISCAL
+35240111111111000111550010000004271000000011,1,427,11.111.111/0001-11,VENDA,21/03/2024 10:28:00,SP,SP,"1.234,56"
+"""
+
+ITENS = """CHAVE DE ACESSO,SÉRIE,NÚMERO,CPF/CNPJ Emitente,DATA EMISSÃO,CFOP,VALOR TOTAL
+35240111111111000111550010000004271000000011,1,427,11.111.111/0001-11,21/03/2024 10:28:00,5.102,"10,00"
+"""
+
+CFOP = """CFOP,DESCRIÇÃO,APLICAÇÃO
+5.102,Venda de mercadoria,Saídas
+"""
+
+
+def _carregar(tmp_path):
+    caminhos = []
+    for nome, conteudo in [('cabecalho.csv', CABECALHO), ('itens.csv', ITENS), ('cfop.csv', CFOP)]:
+        caminho = tmp_path / nome
+        caminho.write_text(conteudo, encoding='utf-8')
+        caminhos.append(str(caminho))
+    return carregar_dados(*caminhos)
+
+
+def test_data_de_emissao_so_convertida_no_cabecalho(tmp_path):
+    dados = _carregar(tmp_path)
+
+    assert dados['cabecalho'][COLUNA_DATA].iloc[0] == pd.Timestamp('2024-03-21 10:28:00')
+    assert COLUNA_DATA not in dados['itens'].columns
+
+
+def test_valor_da_nota_lido_da_coluna_do_cabecalho(tmp_path):
+    cabecalho = _carregar(tmp_path)['cabecalho']
+
+    coluna = detectar_coluna_valor_nota(cabecalho)
+    assert coluna == 'VALOR NOTA FISCAL'
+    assert cabecalho[coluna].iloc[0] == 1234.56
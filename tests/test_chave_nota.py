@@ -0,0 +1,69 @@
+# backend/tests/test_chave_nota.py
+"""
+Junção itens -> cabeçalho quando CNPJ do emitente, série e número se repetem
+entre notas distintas (só a chave de acesso as diferencia)
+"""
+import numpy as np
+
+from conftest import montar_dados
+from services.carregador_csv import COLUNA_CHAVE
+from services.indices import IndiceNotas
+from services.motor_validacao import MotorValidacao, TIPO_CONFORME
+
+CHAVE_A = '35240111111111000111550010000004271000000011'
+CHAVE_B = '29240111111111000111550010000004271000000022'
+
+
+def _dados(com_chave_nos_itens: bool = True):
+    # Duas notas com o mesmo CNPJ | série | número e operações opostas
+    cabecalho = [
+        {'CHAVE DE ACESSO': "'" + CHAVE_A, 'NÚMERO': '427', 'NATUREZA DA OPERAÇÃO': 'VENDA DE MERCADORIA',
+         'UF EMITENTE': 'SP', 'UF DESTINATÁRIO': 'SP', 'DESTINO DA OPERAÇÃO': '1 - OPERAÇÃO INTERNA'},
+        {'CHAVE DE ACESSO': "'" + CHAVE_B, 'NÚMERO': '427', 'NATUREZA DA OPERAÇÃO': 'COMPRA PARA COMERCIALIZAÇÃO',
+         'UF EMITENTE': 'BA', 'UF DESTINATÁRIO': 'SP', 'DESTINO DA OPERAÇÃO': '2 - OPERAÇÃO INTERESTADUAL'},
+    ]
+    itens = [
+        {'CHAVE DE ACESSO': chave, 'NÚMERO': '427', 'CFOP': cfop, 'VALOR TOTAL': valor}
+        for chave, cfop, valor in [(CHAVE_B, '2.102', 10.0), (CHAVE_A, '5.102', 20.0), (CHAVE_B, '2.102', 30.0)]
+    ]
+    if not com_chave_nos_itens:
+        for item in itens:
+            del item['CHAVE DE ACESSO']
+    return montar_dados(cabecalho, itens)
+
+
+def test_itens_juntam_com_o_cabecalho_da_propria_chave():
+    cabecalho, itens = _dados()
+    indice = IndiceNotas(cabecalho, itens)
+
+    assert len(indice) == 2
+    assert indice.repetidas == 0
+    linha = indice.cabecalho_da_nota[itens['_NOTA'].cat.codes.to_numpy()]
+    np.testing.assert_array_equal(cabecalho[COLUNA_CHAVE].to_numpy()[linha], itens[COLUNA_CHAVE].to_numpy())
+
+
+def test_item_por_numero_vem_da_nota_da_chave():
+    cabecalho, itens = _dados()
+    indice = IndiceNotas(cabecalho, itens)
+
+    nota_a = cabecalho['_NOTA'].iloc[0]
+    assert indice.quantidade_itens(nota_a) == 1
+    assert indice.item(nota_a, 1)['VALOR TOTAL'] == 20.0
+    nota_b = cabecalho['_NOTA'].iloc[1]
+    assert indice.item(nota_b, 1)['VALOR TOTAL'] == 10.0
+    assert indice.item(nota_b, 2)['VALOR TOTAL'] == 30.0
+
+
+def test_motor_usa_natureza_e_ufs_da_nota_correta():
+    cabecalho, itens = _dados()
+    motor = MotorValidacao(cabecalho, itens, IndiceNotas(cabecalho, itens))
+
+    assert (motor.resultado().itens['tipo'] == TIPO_CONFORME).all()
+
+
+def test_identificacao_repetida_sem_chave_e_avisada(capsys):
+    cabecalho, itens = _dados(com_chave_nos_itens=False)
+    indice = IndiceNotas(cabecalho, itens)
+
+    assert indice.repetidas == 1
+    assert 'repetem a identificação' in capsys.readouterr().out
@@ -0,0 +1,105 @@
+# backend/tests/test_jobs.py
+"""
+Jobs de validação em segundo plano: o que fica retido depois que terminam
+"""
+import gc
+import threading
+import weakref
+
+from services.jobs import STATUS_CANCELADO, STATUS_CONCLUIDO, GerenciadorJobs
+
+
+class _Resultado:
+    def resumo(self):
+        return {'total_itens': 3, 'divergencias_primeiro_digito': 1, 'divergencias_ultimos_digitos': 0}
+
+
+class _Motor:
+    versao_resultados = 'v1:regras'
+
+    def __init__(self, liberar: threading.Event = None):
+        self.liberar = liberar
+        self.persistido = False
+
+    def resultado(self, progresso=None, cancelar=None):
+        if self.liberar is not None:
+            self.liberar.wait(5)
+        return _Resultado()
+
+    def persistir(self):
+        self.persistido = True
+
+
+class _Estatisticas:
+    def preparar(self):
+        pass
+
+
+class _Agente:
+    def __init__(self, liberar: threading.Event = None):
+        self.df_itens = [None] * 3
+        self.motor_validacao = _Motor(liberar)
+        self.estatisticas = _Estatisticas()
+        self.repositorio = object()
+
+
+def _esperar(gerenciador):
+    # Um job vazio no fim da fila: quando ele roda, os anteriores terminaram
+    gerenciador._executor.submit(lambda: None).result(5)
+
+
+def test_job_concluido_nao_segura_o_agente():
+    gerenciador = GerenciadorJobs()
+    agente = _Agente()
+    motor = agente.motor_validacao
+    referencia = weakref.ref(agente)
+
+    job = gerenciador.iniciar_validacao(agente)
+    _esperar(gerenciador)
+    del agente
+    gc.collect()
+
+    assert job.status == STATUS_CONCLUIDO
+    assert motor.persistido
+    assert job.versao_resultados == 'v1:regras'
+    assert job.agente is None
+    assert referencia() is None
+
+
+def test_cancelar_do_agente_so_afeta_os_jobs_dele():
+    gerenciador = GerenciadorJobs(max_workers=1)
+    liberar = threading.Event()
+    antigo, outro = _Agente(liberar), _Agente()
+
+    executando = gerenciador.iniciar_validacao(antigo)
+    pendente = gerenciador.iniciar_validacao(antigo)
+    de_outro = gerenciador.iniciar_validacao(outro)
+    gerenciador.cancelar_do_agente(antigo)
+
+    assert pendente.status == STATUS_CANCELADO
+    assert pendente.agente is None
+    liberar.set()
+    _esperar(gerenciador)
+
+    # O job em execução para antes de gravar e solta o agente
+    assert executando.status == STATUS_CANCELADO
+    assert executando.agente is None
+    assert not antigo.motor_validacao.persistido
+    assert de_outro.status == STATUS_CONCLUIDO
+
+
+def test_validacao_do_agente_reaproveita_o_job_em_andamento():
+    gerenciador = GerenciadorJobs(max_workers=1)
+    liberar = threading.Event()
+    agente = _Agente(liberar)
+
+    job = gerenciador.validacao_do_agente(agente)
+    assert gerenciador.validacao_do_agente(agente) is job
+    liberar.set()
+    _esperar(gerenciador)
+
+    # Terminado o job, uma nova consulta sem resultados gravados inicia outro
+    novo = gerenciador.validacao_do_agente(agente)
+    assert novo is not job
+    _esperar(gerenciador)
+    assert [j.status for j in gerenciador.listar()] == [STATUS_CONCLUIDO, STATUS_CONCLUIDO]
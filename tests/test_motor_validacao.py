@@ -0,0 +1,35 @@
+# backend/tests/test_motor_validacao.py
+"""
+Linhas de relatório montadas pelo motor de validação
+"""
+from conftest import montar_dados
+from services.indices import IndiceNotas
+from services.motor_validacao import MotorValidacao, TIPO_SEM_CABECALHO
+from services.repositorio_validacao import RepositorioValidacao
+
+
+def _dados():
+    return montar_dados(
+        [{'NÚMERO': '10', 'NATUREZA DA OPERAÇÃO': 'VENDA DE MERCADORIA',
+          'UF EMITENTE': 'SP', 'UF DESTINATÁRIO': 'RJ'}],
+        # Nota 20 não tem cabeçalho
+        [{'NÚMERO': '10', 'CFOP': '5.102', 'VALOR TOTAL': 1.0},
+         {'NÚMERO': '20', 'CFOP': '5.102', 'VALOR TOTAL': 2.0}],
+    )
+
+
+def test_item_sem_cabecalho_fica_sem_dados_do_cabecalho(tmp_path):
+    cabecalho, itens = _dados()
+    motor = MotorValidacao(cabecalho, itens, IndiceNotas(cabecalho, itens),
+                           repositorio=RepositorioValidacao(tmp_path / 'validacao.db'), versao='v1')
+
+    motor.persistir()
+    linhas = motor.persistido().consultar()
+
+    sem_cabecalho = linhas[linhas['tipo'] == TIPO_SEM_CABECALHO].iloc[0]
+    assert sem_cabecalho['numero'] == '20'
+    assert sem_cabecalho[['natureza', 'uf_emit', 'uf_dest']].isna().all()
+    com_cabecalho = linhas[linhas['numero'] == '10'].iloc[0]
+    assert (com_cabecalho['natureza'], com_cabecalho['uf_emit'], com_cabecalho['uf_dest']) == (
+        'VENDA DE MERCADORIA', 'SP', 'RJ'
+    )
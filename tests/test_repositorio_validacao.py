@@ -0,0 +1,56 @@
+# backend/tests/test_repositorio_validacao.py
+"""
+Repositório SQLite dos resultados de validação
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+from services.repositorio_validacao import COLUNAS_INDICE, COLUNAS_ITENS, RepositorioValidacao
+
+
+def _itens(quantidade: int, tipo: str = 'conforme') -> pd.DataFrame:
+    return pd.DataFrame({
+        'identidade': np.arange(quantidade, dtype=np.uint64) * np.uint64(2**61),
+        'impressao': np.zeros(quantidade, dtype=np.uint64),
+        'item': range(quantidade),
+        'nota': [f'nota{i // 2}' for i in range(quantidade)],
+        'numero': [str(i // 2) for i in range(quantidade)],
+        'chave': [f'{i // 2:044d}' for i in range(quantidade)],
+        'numero_item': [i % 2 + 1 for i in range(quantidade)],
+        'cfop': ['5.102'] * quantidade,
+        'cfop_atual': ['5102'] * quantidade,
+        'cfop_esperado': ['5.102'] * quantidade,
+        'tipo': [tipo] * quantidade,
+        'severidade': [None] * quantidade,
+        'natureza': ['VENDA'] * quantidade,
+        'uf_emit': ['SP'] * quantidade,
+        'uf_dest': ['SP'] * quantidade,
+        'emitente': ['11111111000111'] * quantidade,
+        'valor': [1.0] * quantidade,
+    })[['identidade', 'impressao'] + COLUNAS_ITENS]
+
+
+def test_iterar_pode_ser_retomado_em_outra_thread(tmp_path):
+    repositorio = RepositorioValidacao(tmp_path / 'validacao.db')
+    itens = _itens(6)
+    repositorio.gravar_itens('v1', itens, itens[COLUNAS_INDICE])
+    lotes = repositorio.iterar(tamanho_lote=2)
+    resultados, erros = [], []
+
+    def proximo():
+        try:
+            resultados.append(next(lotes))
+        except Exception as e:
+            erros.append(e)
+
+    # Como o iterate_in_threadpool do Starlette: cada next() numa thread
+    for _ in range(3):
+        thread = threading.Thread(target=proximo)
+        thread.start()
+        thread.join()
+
+    assert erros == []
+    assert [linha[0] for lote in resultados for linha in lote] == list(range(6))
+    assert list(lotes) == []
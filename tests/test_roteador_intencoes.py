@@ -0,0 +1,58 @@
+# backend/tests/test_roteador_intencoes.py
+"""
+Roteador determinístico de perguntas do chat
+"""
+import pytest
+
+from services.roteador_intencoes import identificar_intencao, resposta_de_falha
+
+CHAVE = '35240111111111000111550010000004271000000011'
+
+
+@pytest.mark.parametrize('pergunta, ferramenta, argumentos', [
+    (f'busque a nota com a chave {CHAVE}', 'buscar_nota_por_chave', {'chave_acesso': CHAVE}),
+    (f'valide o item 2 da chave {CHAVE}', 'validar_cfop_item_especifico',
+     {'chave_acesso': CHAVE, 'numero_item': '2'}),
+    (f'o terceiro item da nota {CHAVE} está correto?', 'validar_cfop_item_especifico',
+     {'chave_acesso': CHAVE, 'numero_item': '3'}),
+    ('O que é o CFOP 5.102?', 'buscar_cfop', {'codigo_cfop': '5102'}),
+    ('quantas notas?', 'contar_notas', {'dummy': ''}),
+    ('Quantas notas fiscais foram carregadas?', 'contar_notas', {'dummy': ''}),
+    ('quantos itens existem no sistema', 'contar_notas', {'dummy': ''}),
+    ('qual o total de NF-es na base?', 'contar_notas', {'dummy': ''}),
+    ('mostre a quinta nota', 'buscar_nota_por_indice', {'indice': '4'}),
+    ('qual é o décimo item?', 'buscar_item_por_indice', {'indice': '9'}),
+])
+def test_perguntas_mecanicas_vao_direto_para_a_ferramenta(pergunta, ferramenta, argumentos):
+    intencao = identificar_intencao(pergunta)
+
+    assert intencao is not None
+    assert (intencao.ferramenta, intencao.argumentos) == (ferramenta, argumentos)
+
+
+@pytest.mark.parametrize('pergunta', [
+    # contar_notas só responde notas e itens
+    'quantos cfops existem?',
+    'quantos CFOPs foram usados nas notas',
+    'quantos registros existem?',
+    'qual o total de registros no sistema?',
+    # Contagens com condição precisam do agente
+    'quantas notas têm divergência?',
+    'quantos itens de SP para RJ?',
+    # Pedido além da nota
+    f'qual o valor total da nota {CHAVE} comparado com o mês anterior?',
+    'por que o CFOP 5.102 diverge nesta nota?',
+])
+def test_perguntas_que_nao_casam_vao_para_o_agente(pergunta):
+    assert identificar_intencao(pergunta) is None
+
+
+@pytest.mark.parametrize('resposta, falha', [
+    ('❌ Nota com chave 123 não encontrada no arquivo de cabeçalho.', True),
+    ('Erro ao buscar nota por chave de acesso: timeout', True),
+    ('', True),
+    (None, True),
+    ('📊 Total de notas: 10', False),
+])
+def test_resposta_de_falha_da_ferramenta_volta_para_o_agente(resposta, falha):
+    assert resposta_de_falha(resposta) is falha
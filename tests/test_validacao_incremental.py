@@ -0,0 +1,175 @@
+# backend/tests/test_validacao_incremental.py
+"""
+Validação e gravação incrementais: entre carregamentos só itens novos ou
+alterados (pela identidade nota + número do item) passam pelas regras e
+são regravados no repositório
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import montar_dados
+from services import motor_validacao
+from services.carregador_csv import COLUNA_NOTA
+from services.indices import IndiceNotas
+from services.motor_validacao import MotorValidacao
+from services.repositorio_validacao import RepositorioValidacao
+
+# Nota -> (natureza, UF emitente, UF destinatário, CFOPs dos itens)
+NOTAS = {
+    '101': ('VENDA DE MERCADORIA', 'SP', 'SP', ['5.102', '5.102']),
+    '102': ('VENDA DE MERCADORIA', 'SP', 'RJ', ['6.102', '5.102']),
+    '103': ('COMPRA PARA COMERCIALIZAÇÃO', 'BA', 'SP', ['2.102', '2.102']),
+}
+
+
+def _dados(notas):
+    return montar_dados(
+        [
+            {
+                'CHAVE DE ACESSO': f'{numero:0>44}',
+                'NÚMERO': numero,
+                'NATUREZA DA OPERAÇÃO': natureza,
+                'UF EMITENTE': uf_emit,
+                'UF DESTINATÁRIO': uf_dest,
+            }
+            for numero, (natureza, uf_emit, uf_dest, _) in notas.items()
+        ],
+        [
+            {'CHAVE DE ACESSO': f'{numero:0>44}', 'NÚMERO': numero, 'CFOP': cfop, 'VALOR TOTAL': 1.0}
+            for numero, (_, _, _, cfops) in notas.items() for cfop in cfops
+        ],
+    )
+
+
+def _motor(notas, repositorio=None):
+    cabecalho, itens = _dados(notas)
+    # Versão dos dados: muda com o conteúdo, como a dos arquivos carregados
+    versao = repr(sorted(notas.items()))
+    return MotorValidacao(cabecalho, itens, IndiceNotas(cabecalho, itens),
+                          repositorio=repositorio, versao=versao)
+
+
+def _validar(notas, repositorio=None):
+    """Valida e grava, como o job em segundo plano"""
+    motor = _motor(notas, repositorio)
+    resultado = motor.resultado()
+    motor.persistir()
+    return resultado
+
+
+@pytest.fixture
+def gravados(monkeypatch):
+    """Quantidade de itens gravados e removidos em cada gravar_itens"""
+    contagem = []
+    original = RepositorioValidacao.gravar_itens
+
+    def contar(self, versao, itens, indice, removidas=()):
+        contagem.append((len(itens), len(removidas)))
+        return original(self, versao, itens, indice, removidas)
+
+    monkeypatch.setattr(RepositorioValidacao, 'gravar_itens', contar)
+    return contagem
+
+
+@pytest.fixture
+def validados(monkeypatch):
+    """Quantidade de itens que passaram por validar_bloco"""
+    contagem = []
+    original = motor_validacao.validar_bloco
+
+    def contar(contexto, notas, cfops, digitos):
+        contagem.append(len(notas))
+        return original(contexto, notas, cfops, digitos)
+
+    monkeypatch.setattr(motor_validacao, 'validar_bloco', contar)
+    return contagem
+
+
+def _notas_alteradas():
+    # Nota nova no início (desloca as posições), um CFOP alterado, uma nota removida
+    notas = {'100': ('VENDA DE MERCADORIA', 'SP', 'SP', ['5.102'])}
+    notas.update(NOTAS)
+    notas['102'] = ('VENDA DE MERCADORIA', 'SP', 'RJ', ['6.102', '6.102'])
+    del notas['103']
+    return notas
+
+
+def test_recarga_valida_so_itens_novos_ou_alterados(tmp_path, validados):
+    repositorio = RepositorioValidacao(tmp_path / 'validacao.db')
+    _validar(NOTAS, repositorio)
+    assert sum(validados) == 6
+
+    notas = _notas_alteradas()
+    validados.clear()
+    resultado = _validar(notas, repositorio)
+
+    assert sum(validados) == 2
+    esperado = _validar(notas)
+    np.testing.assert_array_equal(resultado.itens['tipo'], esperado.itens['tipo'])
+    np.testing.assert_array_equal(resultado.itens['cfop_esperado'], esperado.itens['cfop_esperado'])
+    # Itens gravados acompanham os atuais (os da nota removida saem)
+    assert len(repositorio.carregar()[0]) == 5
+
+
+def test_mesmo_conteudo_em_outra_nota_e_validado(tmp_path, validados):
+    repositorio = RepositorioValidacao(tmp_path / 'validacao.db')
+    _validar({'101': NOTAS['101']}, repositorio)
+    validados.clear()
+
+    _validar({'101': NOTAS['101'], '201': NOTAS['101']}, repositorio)
+
+    assert sum(validados) == 2
+
+
+def test_resultado_nao_espera_a_gravacao(tmp_path):
+    repositorio = RepositorioValidacao(tmp_path / 'validacao.db')
+    motor = _motor(NOTAS, repositorio)
+
+    motor.resultado()
+    assert repositorio.versao() is None
+    assert motor.persistido() is None
+
+    motor.persistir()
+    assert motor.persistido() is repositorio
+    assert repositorio.pronto(motor.versao_resultados)
+
+
+def test_regrava_so_itens_novos_alterados_ou_deslocados(tmp_path, gravados):
+    repositorio = RepositorioValidacao(tmp_path / 'validacao.db')
+    _validar(NOTAS, repositorio)
+    assert gravados == [(6, 0)]
+
+    # Sem mudanças nos itens (outra versão dos dados): nada a regravar
+    notas = dict(NOTAS)
+    motor = _motor(notas, repositorio)
+    motor.versao = 'outra'
+    motor.persistir()
+    assert gravados[-1] == (0, 0)
+
+    # 1 item novo + 4 deslocados por ele + 1 CFOP alterado (já deslocado); 2 removidos
+    notas = _notas_alteradas()
+    _validar(notas, repositorio)
+    assert gravados[-1] == (5, 2)
+
+    # O repositório fica igual ao de uma gravação completa
+    completo = RepositorioValidacao(tmp_path / 'completo.db')
+    _validar(notas, completo)
+    pd.testing.assert_frame_equal(repositorio.consultar(), completo.consultar())
+
+
+def test_recarga_depois_de_gravar_zero_itens(tmp_path, validados):
+    repositorio = RepositorioValidacao(tmp_path / 'validacao.db')
+    cabecalho, itens = _dados(NOTAS)
+    itens = itens.iloc[:0].copy()
+    itens[COLUNA_NOTA] = itens[COLUNA_NOTA].cat.remove_unused_categories()
+    vazio = MotorValidacao(cabecalho, itens, IndiceNotas(cabecalho, itens),
+                           repositorio=repositorio, versao='vazio')
+    vazio.resultado()
+    vazio.persistir()
+    assert repositorio.carregar() is None
+
+    resultado = _validar(NOTAS, repositorio)
+
+    assert sum(validados) == 6
+    np.testing.assert_array_equal(resultado.itens['tipo'], _validar(NOTAS).itens['tipo'])